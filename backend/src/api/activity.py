@@ -0,0 +1,121 @@
+import math
+
+from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest, Log
+
+from .models import CommunityComment, CommunityPost, ForumPost, ForumTopic
+
+# Age worth a factor of ten in replies: a thread must have ten times the
+# replies of one created HOT_DECAY_SECONDS later to rank level with it.
+HOT_DECAY_SECONDS = 12 * 3600
+
+# thread model -> (reply model, field on the reply pointing at the thread)
+THREADS = {
+    ForumTopic: (ForumPost, 'topic'),
+    CommunityPost: (CommunityComment, 'post'),
+}
+ACTIVITY_FIELDS = ['reply_count', 'last_activity_at', 'hot_score']
+
+
+def hot_score(reply_count, created_at):
+    """
+    Time-decayed rank of a thread. Scores only grow with time, so they are
+    stored, indexed and never need decaying.
+    """
+    return math.log10(1 + reply_count) + created_at.timestamp() / HOT_DECAY_SECONDS
+
+
+def _latest_reply(thread_model):
+    reply_model, field = THREADS[thread_model]
+    return Subquery(
+        reply_model.objects.filter(**{field: OuterRef('pk')})
+        .order_by('-created_at').values('created_at')[:1]
+    )
+
+
+def _apply(thread_model, thread_id, created_at, sign):
+    if thread_id is None:
+        return
+    if sign > 0:
+        last_activity = Greatest(F('last_activity_at'), Value(created_at))
+    else:
+        last_activity = Coalesce(_latest_reply(thread_model), F('created_at'))
+    thread_model.objects.filter(pk=thread_id).update(
+        reply_count=Greatest(F('reply_count') + sign, 0),
+        last_activity_at=last_activity,
+        # Swap the reply term of the score; every right-hand side reads the
+        # row as it was before the update.
+        hot_score=F('hot_score') - Log(10, F('reply_count') + 1)
+            + Log(10, Greatest(F('reply_count') + 1 + sign, 1)),
+    )
+
+
+def record_new_thread(thread):
+    """Start the activity of a thread just created at ``thread.created_at``."""
+    thread.last_activity_at = thread.created_at
+    thread.hot_score = hot_score(0, thread.created_at)
+    type(thread).objects.filter(pk=thread.pk).update(
+        last_activity_at=thread.last_activity_at, hot_score=thread.hot_score,
+    )
+
+
+def record_reply_change(thread_model, old, new, created_at):
+    """
+    Move a reply from thread ``old`` to thread ``new`` (ids, ``None`` for a
+    create or a delete), updating both threads' counters.
+    """
+    if old == new:
+        return
+    with transaction.atomic():
+        _apply(thread_model, old, created_at, sign=-1)
+        _apply(thread_model, new, created_at, sign=1)
+
+
+def compute_activity(thread_model, thread_ids=None):
+    """Return ``{thread_id: {field: value}}`` computed from the reply table."""
+    reply_model, field = THREADS[thread_model]
+    threads = thread_model.objects.order_by()
+    if thread_ids is not None:
+        threads = threads.filter(pk__in=thread_ids)
+    replies = reply_model._meta.get_field(field).related_query_name()
+    rows = threads.values('pk', 'created_at').annotate(
+        counted=Count(replies), latest=Max(f'{replies}__created_at'),
+    )
+    return {
+        row['pk']: {
+            'reply_count': row['counted'],
+            'last_activity_at': max(row['latest'] or row['created_at'], row['created_at']),
+            'hot_score': hot_score(row['counted'], row['created_at']),
+        }
+        for row in rows
+    }
+
+
+def find_activity_mismatches(thread_model, thread_ids=None):
+    """Return ``(thread, expected)`` pairs whose stored counters are stale."""
+    expected = compute_activity(thread_model, thread_ids)
+    threads = thread_model.objects.only('id', *ACTIVITY_FIELDS)
+    if thread_ids is not None:
+        threads = threads.filter(pk__in=thread_ids)
+    mismatches = []
+    for thread in threads.iterator(chunk_size=2000):
+        values = expected[thread.pk]
+        if thread.reply_count != values['reply_count'] \
+                or thread.last_activity_at != values['last_activity_at'] \
+                or not math.isclose(thread.hot_score, values['hot_score'], abs_tol=1e-6):
+            mismatches.append((thread, values))
+    return mismatches
+
+
+def rebuild_activity(thread_model, thread_ids=None, batch_size=500):
+    """Recompute stale counters from scratch; return the number of threads fixed."""
+    with transaction.atomic():
+        mismatches = find_activity_mismatches(thread_model, thread_ids)
+        for thread, values in mismatches:
+            for field, value in values.items():
+                setattr(thread, field, value)
+        thread_model.objects.bulk_update(
+            [thread for thread, _ in mismatches], ACTIVITY_FIELDS, batch_size=batch_size
+        )
+    return len(mismatches)
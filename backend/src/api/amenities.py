@@ -0,0 +1,50 @@
+from .models import Amenity, Hostel, HostelAmenity, Room, RoomAmenity
+
+# owner model -> (link model, owner field on the link)
+LINKS = {
+    Hostel: (HostelAmenity, 'hostel'),
+    Room: (RoomAmenity, 'room'),
+}
+
+
+def normalize(name):
+    return ' '.join(str(name).split()).lower()[:100]
+
+
+def names_of(instance):
+    values = instance.amenities if isinstance(instance.amenities, list) else []
+    return {normalize(value) for value in values if isinstance(value, str) and value.strip()}
+
+
+def amenity_ids(names):
+    """``{name: id}`` for ``names``, creating amenities that do not exist yet."""
+    if not names:
+        return {}
+    Amenity.objects.bulk_create([Amenity(name=name) for name in names], ignore_conflicts=True)
+    return dict(Amenity.objects.filter(name__in=names).values_list('name', 'pk'))
+
+
+def sync(instances, batch_size=1000):
+    """Make the amenity links of hostels or rooms match their ``amenities`` lists."""
+    for start in range(0, len(instances), batch_size):
+        _sync_batch(instances[start:start + batch_size])
+
+
+def _sync_batch(instances):
+    link_model, owner = LINKS[type(instances[0])]
+    wanted = {instance.pk: names_of(instance) for instance in instances}
+    ids = amenity_ids(set().union(*wanted.values()))
+    current = dict(
+        ((owner_id, amenity_id), link_id)
+        for owner_id, amenity_id, link_id in link_model.objects.filter(
+            **{f'{owner}_id__in': wanted}
+        ).values_list(f'{owner}_id', 'amenity_id', 'pk')
+    )
+    target = {(owner_id, ids[name]) for owner_id, names in wanted.items() for name in names}
+    stale = [link_id for key, link_id in current.items() if key not in target]
+    if stale:
+        link_model.objects.filter(pk__in=stale).delete()
+    link_model.objects.bulk_create([
+        link_model(**{f'{owner}_id': owner_id, 'amenity_id': amenity_id})
+        for owner_id, amenity_id in target - set(current)
+    ], ignore_conflicts=True)
@@ -0,0 +1,97 @@
+from collections import defaultdict
+
+from django.db.models import Exists, OuterRef
+
+from .models import Booking, Room
+
+# Bookings in these states occupy their room for [check_in_date, check_out_date).
+BLOCKING_STATUSES = ('PENDING', 'CONFIRMED', 'COMPLETED')
+RELEASED_STATUS = 'CANCELLED'
+
+
+def overlapping_bookings(check_in, check_out):
+    """
+    Bookings that hold a room on any night of ``[check_in, check_out)``.
+
+    The ``check_out_date > check_in`` bound is what the partial
+    ``booking_room_dates_idx`` index seeks on, so past stays are never read.
+    The status predicate is spelled exactly like the index condition so the
+    planner can match it.
+    """
+    return Booking.objects.exclude(status=RELEASED_STATUS).filter(
+        check_out_date__gt=check_in,
+        check_in_date__lt=check_out,
+    )
+
+
+def available_rooms(check_in, check_out, hostel_id=None):
+    rooms = Room.objects.filter(is_available=True)
+    if hostel_id is not None:
+        rooms = rooms.filter(hostel_id=hostel_id)
+    taken = overlapping_bookings(check_in, check_out).filter(room_id=OuterRef('pk'))
+    return rooms.filter(~Exists(taken))
+
+
+def has_conflict(room_id, check_in, check_out, exclude_booking_id=None):
+    conflicts = overlapping_bookings(check_in, check_out).filter(room_id=room_id)
+    if exclude_booking_id is not None:
+        conflicts = conflicts.exclude(pk=exclude_booking_id)
+    return conflicts.exists()
+
+
+def lock_room(room_id):
+    """
+    Lock a room row for the rest of the current transaction.
+
+    Concurrent bookings for the same room queue here, so the conflict check
+    that follows cannot interleave with another insert. Must be called inside
+    ``transaction.atomic()``.
+    """
+    return Room.objects.select_for_update().get(pk=room_id)
+
+
+def lock_rooms(room_ids):
+    """Batch form of ``lock_room``; locks in primary key order to avoid deadlocks."""
+    list(Room.objects.select_for_update().filter(pk__in=room_ids).order_by('pk').values_list('pk', flat=True))
+
+
+def find_batch_conflicts(bookings):
+    """
+    Return the positions in ``bookings`` that overlap a stored booking or an
+    earlier booking in the same batch.
+
+    ``bookings`` are unsaved or edited ``Booking`` objects; the stored rows of
+    edited ones are ignored. The rooms involved are locked first, so this
+    must run inside ``transaction.atomic()``.
+    """
+    blocking = [
+        (position, booking) for position, booking in enumerate(bookings)
+        if booking.status != RELEASED_STATUS
+    ]
+    if not blocking:
+        return set()
+    room_ids = {booking.room_id for _, booking in blocking}
+    lock_rooms(room_ids)
+    taken = defaultdict(list)
+    stored = (
+        overlapping_bookings(
+            min(booking.check_in_date for _, booking in blocking),
+            max(booking.check_out_date for _, booking in blocking),
+        )
+        .filter(room_id__in=room_ids)
+        .exclude(pk__in=[booking.pk for booking in bookings if booking.pk])
+        .values_list('room_id', 'check_in_date', 'check_out_date')
+    )
+    for room_id, check_in, check_out in stored:
+        taken[room_id].append((check_in, check_out))
+    conflicts = set()
+    for position, booking in blocking:
+        stays = taken[booking.room_id]
+        if any(
+            check_in < booking.check_out_date and check_out > booking.check_in_date
+            for check_in, check_out in stays
+        ):
+            conflicts.add(position)
+        else:
+            stays.append((booking.check_in_date, booking.check_out_date))
+    return conflicts
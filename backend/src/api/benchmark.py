@@ -0,0 +1,344 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from . import activity, amenities, conversations, search
+from .geo import cell_for
+from .models import (
+    Booking, CommunityCategory, CommunityComment, CommunityPost, ForumPost, ForumTopic, Hostel,
+    Message, Review, Room, University,
+)
+
+CITIES = [
+    ('Accra', 'Greater Accra'), ('Kumasi', 'Ashanti'), ('Cape Coast', 'Central'),
+    ('Tamale', 'Northern'), ('Takoradi', 'Western'), ('Ho', 'Volta'),
+    ('Koforidua', 'Eastern'), ('Sunyani', 'Bono'), ('Legon', 'Greater Accra'),
+    ('Winneba', 'Central'),
+]
+CITY_CENTRES = {
+    'Accra': (5.6037, -0.1870), 'Kumasi': (6.6885, -1.6244), 'Cape Coast': (5.1053, -1.2466),
+    'Tamale': (9.4034, -0.8424), 'Takoradi': (4.8845, -1.7554), 'Ho': (6.6008, 0.4713),
+    'Koforidua': (6.0940, -0.2591), 'Sunyani': (7.3399, -2.3268), 'Legon': (5.6502, -0.1869),
+    'Winneba': (5.3511, -0.6231),
+}
+WORDS = [
+    'cozy', 'modern', 'spacious', 'quiet', 'secure', 'affordable', 'student', 'campus',
+    'shuttle', 'garden', 'rooftop', 'library', 'lounge', 'kitchen', 'laundry', 'gym',
+    'furnished', 'ensuite', 'balcony', 'study', 'bright', 'central', 'friendly', 'clean',
+]
+AMENITIES = [
+    'wifi', 'air conditioning', 'hot water', 'parking', 'security', 'laundry',
+    'kitchen', 'study room', 'generator', 'cctv', 'water tank', 'gym',
+]
+ROOM_TYPES = [code for code, _ in Room.ROOM_TYPES]
+
+
+class Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rolled_back(keep=False):
+    """Run a block in a transaction that is rolled back unless ``keep`` is set."""
+    try:
+        with transaction.atomic():
+            yield
+            if not keep:
+                raise Rollback
+    except Rollback:
+        pass
+
+
+def unthrottled():
+    """Lift the API rate limits, which benchmark clients would otherwise hit."""
+    return override_settings(THROTTLE_BUCKETS={})
+
+
+def percentiles(samples, points=(50, 95, 99)):
+    """Return ``{'p50': ms, ...}`` for a list of durations in seconds."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {f'p{point}': None for point in points}
+    return {
+        f'p{point}': round(ordered[min(len(ordered) - 1, int(len(ordered) * point / 100))] * 1000, 3)
+        for point in points
+    }
+
+
+def measure(func, repeat, warm_cache=False):
+    """
+    Call ``func`` (which makes one API request) ``repeat`` times and return
+    its latency percentiles, queries per request and status codes. The
+    cache is cleared before each call unless ``warm_cache`` is set.
+    """
+    samples, queries, statuses = [], 0, set()
+    for _ in range(repeat):
+        if not warm_cache:
+            cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = func()
+            samples.append(time.perf_counter() - start)
+        queries += len(captured)
+        statuses.add(response.status_code)
+    return {
+        **percentiles(samples),
+        'queries_per_request': round(queries / repeat, 2) if repeat else None,
+        'statuses': sorted(statuses),
+    }
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def seed_hostels(count, rooms_per_hostel=2, seed=0, batch_size=2000, inactive_ratio=0.0):
+    """Bulk-create ``count`` synthetic hostels (and their rooms); return the hostel ids."""
+    rng = random.Random(seed)
+    manager, _ = User.objects.get_or_create(username='bench-manager')
+    first_id = (Hostel.objects.order_by('-pk').values_list('pk', flat=True).first() or 0) + 1
+    hostels = []
+    for n in range(count):
+        city, state = rng.choice(CITIES)
+        latitude, longitude = CITY_CENTRES[city]
+        latitude, longitude = latitude + rng.gauss(0, 0.1), longitude + rng.gauss(0, 0.1)
+        hostels.append(Hostel(
+            name=f'{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} Hostel {n}',
+            description=' '.join(rng.choices(WORDS, k=30)),
+            address=f'{n} {rng.choice(WORDS).title()} Road',
+            city=city, state=state, country='Ghana', zip_code='00233',
+            price_per_night=Decimal(rng.randrange(20, 400)), manager=manager,
+            amenities=rng.sample(AMENITIES, 4),
+            is_active=rng.random() >= inactive_ratio,
+            latitude=latitude, longitude=longitude, geo_cell=cell_for(latitude, longitude),
+        ))
+    Hostel.objects.bulk_create(hostels, batch_size=batch_size)
+    ids = list(
+        Hostel.objects.filter(pk__gte=first_id).order_by('pk').values_list('pk', flat=True)
+    )
+    rooms = [
+        Room(
+            hostel_id=hostel_id, room_number=str(number),
+            room_type=rng.choice(ROOM_TYPES), capacity=rng.randint(1, 4),
+            price_per_night=Decimal(rng.randrange(20, 400)),
+            amenities=rng.sample(AMENITIES, 3),
+        )
+        for hostel_id in ids
+        for number in range(rooms_per_hostel)
+    ]
+    Room.objects.bulk_create(rooms, batch_size=batch_size)
+    # bulk_create() sends no signals, so link the amenities here.
+    amenities.sync(list(Hostel.objects.filter(pk__gte=first_id).only('id', 'amenities')), batch_size)
+    amenities.sync(list(Room.objects.filter(hostel_id__in=ids).only('id', 'amenities')), batch_size)
+    return ids
+
+
+def _guest_ids():
+    guests = list(User.objects.filter(username__startswith='bench-guest-').values_list('pk', flat=True))
+    if not guests:
+        User.objects.bulk_create([User(username=f'bench-guest-{n}') for n in range(100)])
+        guests = list(User.objects.filter(username__startswith='bench-guest-').values_list('pk', flat=True))
+    return guests
+
+
+def seed_bookings(count, room_ids, start=date(2015, 1, 1), end=None, seed=0, batch_size=5000):
+    """
+    Bulk-create ``count`` synthetic bookings spread over ``room_ids``.
+
+    Stays that ended before today are mostly COMPLETED or CANCELLED, like a
+    long-running production history.
+    """
+    rng = random.Random(seed)
+    end = end or date.today() + timedelta(days=365)
+    span = (end - start).days
+    guests = _guest_ids()
+    today = date.today()
+    batch = []
+    for _ in range(count):
+        check_in = start + timedelta(days=rng.randrange(span))
+        nights = rng.randint(1, 14)
+        check_out = check_in + timedelta(days=nights)
+        if check_out < today:
+            status = 'CANCELLED' if rng.random() < 0.15 else 'COMPLETED'
+        else:
+            status = rng.choice(['PENDING', 'CONFIRMED', 'CONFIRMED', 'CANCELLED'])
+        batch.append(Booking(
+            user_id=rng.choice(guests), room_id=rng.choice(room_ids),
+            check_in_date=check_in, check_out_date=check_out, status=status,
+            total_price=Decimal(nights * rng.randrange(20, 400)),
+        ))
+        if len(batch) >= batch_size:
+            Booking.objects.bulk_create(batch)
+            batch = []
+    Booking.objects.bulk_create(batch)
+
+
+def seed_reviews(count, hostel_ids, seed=0, batch_size=5000):
+    """Bulk-create ``count`` synthetic reviews; rating aggregates are not updated."""
+    rng = random.Random(seed)
+    guests = _guest_ids()
+    batch = []
+    for _ in range(count):
+        batch.append(Review(
+            user_id=rng.choice(guests), hostel_id=rng.choice(hostel_ids),
+            rating=rng.randint(1, 5), comment=' '.join(rng.choices(WORDS, k=12)),
+        ))
+        if len(batch) >= batch_size:
+            Review.objects.bulk_create(batch)
+            batch = []
+    Review.objects.bulk_create(batch)
+
+
+def seed_community(categories, posts, comments, seed=0, batch_size=5000):
+    """Bulk-create community categories, posts and comments; return the category ids."""
+    rng = random.Random(seed)
+    guests = _guest_ids()
+    first_category = (CommunityCategory.objects.order_by('-pk').values_list('pk', flat=True).first() or 0) + 1
+    CommunityCategory.objects.bulk_create([
+        CommunityCategory(name=f'{rng.choice(WORDS).title()} {n}', description='')
+        for n in range(categories)
+    ])
+    category_ids = list(
+        CommunityCategory.objects.filter(pk__gte=first_category).values_list('pk', flat=True)
+    )
+    first_post = (CommunityPost.objects.order_by('-pk').values_list('pk', flat=True).first() or 0) + 1
+    CommunityPost.objects.bulk_create([
+        CommunityPost(
+            category_id=rng.choice(category_ids), author_id=rng.choice(guests),
+            title=' '.join(rng.choices(WORDS, k=5)), content=' '.join(rng.choices(WORDS, k=30)),
+            is_pinned=rng.random() < 0.01,
+        )
+        for _ in range(posts)
+    ], batch_size=batch_size)
+    post_ids = list(CommunityPost.objects.filter(pk__gte=first_post).values_list('pk', flat=True))
+    batch = []
+    for _ in range(comments):
+        batch.append(CommunityComment(
+            post_id=rng.choice(post_ids), author_id=rng.choice(guests),
+            content=' '.join(rng.choices(WORDS, k=12)),
+        ))
+        if len(batch) >= batch_size:
+            CommunityComment.objects.bulk_create(batch)
+            batch = []
+    CommunityComment.objects.bulk_create(batch)
+    # bulk_create() sends no signals, so count the replies here.
+    activity.rebuild_activity(CommunityPost)
+    return category_ids
+
+
+def seed_universities(count, seed=0):
+    """Bulk-create ``count`` universities near the seeded cities; return their ids."""
+    rng = random.Random(seed)
+    first_id = (University.objects.order_by('-pk').values_list('pk', flat=True).first() or 0) + 1
+    universities = []
+    for n in range(count):
+        city, _ = CITIES[n % len(CITIES)]
+        latitude, longitude = CITY_CENTRES[city]
+        universities.append(University(
+            name=f'University of {city} {n}', location=city,
+            description=' '.join(rng.choices(WORDS, k=20)),
+            latitude=latitude + rng.gauss(0, 0.02), longitude=longitude + rng.gauss(0, 0.02),
+        ))
+    University.objects.bulk_create(universities)
+    return list(University.objects.filter(pk__gte=first_id).values_list('pk', flat=True))
+
+
+def seed_forum(topics, posts, seed=0, batch_size=5000):
+    """Bulk-create forum topics and posts; return the topic ids."""
+    rng = random.Random(seed)
+    guests = _guest_ids()
+    first_topic = (ForumTopic.objects.order_by('-pk').values_list('pk', flat=True).first() or 0) + 1
+    ForumTopic.objects.bulk_create([
+        ForumTopic(
+            title=' '.join(rng.choices(WORDS, k=5)), description=' '.join(rng.choices(WORDS, k=20)),
+            created_by_id=rng.choice(guests),
+        )
+        for _ in range(topics)
+    ], batch_size=batch_size)
+    topic_ids = list(ForumTopic.objects.filter(pk__gte=first_topic).values_list('pk', flat=True))
+    batch = []
+    for _ in range(posts):
+        batch.append(ForumPost(
+            topic_id=rng.choice(topic_ids), author_id=rng.choice(guests),
+            content=' '.join(rng.choices(WORDS, k=15)),
+        ))
+        if len(batch) >= batch_size:
+            ForumPost.objects.bulk_create(batch)
+            batch = []
+    ForumPost.objects.bulk_create(batch)
+    activity.rebuild_activity(ForumTopic)
+    return topic_ids
+
+
+def seed_messages(count, seed=0, batch_size=5000):
+    """
+    Bulk-create ``count`` messages between synthetic guests, grouped into
+    conversations with their unread counters up to date.
+    """
+    rng = random.Random(seed)
+    guests = _guest_ids()
+    for start in range(0, count, batch_size):
+        batch = []
+        for _ in range(min(batch_size, count - start)):
+            sender, receiver = rng.sample(guests, 2)
+            batch.append(Message(
+                sender_id=sender, receiver_id=receiver, content=' '.join(rng.choices(WORDS, k=10)),
+                is_read=rng.random() < 0.7,
+            ))
+        conversations.assign_conversations(batch)
+        Message.objects.bulk_create(batch)
+        conversations.record_new_messages(batch)
+
+
+# Rows generated per unit of ``scale`` by generate_dataset()
+DATASET = {
+    'universities': 10,
+    'hostels': 1_000,
+    'rooms_per_hostel': 3,
+    'bookings': 10_000,
+    'reviews': 5_000,
+    'forum_topics': 200,
+    'forum_posts': 2_000,
+    'community_posts': 1_000,
+    'community_comments': 5_000,
+    'messages': 5_000,
+}
+
+
+def generate_dataset(scale=1, seed=0):
+    """
+    Seed a complete synthetic dataset ``scale`` times the size of ``DATASET``
+    and index it for search. Return the ids the benchmark scenarios need.
+    """
+    def size(name):
+        return max(1, round(DATASET[name] * scale))
+
+    university_ids = seed_universities(size('universities'), seed)
+    hostel_ids = seed_hostels(size('hostels'), DATASET['rooms_per_hostel'], seed)
+    room_ids = list(Room.objects.filter(hostel_id__in=hostel_ids).values_list('pk', flat=True))
+    seed_bookings(size('bookings'), room_ids, seed=seed)
+    seed_reviews(size('reviews'), hostel_ids, seed)
+    topic_ids = seed_forum(size('forum_topics'), size('forum_posts'), seed)
+    category_ids = seed_community(10, size('community_posts'), size('community_comments'), seed)
+    seed_messages(size('messages'), seed)
+    for doc_type in search.DOC_TYPES:
+        search.rebuild_index(doc_type)
+    return {
+        'university_ids': university_ids,
+        'hostel_ids': hostel_ids,
+        'room_ids': room_ids,
+        'topic_ids': topic_ids,
+        'category_ids': category_ids,
+    }
@@ -0,0 +1,191 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from . import search
+
+
+class PreloadedRelation:
+    """
+    Stand-in queryset for a ``PrimaryKeyRelatedField`` during batch validation.
+
+    It answers ``get(pk=...)`` from objects fetched with one ``in_bulk`` query,
+    so validating N items costs one query per relation instead of N.
+    """
+
+    def __init__(self, queryset, values):
+        self.model = queryset.model
+        keys = set()
+        for value in values:
+            try:
+                keys.add(self.model._meta.pk.to_python(value))
+            except (DjangoValidationError, TypeError, ValueError):
+                continue
+        self.objects = queryset.in_bulk(keys) if keys else {}
+
+    def get(self, pk):
+        try:
+            key = self.model._meta.pk.to_python(pk)
+        except DjangoValidationError:
+            raise ValueError(pk)
+        try:
+            return self.objects[key]
+        except KeyError:
+            raise self.model.DoesNotExist
+
+    def all(self):
+        return self
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """
+    ``many=True`` serializer that writes with ``bulk_create``/``bulk_update``.
+
+    Errors are reported per item as ``{index: errors}``, like DRF's own list
+    validation. The child serializer may define
+    ``bulk_prepare(instances, validated_data, created)`` to adjust or reject
+    instances before they are written, raising a ``ValidationError`` keyed the
+    same way, and ``bulk_saved(instances)`` for side effects that signals
+    would normally handle.
+    """
+
+    batch_size = 1000
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self._preload_relations(data)
+        if self.instance is not None:
+            self._instances = {instance.pk: instance for instance in self.instance}
+        return super().to_internal_value(data)
+
+    def _preload_relations(self, data):
+        for name, field in self.child.fields.items():
+            if field.read_only or not isinstance(field, serializers.PrimaryKeyRelatedField):
+                continue
+            if isinstance(field.queryset, PreloadedRelation):
+                continue
+            values = [item.get(name) for item in data if isinstance(item, dict)]
+            field.queryset = PreloadedRelation(field.get_queryset(), values)
+
+    def run_child_validation(self, data):
+        if self.instance is not None:
+            pk = data.get('id') if isinstance(data, dict) else None
+            self.child.instance = self._instances.get(pk)
+        return super().run_child_validation(data)
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        instances = [model(**attrs) for attrs in validated_data]
+        self._prepare(instances, validated_data, created=True)
+        model.objects.bulk_create(instances, batch_size=self.batch_size)
+        self._saved(instances)
+        return instances
+
+    def update(self, instances, validated_data):
+        model = self.child.Meta.model
+        fields = set()
+        for instance, attrs in zip(instances, validated_data):
+            for attr, value in attrs.items():
+                setattr(instance, attr, value)
+            fields.update(attrs)
+        fields.update(self._prepare(instances, validated_data, created=False))
+        if fields:
+            # bulk_update() skips pre_save(), so stamp auto_now fields here.
+            for field in model._meta.concrete_fields:
+                if getattr(field, 'auto_now', False):
+                    for instance in instances:
+                        field.pre_save(instance, add=False)
+                    fields.add(field.name)
+            model.objects.bulk_update(instances, fields, batch_size=self.batch_size)
+        self._saved(instances)
+        return instances
+
+    def _prepare(self, instances, validated_data, created):
+        """Run the child's ``bulk_prepare``; return any extra fields it changed."""
+        prepare = getattr(self.child, 'bulk_prepare', None)
+        if prepare is None:
+            return ()
+        return prepare(instances, validated_data, created) or ()
+
+    def _saved(self, instances):
+        saved = getattr(self.child, 'bulk_saved', None)
+        if saved is not None:
+            saved(instances)
+
+
+def _is_id(value):
+    # bool is an int subclass, but True is not a primary key.
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class BulkWriteMixin:
+    """
+    Adds ``/bulk/`` to a viewset: POST a list to create, PATCH a list of
+    ``{"id": ..., ...}`` to update, DELETE ``{"ids": [...]}`` to delete.
+    Each request runs in a single transaction and either fully applies or
+    returns per-item errors.
+    """
+
+    bulk_max_items = 10000
+
+    def get_bulk_save_kwargs(self):
+        return {}
+
+    def _bulk_items(self, data):
+        if not isinstance(data, list):
+            raise serializers.ValidationError({'non_field_errors': ['Expected a list of items.']})
+        if len(data) > self.bulk_max_items:
+            raise serializers.ValidationError(
+                {'non_field_errors': [f'At most {self.bulk_max_items} items per request.']}
+            )
+        return data
+
+    @action(detail=False, methods=['post', 'patch', 'delete'], url_path='bulk')
+    def bulk(self, request):
+        with transaction.atomic(), search.batched_indexing():
+            if request.method == 'POST':
+                return self.bulk_create(request)
+            if request.method == 'PATCH':
+                return self.bulk_update(request)
+            return self.bulk_destroy(request)
+
+    def bulk_create(self, request):
+        items = self._bulk_items(request.data)
+        serializer = self.get_serializer(data=items, many=True)
+        serializer.is_valid(raise_exception=True)
+        instances = serializer.save(**self.get_bulk_save_kwargs())
+        data = self.get_serializer(instances, many=True).data
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    def bulk_update(self, request):
+        items = self._bulk_items(request.data)
+        ids = [item.get('id') if isinstance(item, dict) else None for item in items]
+        found = self.filter_queryset(self.get_queryset()).in_bulk(
+            [pk for pk in ids if _is_id(pk)]
+        )
+        missing = {
+            index: {'id': ['Not found.']} for index, pk in enumerate(ids)
+            if not _is_id(pk) or pk not in found
+        }
+        if missing:
+            raise serializers.ValidationError(missing)
+        instances = [found[pk] for pk in ids]
+        serializer = self.get_serializer(instances, data=items, many=True, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(self.get_serializer(instances, many=True).data)
+
+    def bulk_destroy(self, request):
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        ids = self._bulk_items(ids)
+        if not all(_is_id(pk) for pk in ids):
+            raise serializers.ValidationError({'ids': ['Expected a list of integer ids.']})
+        queryset = self.get_queryset().filter(pk__in=ids)
+        found = set(queryset.values_list('pk', flat=True))
+        missing = [pk for pk in ids if pk not in found]
+        if missing:
+            raise serializers.ValidationError({'ids': [f'Not found: {missing}']})
+        queryset.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
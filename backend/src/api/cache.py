@@ -0,0 +1,193 @@
+import hashlib
+import json
+import threading
+import time
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+RESPONSE_PREFIX = 'api-response'
+TAG_PREFIX = 'api-tag'
+
+
+def _tag_key(tag):
+    return f'{TAG_PREFIX}:{tag}'
+
+
+def _new_version(at):
+    return f'{at:.6f}:{uuid4().hex}'
+
+
+def _version_time(version):
+    """When ``version`` was set by ``invalidate()``; 0 for a tag never invalidated."""
+    try:
+        return float(version.split(':', 1)[0]) if ':' in version else 0
+    except ValueError:
+        return 0
+
+
+def invalidate(*tags):
+    """Evict every cached response carrying any of ``tags``."""
+    version = _new_version(time.time())
+    cache.set_many({_tag_key(tag): version for tag in tags}, None)
+
+
+def tag_versions(tags):
+    """Return ``{key: version}`` for ``tags``; the versions change on ``invalidate()``."""
+    keys = [_tag_key(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _new_version(0), None)
+            versions[key] = cache.get(key)
+    return {key: versions[key] for key in keys}
+
+
+def _is_current(versions):
+    return cache.get_many(list(versions)) == versions
+
+
+def permission_scope(request):
+    user = request.user
+    if not user.is_authenticated:
+        return 'anon'
+    return 'staff' if user.is_staff else 'user'
+
+
+def response_key(request):
+    params = sorted(
+        (key, value) for key, values in request.query_params.lists() for value in values
+    )
+    route = hashlib.md5(f'{request.path}?{params!r}'.encode()).hexdigest()
+    return f'{RESPONSE_PREFIX}:{permission_scope(request)}:{route}'
+
+
+def _etag(data):
+    payload = json.dumps(data, cls=JSONEncoder, sort_keys=True).encode()
+    return quote_etag(hashlib.md5(payload).hexdigest())
+
+
+class SingleFlight:
+    """
+    Runs one call per key at a time in this process. Callers arriving while
+    it runs wait for it and share its result instead of repeating the work.
+    """
+
+    def __init__(self, timeout=30):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        """Return ``(result, shared)``; ``shared`` is true when another caller ran ``func``."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = {'done': threading.Event()}
+                leader = True
+            else:
+                leader = False
+        if not leader:
+            # Run it ourselves if the first call fails or takes too long.
+            if call['done'].wait(self.timeout) and 'result' in call:
+                return call['result'], True
+            return func(), False
+        try:
+            call['result'] = func()
+            return call['result'], False
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+
+
+single_flight = SingleFlight()
+
+
+def _render_entry(key, render, tags, timeout):
+    # Versions are read before rendering, so a write racing the render leaves
+    # the entry stale rather than wrongly current. Tags known only from the
+    # data are read afterwards; if any was invalidated since the render
+    # started, the response is served but not stored.
+    started = time.time()
+    versions = None if callable(tags) else tag_versions(tags)
+    response = render()
+    if response.status_code != status.HTTP_200_OK:
+        return None, response
+    entry = {'data': response.data, 'etag': _etag(response.data), 'tags': versions}
+    if versions is None:
+        entry['tags'] = tag_versions(tags(response.data))
+        if any(_version_time(version) >= started for version in entry['tags'].values()):
+            return entry, None
+    if timeout is None:
+        timeout = getattr(settings, 'API_RESPONSE_CACHE_TIMEOUT', 300)
+    cache.set(key, entry, timeout)
+    return entry, None
+
+
+def cached_response(request, render, tags, timeout=None):
+    """
+    Serve ``render()`` through the shared response cache.
+
+    Entries are keyed on path, query parameters and permission scope, and are
+    valid only while every tag keeps the version it had when the entry was
+    stored; ``invalidate(tag)`` therefore evicts precisely the entries that
+    depend on that tag. ``tags`` may be a callable taking the response data,
+    for responses whose dependencies are only known after rendering.
+    Concurrent misses on the same key in one process render once and share
+    the entry. Conditional requests get a 304 when ``If-None-Match`` matches.
+    """
+    key = response_key(request)
+    entry = cache.get(key)
+    if entry is not None and not _is_current(entry['tags']):
+        entry = None
+    if entry is None:
+        (entry, error), shared = single_flight.do(
+            key, lambda: _render_entry(key, render, tags, timeout)
+        )
+        if entry is None:
+            # Error responses are not shared.
+            return render() if shared else error
+
+    if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+    if entry['etag'] in if_none_match or '*' in if_none_match:
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(entry['data'])
+    response['ETag'] = entry['etag']
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ('Authorization', 'Cookie'))
+    return response
+
+
+class CachedResponseMixin:
+    """
+    Viewset mixin that serves ``cached_actions`` through ``cached_response``.
+
+    Views describe what a response depends on by overriding ``get_cache_tags``.
+    """
+
+    cached_actions = ('list', 'retrieve')
+    cache_tags = ()
+    cache_timeout = None
+
+    def get_cache_tags(self):
+        return self.cache_tags
+
+    def list(self, request, *args, **kwargs):
+        render = lambda: super(CachedResponseMixin, self).list(request, *args, **kwargs)
+        if 'list' not in self.cached_actions:
+            return render()
+        return cached_response(request, render, self.get_cache_tags(), self.cache_timeout)
+
+    def retrieve(self, request, *args, **kwargs):
+        render = lambda: super(CachedResponseMixin, self).retrieve(request, *args, **kwargs)
+        if 'retrieve' not in self.cached_actions:
+            return render()
+        return cached_response(request, render, self.get_cache_tags(), self.cache_timeout)
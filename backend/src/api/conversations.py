@@ -0,0 +1,184 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Conversation, ConversationParticipant, Message
+
+
+def conversation_key(sender_id, receiver_id):
+    return (min(sender_id, receiver_id), max(sender_id, receiver_id))
+
+
+def unread_key(conversation_id, receiver_id, is_read):
+    """The counter an unread message contributes to, or ``None`` once read."""
+    if is_read or conversation_id is None:
+        return None
+    return (conversation_id, receiver_id)
+
+
+def _participants(conversations):
+    participants = []
+    for conversation in conversations:
+        users = {conversation.user_low_id, conversation.user_high_id}
+        for user_id in users:
+            participants.append(ConversationParticipant(
+                conversation=conversation, user_id=user_id,
+                other_user_id=next(iter(users - {user_id}), user_id),
+                last_message_at=conversation.last_message_at,
+            ))
+    return participants
+
+
+def _find(keys):
+    found = Conversation.objects.filter(
+        user_low_id__in={low for low, _ in keys},
+        user_high_id__in={high for _, high in keys},
+    )
+    return {
+        (conversation.user_low_id, conversation.user_high_id): conversation
+        for conversation in found
+        if (conversation.user_low_id, conversation.user_high_id) in keys
+    }
+
+
+def assign_conversations(messages):
+    """
+    Attach unsaved ``messages`` to the conversation of their sender and
+    receiver, creating conversations that do not exist yet.
+    """
+    keys = {
+        conversation_key(message.sender_id, message.receiver_id)
+        for message in messages if message.conversation_id is None
+    }
+    if not keys:
+        return
+    conversations = _find(keys)
+    missing = keys - set(conversations)
+    if missing:
+        now = timezone.now()
+        # Concurrent first messages may race to create the same pair.
+        Conversation.objects.bulk_create([
+            Conversation(user_low_id=low, user_high_id=high, last_message_at=now)
+            for low, high in missing
+        ], ignore_conflicts=True)
+        created = _find(missing)
+        ConversationParticipant.objects.bulk_create(
+            _participants(created.values()), ignore_conflicts=True
+        )
+        conversations.update(created)
+    for message in messages:
+        if message.conversation_id is None:
+            message.conversation = conversations[
+                conversation_key(message.sender_id, message.receiver_id)
+            ]
+
+
+def record_new_messages(messages):
+    """
+    Advance last-message pointers and receivers' unread counters for newly
+    saved ``messages``. Conversation rows are locked while they are updated.
+    """
+    latest = {}
+    unread = Counter()
+    for message in messages:
+        current = latest.get(message.conversation_id)
+        if current is None or (message.created_at, message.pk) > (current.created_at, current.pk):
+            latest[message.conversation_id] = message
+        if not message.is_read:
+            unread[(message.conversation_id, message.receiver_id)] += 1
+    if not latest:
+        return
+    with transaction.atomic():
+        conversations = list(
+            Conversation.objects.select_for_update().filter(pk__in=latest).order_by('pk')
+        )
+        advanced = set()
+        for conversation in conversations:
+            message = latest[conversation.pk]
+            if conversation.last_message_id is None or message.created_at >= conversation.last_message_at:
+                conversation.last_message = message
+                conversation.last_message_at = message.created_at
+                advanced.add(conversation.pk)
+        Conversation.objects.bulk_update(conversations, ['last_message', 'last_message_at'])
+        _set_participant_times({pk: latest[pk].created_at for pk in advanced})
+        # Counters are incremented in the database, so concurrent mark_read()
+        # and adjust_unread() calls are never overwritten.
+        participants = ConversationParticipant.objects.filter(
+            conversation_id__in={conversation_id for conversation_id, _ in unread}
+        ).values_list('pk', 'conversation_id', 'user_id')
+        by_delta = defaultdict(list)
+        for pk, conversation_id, user_id in participants:
+            delta = unread[(conversation_id, user_id)]
+            if delta:
+                by_delta[delta].append(pk)
+        for delta, pks in by_delta.items():
+            ConversationParticipant.objects.filter(pk__in=pks).update(
+                unread_count=F('unread_count') + delta
+            )
+
+
+def _set_participant_times(times):
+    """Apply ``{conversation_id: last_message_at}`` to the participants' inbox order."""
+    by_time = defaultdict(list)
+    for conversation_id, last_message_at in times.items():
+        by_time[last_message_at].append(conversation_id)
+    for last_message_at, conversation_ids in by_time.items():
+        ConversationParticipant.objects.filter(conversation_id__in=conversation_ids).update(
+            last_message_at=last_message_at
+        )
+
+
+def adjust_unread(deltas):
+    """Apply ``{(conversation_id, user_id): delta}`` to unread counters."""
+    for (conversation_id, user_id), delta in deltas.items():
+        if conversation_id is not None and delta:
+            ConversationParticipant.objects.filter(
+                conversation_id=conversation_id, user_id=user_id
+            ).update(unread_count=Greatest(F('unread_count') + delta, 0))
+
+
+def record_unread_changes(changes):
+    """Apply ``(old, new)`` pairs of ``unread_key`` values to the counters."""
+    deltas = Counter()
+    for old, new in changes:
+        if old == new:
+            continue
+        if old is not None:
+            deltas[old] -= 1
+        if new is not None:
+            deltas[new] += 1
+    adjust_unread(deltas)
+
+
+def refresh_last_message(conversation_ids):
+    """Re-point conversations at their newest remaining message."""
+    for conversation_id in conversation_ids:
+        last = (
+            Message.objects.filter(conversation_id=conversation_id)
+            .order_by('-created_at', '-id').only('id', 'created_at').first()
+        )
+        if last is None:
+            Conversation.objects.filter(pk=conversation_id).update(last_message=None)
+        else:
+            Conversation.objects.filter(pk=conversation_id).update(
+                last_message=last, last_message_at=last.created_at
+            )
+            _set_participant_times({conversation_id: last.created_at})
+
+
+def mark_read(participant):
+    """Mark every message to ``participant`` in its conversation read."""
+    with transaction.atomic():
+        updated = Message.objects.filter(
+            conversation_id=participant.conversation_id,
+            receiver_id=participant.user_id,
+            is_read=False,
+        ).update(is_read=True)
+        if updated:
+            ConversationParticipant.objects.filter(pk=participant.pk).update(
+                unread_count=Greatest(F('unread_count') - updated, 0)
+            )
+    return updated
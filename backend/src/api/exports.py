@@ -0,0 +1,123 @@
+import csv
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import Booking, MaintenanceRequest, Review
+
+CHUNK_SIZE = 2000
+
+
+class ExportSpec:
+    """
+    A streamable dataset: a model, the ``(header, lookup)`` columns projected
+    with ``values_list`` and the paths used for hostel and date filtering.
+    """
+
+    def __init__(self, model, columns, hostel_lookup, date_lookup, date_is_datetime):
+        self.model = model
+        self.columns = columns
+        self.hostel_lookup = hostel_lookup
+        self.date_lookup = date_lookup
+        self.date_is_datetime = date_is_datetime
+
+    @property
+    def headers(self):
+        return [header for header, _ in self.columns]
+
+    def queryset(self, user, hostel_id=None, date_from=None, date_to=None):
+        queryset = self.model.objects.all()
+        if not user.is_staff:
+            queryset = queryset.filter(**{f'{self.hostel_lookup}__manager': user})
+        if hostel_id is not None:
+            queryset = queryset.filter(**{f'{self.hostel_lookup}_id': hostel_id})
+        if date_from is not None:
+            queryset = queryset.filter(**{f'{self.date_lookup}__gte': self._bound(date_from)})
+        if date_to is not None:
+            # ``date_to`` is inclusive
+            queryset = queryset.filter(
+                **{f'{self.date_lookup}__lt': self._bound(date_to + timedelta(days=1))}
+            )
+        return queryset.order_by('pk').values_list(*(lookup for _, lookup in self.columns))
+
+    def _bound(self, day):
+        if self.date_is_datetime:
+            return timezone.make_aware(datetime.combine(day, time.min))
+        return day
+
+
+EXPORTS = {
+    'bookings': ExportSpec(
+        Booking,
+        [
+            ('id', 'id'), ('user_id', 'user_id'), ('username', 'user__username'),
+            ('hostel_id', 'room__hostel_id'), ('hostel_name', 'room__hostel__name'),
+            ('room_id', 'room_id'), ('room_number', 'room__room_number'),
+            ('check_in_date', 'check_in_date'), ('check_out_date', 'check_out_date'),
+            ('status', 'status'), ('total_price', 'total_price'),
+            ('special_requests', 'special_requests'),
+            ('created_at', 'created_at'), ('updated_at', 'updated_at'),
+        ],
+        hostel_lookup='room__hostel', date_lookup='check_in_date', date_is_datetime=False,
+    ),
+    'reviews': ExportSpec(
+        Review,
+        [
+            ('id', 'id'), ('user_id', 'user_id'), ('username', 'user__username'),
+            ('hostel_id', 'hostel_id'), ('hostel_name', 'hostel__name'),
+            ('rating', 'rating'), ('comment', 'comment'),
+            ('created_at', 'created_at'), ('updated_at', 'updated_at'),
+        ],
+        hostel_lookup='hostel', date_lookup='created_at', date_is_datetime=True,
+    ),
+    'maintenance-requests': ExportSpec(
+        MaintenanceRequest,
+        [
+            ('id', 'id'), ('user_id', 'user_id'), ('username', 'user__username'),
+            ('hostel_id', 'hostel_id'), ('hostel_name', 'hostel__name'),
+            ('title', 'title'), ('description', 'description'), ('status', 'status'),
+            ('created_at', 'created_at'), ('updated_at', 'updated_at'),
+        ],
+        hostel_lookup='hostel', date_lookup='created_at', date_is_datetime=True,
+    ),
+}
+
+
+class _Echo:
+    """File-like object whose ``write`` returns the value, for ``csv.writer``."""
+
+    def write(self, value):
+        return value
+
+
+# Spreadsheets run cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _cell(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # A leading quote makes spreadsheets show the text as written.
+        return f"'{value}"
+    return value
+
+
+def stream_csv(headers, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(headers)
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield writer.writerow([_cell(value) for value in row])
+
+
+def stream_ndjson(headers, rows):
+    encoder = DjangoJSONEncoder()
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield encoder.encode(dict(zip(headers, row))) + '\n'
+
+
+FORMATS = {
+    'csv': ('text/csv', stream_csv),
+    'ndjson': ('application/x-ndjson', stream_ndjson),
+}
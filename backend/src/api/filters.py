@@ -0,0 +1,289 @@
+from django.db.models import Count, F, Min, Q
+from django.db.models.functions import Lower
+from rest_framework import serializers
+
+from .amenities import normalize
+from .models import HostelAmenity, Room, RoomAmenity
+
+FACET_LIMIT = 30
+
+
+class Filter:
+    """
+    One filter group of a ``FilterSet``: parses its query parameters,
+    narrows a queryset, and counts the values of its facet.
+    """
+
+    faceted = True
+
+    def __init__(self, field):
+        self.field = field
+
+    def parse(self, name, params):
+        """Return the parsed value, or ``None`` when the filter is not in use."""
+        raise NotImplementedError
+
+    def apply(self, queryset, value):
+        raise NotImplementedError
+
+    def facet(self, queryset):
+        raise NotImplementedError
+
+
+def _split(params, name):
+    raw = params.get(name, '')
+    return [value.strip() for value in raw.split(',') if value.strip()]
+
+
+class ChoiceFilter(Filter):
+    """
+    ``?name=a,b`` matches either value; the facet counts rows per value.
+    ``partial`` filters match values containing the text, ignoring case.
+    """
+
+    def __init__(self, field, value_field=None, ignore_case=False, faceted=True, partial=False):
+        super().__init__(field)
+        self.value_field = value_field or serializers.CharField()
+        self.ignore_case = ignore_case or partial
+        self.faceted = faceted
+        self.partial = partial
+
+    def parse(self, name, params):
+        values = _split(params, name)
+        if not values:
+            return None
+        try:
+            values = [self.value_field.run_validation(value) for value in values]
+        except serializers.ValidationError as exc:
+            raise serializers.ValidationError({name: exc.detail})
+        return [value.lower() for value in values] if self.ignore_case else values
+
+    def _key(self, queryset):
+        if not self.ignore_case:
+            return queryset, self.field
+        key = f'{self.field}_key'
+        return queryset.alias(**{key: Lower(self.field)}), key
+
+    def apply(self, queryset, value):
+        if self.partial:
+            condition = Q()
+            for text in value:
+                condition |= Q(**{f'{self.field}__icontains': text})
+            return queryset.filter(condition)
+        queryset, key = self._key(queryset)
+        if len(value) == 1:
+            return queryset.filter(**{key: value[0]})
+        return queryset.filter(**{f'{key}__in': value})
+
+    def facet(self, queryset):
+        if self.ignore_case:
+            rows = (
+                queryset.order_by().annotate(facet_key=Lower(self.field)).values('facet_key')
+                .annotate(value=Min(self.field), count=Count('pk'))
+            )
+        else:
+            rows = queryset.order_by().values(value=F(self.field)).annotate(count=Count('pk'))
+        return [
+            {'value': row['value'], 'count': row['count']}
+            for row in rows.order_by('-count', 'value')[:FACET_LIMIT]
+        ]
+
+
+class RangeFilter(Filter):
+    """
+    ``?name_min=&name_max=``, both inclusive. The facet counts rows between
+    consecutive ``edges``; each bucket includes its ``min`` and excludes its
+    ``max``.
+    """
+
+    def __init__(self, field, value_field, edges=()):
+        super().__init__(field)
+        self.value_field = value_field
+        self.edges = list(edges)
+        self.faceted = bool(self.edges)
+
+    def parse(self, name, params):
+        bounds = {}
+        for bound in ('min', 'max'):
+            param = f'{name}_{bound}'
+            if params.get(param, '') != '':
+                try:
+                    bounds[bound] = self.value_field.run_validation(params[param])
+                except serializers.ValidationError as exc:
+                    raise serializers.ValidationError({param: exc.detail})
+        if 'min' in bounds and 'max' in bounds and bounds['max'] < bounds['min']:
+            raise serializers.ValidationError({f'{name}_max': 'Must not be less than the minimum.'})
+        return bounds or None
+
+    def apply(self, queryset, value):
+        lookups = {}
+        if 'min' in value:
+            lookups[f'{self.field}__gte'] = value['min']
+        if 'max' in value:
+            lookups[f'{self.field}__lte'] = value['max']
+        return queryset.filter(**lookups)
+
+    def _buckets(self):
+        bounds = [None] + self.edges + [None]
+        return list(zip(bounds, bounds[1:]))
+
+    def facet(self, queryset):
+        counts = {}
+        for index, (low, high) in enumerate(self._buckets()):
+            condition = Q()
+            if low is not None:
+                condition &= Q(**{f'{self.field}__gte': low})
+            if high is not None:
+                condition &= Q(**{f'{self.field}__lt': high})
+            counts[f'bucket_{index}'] = Count('pk', filter=condition)
+        # Every bucket is counted by the same aggregate query.
+        row = queryset.order_by().aggregate(**counts)
+        return [
+            {'min': low, 'max': high, 'count': row[f'bucket_{index}']}
+            for index, (low, high) in enumerate(self._buckets())
+        ]
+
+
+class AmenityFilter(Filter):
+    """
+    ``?amenities=wifi,parking`` keeps rows that have every amenity, using
+    the normalized link table rather than the JSON list.
+    """
+
+    def __init__(self, link_model, owner):
+        super().__init__('amenities')
+        self.link_model = link_model
+        self.owner = owner
+
+    def parse(self, name, params):
+        values = _split(params, name)
+        return sorted({normalize(value) for value in values}) or None
+
+    def apply(self, queryset, value):
+        for name in value:
+            queryset = queryset.filter(pk__in=self.link_model.objects.filter(
+                amenity__name=name
+            ).values(f'{self.owner}_id'))
+        return queryset
+
+    def facet(self, queryset):
+        rows = (
+            self.link_model.objects.filter(**{f'{self.owner}_id__in': queryset.order_by().values('pk')})
+            .values(value=F('amenity__name')).annotate(count=Count('pk'))
+            .order_by('-count', 'value')[:FACET_LIMIT]
+        )
+        return [{'value': row['value'], 'count': row['count']} for row in rows]
+
+
+class FilterSet:
+    """
+    Declarative filtering, sorting and facet counts for a list endpoint.
+
+    Subclasses declare ``filters`` (query parameter name -> ``Filter``) and
+    ``sorts`` (``?sort=`` value -> keyset ordering ending in a unique field).
+    Each facet is counted with every other active filter applied but not its
+    own, so clients can show how many rows each alternative would return.
+    """
+
+    filters = {}
+    sorts = {}
+    default_sort = None
+
+    def __init__(self, params):
+        self.values = {}
+        errors = {}
+        for name, filter_ in self.filters.items():
+            try:
+                value = filter_.parse(name, params)
+            except serializers.ValidationError as exc:
+                errors.update(exc.detail)
+                continue
+            if value is not None:
+                self.values[name] = value
+        self.sort = params.get('sort') or self.default_sort
+        if self.sort not in self.sorts:
+            errors['sort'] = [f'Choose one of: {", ".join(self.sorts)}.']
+        if errors:
+            raise serializers.ValidationError(errors)
+
+    @property
+    def ordering(self):
+        return self.sorts[self.sort]
+
+    def filter(self, queryset, skip=None):
+        for name, value in self.values.items():
+            if name != skip:
+                queryset = self.filters[name].apply(queryset, value)
+        return queryset
+
+    def facets(self, queryset):
+        return {
+            name: filter_.facet(self.filter(queryset, skip=name))
+            for name, filter_ in self.filters.items() if filter_.faceted
+        }
+
+
+class HostelFilterSet(FilterSet):
+    filters = {
+        'city': ChoiceFilter('city', partial=True),
+        # The whole name, which hostel_city_created_idx serves
+        'city_exact': ChoiceFilter('city', ignore_case=True, faceted=False),
+        'price': RangeFilter(
+            'price_per_night', serializers.DecimalField(max_digits=10, decimal_places=2),
+            edges=[50, 100, 200, 400],
+        ),
+        'rating': RangeFilter(
+            'rating_average', serializers.FloatField(min_value=0, max_value=5), edges=[2, 3, 4],
+        ),
+        'amenities': AmenityFilter(HostelAmenity, 'hostel'),
+    }
+    sorts = {
+        'newest': ('-created_at', '-id'),
+        'price': ('price_per_night', 'id'),
+        '-price': ('-price_per_night', '-id'),
+        '-rating': ('-rating_average', '-id'),
+    }
+    default_sort = 'newest'
+
+
+class RoomFilterSet(FilterSet):
+    filters = {
+        'hostel_id': ChoiceFilter('hostel_id', serializers.IntegerField(), faceted=False),
+        'room_type': ChoiceFilter('room_type', serializers.ChoiceField(Room.ROOM_TYPES)),
+        'capacity': RangeFilter('capacity', serializers.IntegerField(min_value=1), edges=[2, 3, 5]),
+        'price': RangeFilter(
+            'price_per_night', serializers.DecimalField(max_digits=10, decimal_places=2),
+            edges=[50, 100, 200, 400],
+        ),
+        'amenities': AmenityFilter(RoomAmenity, 'room'),
+    }
+    sorts = {
+        'id': ('id',),
+        'price': ('price_per_night', 'id'),
+        '-price': ('-price_per_night', '-id'),
+        'capacity': ('capacity', 'id'),
+        '-capacity': ('-capacity', '-id'),
+    }
+    default_sort = 'id'
+
+
+class ForumTopicFilterSet(FilterSet):
+    sorts = {
+        'new': ('-created_at', '-id'),
+        'active': ('-last_activity_at', '-id'),
+        'hot': ('-hot_score', '-id'),
+    }
+    default_sort = 'new'
+
+
+class CommunityPostFilterSet(FilterSet):
+    filters = {
+        'category_id': ChoiceFilter('category_id', serializers.IntegerField(), faceted=False),
+    }
+    # Pinned posts head every feed.
+    sorts = {
+        'new': ('-is_pinned', '-created_at', '-id'),
+        'active': ('-is_pinned', '-last_activity_at', '-id'),
+        'hot': ('-is_pinned', '-hot_score', '-id'),
+    }
+    default_sort = 'new'
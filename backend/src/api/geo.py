@@ -0,0 +1,107 @@
+import math
+from functools import reduce
+from operator import or_
+
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# Hostels are bucketed into a fixed lat/lng grid; a cell id is
+# ``row * GRID_COLUMNS + column``, so the cells of one grid row form a
+# contiguous id range. Changing the cell size requires rebuild_geo_cells.
+CELL_DEGREES = 0.05
+GRID_ROWS = round(180 / CELL_DEGREES)
+GRID_COLUMNS = round(360 / CELL_DEGREES)
+
+
+def _row(latitude):
+    return min(int((latitude + 90) // CELL_DEGREES), GRID_ROWS - 1)
+
+
+def _column(longitude):
+    return int((longitude + 180) // CELL_DEGREES) % GRID_COLUMNS
+
+
+def cell_for(latitude, longitude):
+    """Grid cell of a point, or ``None`` without coordinates."""
+    if latitude is None or longitude is None:
+        return None
+    return _row(latitude) * GRID_COLUMNS + _column(longitude)
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """``(south, north, west, east)`` of a circle; west > east across the antimeridian."""
+    delta_lat = radius_km / KM_PER_DEGREE
+    south, north = max(latitude - delta_lat, -90.0), min(latitude + delta_lat, 90.0)
+    widest = math.cos(math.radians(max(abs(south), abs(north))))
+    if widest < 1e-9 or radius_km / (KM_PER_DEGREE * widest) >= 180:
+        return south, north, -180.0, 180.0
+    delta_lng = radius_km / (KM_PER_DEGREE * widest)
+    west = (longitude - delta_lng + 180) % 360 - 180
+    east = (longitude + delta_lng + 180) % 360 - 180
+    return south, north, west, east
+
+
+def _column_ranges(west, east):
+    if (west, east) == (-180.0, 180.0):
+        return [(0, GRID_COLUMNS - 1)]
+    first, last = _column(west), _column(east)
+    if first <= last:
+        return [(first, last)]
+    return [(first, GRID_COLUMNS - 1), (0, last)]
+
+
+def within_box(south, north, west, east):
+    """
+    Filter for rows inside a bounding box: one cell-id range per grid row,
+    which the geo cell index answers without touching rows outside the box,
+    narrowed by the exact coordinates.
+    """
+    ranges = [
+        Q(geo_cell__range=(row * GRID_COLUMNS + first, row * GRID_COLUMNS + last))
+        for row in range(_row(south), _row(north) + 1)
+        for first, last in _column_ranges(west, east)
+    ]
+    longitude = (
+        Q(longitude__range=(west, east)) if west <= east
+        else Q(longitude__gte=west) | Q(longitude__lte=east)
+    )
+    return reduce(or_, ranges) & Q(latitude__range=(south, north)) & longitude
+
+
+def distance_km(latitude, longitude):
+    """Haversine distance from a point to each row, as a query expression."""
+    lat = Radians(F('latitude'))
+    origin_lat = math.radians(latitude)
+    half_dlat = (lat - Value(origin_lat)) / 2
+    half_dlng = (Radians(F('longitude')) - Value(math.radians(longitude))) / 2
+    haversine = (
+        Power(Sin(half_dlat), 2)
+        + Value(math.cos(origin_lat)) * Cos(lat) * Power(Sin(half_dlng), 2)
+    )
+    return Value(2 * EARTH_RADIUS_KM) * ASin(Sqrt(haversine), output_field=FloatField())
+
+
+def nearby(queryset, latitude, longitude, radius_km):
+    """Rows of ``queryset`` within ``radius_km``, annotated with ``distance_km``."""
+    return (
+        queryset.filter(within_box(*bounding_box(latitude, longitude, radius_km)))
+        .annotate(distance_km=distance_km(latitude, longitude))
+        .filter(distance_km__lte=radius_km)
+    )
+
+
+def rebuild_geo_cells(batch_size=1000):
+    """Recompute every hostel's grid cell; return how many changed."""
+    from .models import Hostel
+
+    changed = []
+    for hostel in Hostel.objects.only('latitude', 'longitude', 'geo_cell').iterator(chunk_size=batch_size):
+        cell = cell_for(hostel.latitude, hostel.longitude)
+        if cell != hostel.geo_cell:
+            hostel.geo_cell = cell
+            changed.append(hostel)
+    Hostel.objects.bulk_update(changed, ['geo_cell'], batch_size=batch_size)
+    return len(changed)
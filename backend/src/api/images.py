@@ -0,0 +1,204 @@
+import hashlib
+import logging
+import os
+import uuid
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .cache import invalidate
+from .models import Hostel, ImageAsset, Room, University
+from .tasks import enqueue_many, task
+
+logger = logging.getLogger(__name__)
+
+# name -> longest side in pixels
+DEFAULT_RENDITIONS = {'thumb': 160, 'card': 480, 'full': 1600}
+# Pillow format -> extension originals are stored under; nothing else is accepted
+ORIGINAL_FORMATS = {'JPEG': 'jpg', 'MPO': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+# Raised while decoding a file that will never render, so retrying is pointless
+INVALID_IMAGE_ERRORS = (UnidentifiedImageError, Image.DecompressionBombError, SyntaxError, ValueError)
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def get_renditions():
+    return getattr(settings, 'IMAGE_RENDITIONS', DEFAULT_RENDITIONS)
+
+
+def _encode(image, quality):
+    buffer = BytesIO()
+    image.save(buffer, 'WEBP', quality=quality, method=4)
+    return buffer.getvalue()
+
+
+def original_name(fileobj):
+    """
+    Check that ``fileobj`` holds an image in one of ``ORIGINAL_FORMATS`` and
+    return a new random file name with that format's extension. The client's
+    file name is never used, so an upload cannot choose how it is served.
+    """
+    try:
+        with Image.open(fileobj) as image:
+            image_format = image.format
+            image.verify()
+    except Exception as exc:
+        raise InvalidImage('Upload a valid JPEG, PNG, GIF or WebP image.') from exc
+    finally:
+        fileobj.seek(0)
+    if image_format not in ORIGINAL_FORMATS:
+        raise InvalidImage('Upload a valid JPEG, PNG, GIF or WebP image.')
+    return f'{uuid.uuid4().hex}.{ORIGINAL_FORMATS[image_format]}'
+
+
+def render(asset):
+    """Write every rendition of ``asset``; return ``(width, height, renditions)``."""
+    quality = getattr(settings, 'IMAGE_WEBP_QUALITY', 80)
+    renditions = {}
+    with asset.original.open('rb') as original:
+        image = Image.open(original)
+        # Let the JPEG decoder downscale while reading when it can.
+        image.draft('RGB', (max(get_renditions().values()),) * 2)
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+        width, height = image.size
+        # Largest first, so each rendition is resized from the previous one.
+        for name, size in sorted(get_renditions().items(), key=lambda item: -item[1]):
+            image = image.copy()
+            image.thumbnail((size, size), Image.LANCZOS)
+            rendition_width, rendition_height = image.size
+            data = _encode(image, quality)
+            digest = hashlib.sha256(data).hexdigest()[:16]
+            # Content-hashed names never change meaning, so they can be cached forever.
+            path = f'images/{asset.pk}/{name}-{digest}.webp'
+            if not default_storage.exists(path):
+                path = default_storage.save(path, ContentFile(data))
+            renditions[name] = {
+                'name': path, 'width': rendition_width, 'height': rendition_height,
+                'size': len(data),
+            }
+    return width, height, renditions
+
+
+def _invalidate_responses(asset_id):
+    hostel_ids = set(Hostel.objects.filter(
+        Q(cover_image_id=asset_id) | Q(gallery=asset_id)
+    ).values_list('pk', flat=True))
+    hostel_ids.update(Room.objects.filter(cover_image_id=asset_id).values_list('hostel_id', flat=True))
+    tags = [f'hostel:{hostel_id}' for hostel_id in hostel_ids]
+    if University.objects.filter(logo_image_id=asset_id).exists():
+        tags.append('universities')
+    if tags:
+        invalidate(*tags)
+
+
+@task(max_attempts=3, atomic=False)
+def process_image(asset_id):
+    """
+    Render one pending or failed asset. Safe to call from several workers.
+
+    An image that cannot be decoded fails for good; other errors (storage,
+    say) are raised again so the task is retried.
+    """
+    claimed = ImageAsset.objects.filter(
+        pk=asset_id, status__in=['PENDING', 'FAILED']
+    ).update(status='PROCESSING', updated_at=timezone.now())
+    if not claimed:
+        return
+    asset = ImageAsset.objects.get(pk=asset_id)
+    try:
+        width, height, renditions = render(asset)
+    except Exception as exc:
+        logger.exception('Could not process image %s', asset_id)
+        ImageAsset.objects.filter(pk=asset_id).update(
+            status='FAILED', error=str(exc), updated_at=timezone.now()
+        )
+        if isinstance(exc, INVALID_IMAGE_ERRORS):
+            return
+        raise
+    ImageAsset.objects.filter(pk=asset_id).update(
+        status='READY', width=width, height=height, renditions=renditions, error='',
+        updated_at=timezone.now(),
+    )
+    _invalidate_responses(asset_id)
+
+
+def schedule_processing(asset_ids):
+    """Queue assets for the task worker along with the current transaction."""
+    enqueue_many(process_image, [(None, {'asset_id': asset_id}) for asset_id in asset_ids])
+
+
+def delete_files(asset):
+    names = [rendition['name'] for rendition in asset.renditions.values()]
+    if asset.original:
+        names.append(asset.original.name)
+    for name in names:
+        default_storage.delete(name)
+
+
+# Resumable uploads
+def _upload_path(upload):
+    directory = getattr(settings, 'IMAGE_UPLOAD_TEMP_DIR', os.path.join(settings.MEDIA_ROOT, 'uploads'))
+    return os.path.join(directory, str(upload.pk))
+
+
+def uploaded_bytes(upload):
+    """Bytes actually on disk; a chunk cut off mid-way still counts."""
+    try:
+        return os.path.getsize(_upload_path(upload))
+    except FileNotFoundError:
+        return 0
+
+
+def append_chunk(upload, stream, start, length):
+    """
+    Write ``length`` bytes from ``stream`` at offset ``start`` and return the
+    new offset. The caller checks ``start`` against ``uploaded_bytes``.
+    """
+    path = _upload_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    written = 0
+    with open(path, 'r+b' if start else 'wb') as partial:
+        partial.seek(start)
+        partial.truncate()
+        while written < length:
+            block = stream.read(min(64 * 1024, length - written))
+            if not block:
+                break
+            partial.write(block)
+            written += len(block)
+    return start + written
+
+
+def finish_upload(upload):
+    """
+    Turn a complete upload into a pending ``ImageAsset``. Raises
+    ``InvalidImage`` if the bytes are not an accepted image.
+    """
+    path = _upload_path(upload)
+    with open(path, 'rb') as assembled:
+        name = original_name(assembled)
+        asset = ImageAsset(owner_id=upload.owner_id)
+        asset.original.save(name, File(assembled), save=False)
+    asset.save()
+    os.remove(path)
+    upload.asset = asset
+    upload.save(update_fields=['asset', 'updated_at'])
+    schedule_processing([asset.pk])
+    return asset
+
+
+def discard_upload(upload):
+    try:
+        os.remove(_upload_path(upload))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,117 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.utils import timezone
+
+from .models import Booking, MaintenanceRequest, RefreshToken, Task
+from .tasks import enqueue_many, task
+
+BOOKING_SUBJECTS = {
+    'PENDING': 'We received your booking request',
+    'CONFIRMED': 'Your booking is confirmed',
+    'CANCELLED': 'Your booking was cancelled',
+}
+
+
+def _send(subject, body, users):
+    recipients = [user.email for user in users if user.email]
+    if recipients:
+        send_mail(subject, body, None, recipients)
+
+
+@task()
+def send_booking_notification(booking_id, status):
+    booking = (
+        Booking.objects.select_related('user', 'room__hostel__manager')
+        .filter(pk=booking_id).first()
+    )
+    if booking is None:
+        return
+    room = booking.room
+    stay = f'{room.hostel.name}, room {room.room_number}, {booking.check_in_date} to {booking.check_out_date}'
+    _send(BOOKING_SUBJECTS[status], f'{BOOKING_SUBJECTS[status]}: {stay}.', [booking.user])
+    if status == 'PENDING':
+        _send(
+            'New booking request',
+            f'{booking.user.username} requested {stay}.', [room.hostel.manager],
+        )
+
+
+@task()
+def send_maintenance_notification(request_id, status):
+    request = (
+        MaintenanceRequest.objects.select_related('user', 'hostel__manager')
+        .filter(pk=request_id).first()
+    )
+    if request is None:
+        return
+    if status == 'PENDING':
+        _send(
+            f'New maintenance request: {request.title}',
+            f'{request.user.username} reported a problem at {request.hostel.name}:\n\n{request.description}',
+            [request.hostel.manager],
+        )
+    else:
+        label = dict(MaintenanceRequest.STATUS_CHOICES)[status]
+        _send(
+            f'Maintenance request updated: {request.title}',
+            f'Your maintenance request "{request.title}" is now {label.lower()}.', [request.user],
+        )
+
+
+def queue_booking_notifications(bookings):
+    """Queue one notification per booking status; repeats are ignored."""
+    enqueue_many(send_booking_notification, [
+        (f'booking-status:{booking.pk}:{booking.status}', {'booking_id': booking.pk, 'status': booking.status})
+        for booking in bookings if booking.status in BOOKING_SUBJECTS
+    ])
+
+
+def queue_maintenance_notifications(requests):
+    enqueue_many(send_maintenance_notification, [
+        (f'maintenance-status:{request.pk}:{request.status}', {'request_id': request.pk, 'status': request.status})
+        for request in requests
+    ])
+
+
+@task(atomic=False)
+def complete_past_bookings(batch_size=1000):
+    """Mark confirmed bookings whose stay has ended completed, in short batches."""
+    today = timezone.localdate()
+    completed = 0
+    while True:
+        batch = list(
+            Booking.objects.filter(status='CONFIRMED', check_out_date__lt=today)
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not batch:
+            return completed
+        completed += Booking.objects.filter(pk__in=batch, status='CONFIRMED').update(
+            status='COMPLETED', updated_at=timezone.now()
+        )
+
+
+@task()
+def delete_expired_refresh_tokens():
+    """Delete refresh tokens that can no longer be used."""
+    deleted, _ = RefreshToken.objects.filter(expires_at__lt=timezone.now()).delete()
+    return deleted
+
+
+@task(atomic=False)
+def delete_finished_tasks(batch_size=1000):
+    """
+    Delete done and failed tasks that finished more than
+    ``TASK_RETENTION_DAYS`` ago, in short batches.
+    """
+    cutoff = timezone.now() - timedelta(days=getattr(settings, 'TASK_RETENTION_DAYS', 7))
+    deleted = 0
+    while True:
+        batch = list(
+            Task.objects.filter(status__in=['DONE', 'FAILED'], finished_at__lt=cutoff)
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not batch:
+            return deleted
+        deleted += Task.objects.filter(pk__in=batch).delete()[0]
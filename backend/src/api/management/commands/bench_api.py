@@ -0,0 +1,145 @@
+import json
+import random
+import subprocess
+import time
+from datetime import date, timedelta
+from itertools import count
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from api.benchmark import CITIES, WORDS, generate_dataset, measure, rolled_back, unthrottled
+from api.models import Booking, ConversationParticipant, Review
+
+
+def scenarios(client, ids, user):
+    """``{name: callable making one request}`` for every benchmarked endpoint."""
+    rng = random.Random(1)
+    booking_ids = list(Booking.objects.filter(user=user).values_list('pk', flat=True)[:100])
+    review_ids = list(Review.objects.values_list('pk', flat=True)[:100])
+    conversation_ids = list(
+        ConversationParticipant.objects.filter(user=user).values_list('conversation_id', flat=True)[:100]
+    )
+    new_bookings = count()
+
+    def get(path, params=None):
+        return lambda: client.get(path() if callable(path) else path, params)
+
+    def create_booking():
+        # A different room for each request, so none of them conflict.
+        n = next(new_bookings)
+        check_in = date(2035, 1, 1) + timedelta(days=n % 300)
+        return client.post('/api/bookings/', {
+            'room_id': ids['room_ids'][n % len(ids['room_ids'])],
+            'check_in_date': check_in.isoformat(),
+            'check_out_date': (check_in + timedelta(days=3)).isoformat(),
+        }, content_type='application/json')
+
+    return {
+        'hostels.list': get('/api/hostels/'),
+        'hostels.list.filtered': get('/api/hostels/', {
+            'city': CITIES[0][0], 'price_max': 200, 'amenities': 'wifi', 'sort': 'price',
+        }),
+        'hostels.facets': get('/api/hostels/facets/', {'city': CITIES[0][0]}),
+        'hostels.detail': get(lambda: f'/api/hostels/{rng.choice(ids["hostel_ids"])}/'),
+        'hostels.nearby': get(lambda: f'/api/hostels/nearby/?university_id={rng.choice(ids["university_ids"])}'),
+        'rooms.list': get('/api/rooms/'),
+        'rooms.detail': get(lambda: f'/api/rooms/{rng.choice(ids["room_ids"])}/'),
+        'bookings.list': get('/api/bookings/'),
+        'bookings.detail': get(lambda: f'/api/bookings/{rng.choice(booking_ids)}/'),
+        'bookings.create': create_booking,
+        'reviews.list': get(lambda: f'/api/reviews/?hostel_id={rng.choice(ids["hostel_ids"])}'),
+        'reviews.detail': get(lambda: f'/api/reviews/{rng.choice(review_ids)}/'),
+        'messages.list': get('/api/messages/'),
+        'conversations.list': get('/api/conversations/'),
+        'conversations.messages': get(lambda: f'/api/conversations/{rng.choice(conversation_ids)}/messages/'),
+        'forum-topics.list': get('/api/forum-topics/'),
+        'forum-topics.hot': get('/api/forum-topics/', {'sort': 'hot'}),
+        'forum-topics.detail': get(lambda: f'/api/forum-topics/{rng.choice(ids["topic_ids"])}/'),
+        'forum-posts.list': get(lambda: f'/api/forum-posts/?topic_id={rng.choice(ids["topic_ids"])}'),
+        'community-posts.list': get(lambda: f'/api/community-posts/?category_id={rng.choice(ids["category_ids"])}'),
+        'community-posts.hot': get('/api/community-posts/', {'sort': 'hot'}),
+        'reference': get('/api/reference/'),
+        'search': get(lambda: f'/api/search/?q={rng.choice(WORDS)}'),
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _compare(results, baseline):
+    """Add the baseline numbers and the relative change to each scenario."""
+    for name, result in results.items():
+        before = baseline.get('scenarios', {}).get(name)
+        if before is None:
+            continue
+        result['baseline'] = {key: before.get(key) for key in ('p50', 'p95', 'p99', 'queries_per_request')}
+        result['change_percent'] = {
+            key: round((result[key] - before[key]) / before[key] * 100, 1)
+            for key in result['baseline'] if before.get(key) and result[key] is not None
+        }
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a synthetic dataset and report p50/p95/p99 latency and queries per '
+        'request of scripted API scenarios as JSON. Pass the JSON of an earlier run '
+        'with --baseline to compare commits. Seeded rows are rolled back unless '
+        '--keep is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1, help='Multiplies api.benchmark.DATASET.')
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--scenario', action='append', dest='scenarios', help='Only run this scenario. May be repeated.')
+        parser.add_argument('--warm-cache', action='store_true', help='Keep cached responses between requests.')
+        parser.add_argument('--output', help='Also write the report to this file.')
+        parser.add_argument('--baseline', help='Report from an earlier run to compare against.')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows.')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+        report = {
+            'commit': _commit(),
+            'scale': options['scale'],
+            'repeat': options['repeat'],
+            'warm_cache': options['warm_cache'],
+        }
+        with unthrottled(), rolled_back(keep=options['keep']):
+            start = time.perf_counter()
+            ids = generate_dataset(options['scale'], options['seed'])
+            report['seed_seconds'] = round(time.perf_counter() - start, 2)
+
+            user = User.objects.get(username='bench-guest-0')
+            client = Client(SERVER_NAME='localhost')
+            client.force_login(user)
+            available = scenarios(client, ids, user)
+            selected = options['scenarios'] or list(available)
+            unknown = set(selected) - set(available)
+            if unknown:
+                raise CommandError(f'Unknown scenario(s): {", ".join(sorted(unknown))}')
+            results = {}
+            for name in selected:
+                # One request to warm up the code path, then the measured ones.
+                available[name]()
+                results[name] = measure(available[name], options['repeat'], options['warm_cache'])
+            report['scenarios'] = results
+        if baseline is not None:
+            report['baseline_commit'] = baseline.get('commit')
+            _compare(results, baseline)
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        self.stdout.write(output)
@@ -0,0 +1,59 @@
+import base64
+import json
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from api.benchmark import percentiles, rolled_back, unthrottled
+from api.tokens import issue_tokens
+
+PASSWORD = 'bench-password'
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the CPU time per request of Basic, session and signed token '
+        'authentication on a cheap endpoint. The benchmark user is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--path', default='/api/profiles/')
+
+    def handle(self, *args, **options):
+        report = {'path': options['path'], 'repeat': options['repeat'], 'modes': {}}
+        with unthrottled(), rolled_back():
+            user = User.objects.create_user('bench-auth', password=PASSWORD)
+            basic = base64.b64encode(f'bench-auth:{PASSWORD}'.encode()).decode()
+            session = Client(SERVER_NAME='localhost')
+            session.force_login(user)
+            client = Client(SERVER_NAME='localhost')
+            # One token for every request, as a client would reuse it.
+            access = issue_tokens(user)['access']
+            modes = {
+                'basic': lambda: client.get(options['path'], HTTP_AUTHORIZATION=f'Basic {basic}'),
+                'session': lambda: session.get(options['path']),
+                'token': lambda: client.get(options['path'], HTTP_AUTHORIZATION=f'Bearer {access}'),
+            }
+            for name, request in modes.items():
+                if request().status_code != 200:
+                    raise CommandError(f'{name} authentication was rejected')
+                samples, queries = [], 0
+                cpu = time.process_time()
+                for _ in range(options['repeat']):
+                    with CaptureQueriesContext(connection) as captured:
+                        start = time.perf_counter()
+                        request()
+                        samples.append(time.perf_counter() - start)
+                    queries += len(captured)
+                cpu = time.process_time() - cpu
+                report['modes'][name] = {
+                    'cpu_ms_per_request': round(cpu / options['repeat'] * 1000, 3),
+                    **percentiles(samples),
+                    'queries_per_request': round(queries / options['repeat'], 2),
+                }
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,55 @@
+import json
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+
+from api.availability import available_rooms
+from api.benchmark import percentiles, rolled_back, seed_bookings, seed_hostels, timed, unthrottled
+from api.models import Room
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed hostels, rooms and a large booking history, then report the latency '
+        'of /api/rooms/available/. Seeded rows are rolled back unless --keep is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hostels', type=int, default=2_000)
+        parser.add_argument('--rooms-per-hostel', type=int, default=20)
+        parser.add_argument('--bookings', type=int, default=2_000_000)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows.')
+
+    def handle(self, *args, **options):
+        report = {key: options[key] for key in ('hostels', 'rooms_per_hostel', 'bookings')}
+        with unthrottled(), rolled_back(keep=options['keep']):
+            start = time.perf_counter()
+            hostel_ids = seed_hostels(options['hostels'], options['rooms_per_hostel'])
+            room_ids = list(Room.objects.filter(hostel_id__in=hostel_ids).values_list('pk', flat=True))
+            seed_bookings(options['bookings'], room_ids)
+            report['seed_seconds'] = round(time.perf_counter() - start, 2)
+
+            check_in = date.today() + timedelta(days=30)
+            check_out = check_in + timedelta(days=5)
+            hostel_id = hostel_ids[len(hostel_ids) // 2]
+            with connection.cursor() as cursor:
+                sql, params = available_rooms(check_in, check_out, hostel_id).query.sql_with_params()
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}' if connection.vendor == 'sqlite' else f'EXPLAIN {sql}', params)
+                report['plan'] = [' '.join(str(col) for col in row) for row in cursor.fetchall()]
+
+            query = lambda: list(available_rooms(check_in, check_out, hostel_id))
+            report['query'] = percentiles(timed(query, options['repeat']))
+
+            client = Client(SERVER_NAME='localhost')
+            client.force_login(User.objects.get(username='bench-manager'))
+            params = {'hostel_id': hostel_id, 'check_in': check_in, 'check_out': check_out}
+            if client.get('/api/rooms/available/', params).status_code != 200:
+                raise CommandError('/api/rooms/available/ did not return 200')
+            request = lambda: client.get('/api/rooms/available/', params)
+            report['endpoint'] = percentiles(timed(request, options['repeat']))
+        self.stdout.write(json.dumps(report, indent=2))
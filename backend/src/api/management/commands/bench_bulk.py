@@ -0,0 +1,58 @@
+import json
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from api.benchmark import rolled_back, seed_hostels, unthrottled
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare importing rooms one POST at a time with one POST to '
+        '/api/rooms/bulk/. Rows are rolled back unless --keep is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=10_000)
+        parser.add_argument(
+            '--single-sample', type=int, default=500,
+            help='Rooms to create one request at a time; the rate is extrapolated.',
+        )
+        parser.add_argument('--keep', action='store_true', help='Keep the created rows.')
+
+    def payload(self, hostel_id, count, prefix):
+        return [
+            {
+                'hostel': hostel_id, 'room_number': f'{prefix}{n}', 'room_type': 'DOUBLE',
+                'capacity': 2, 'price_per_night': '45.00', 'amenities': ['wifi', 'desk'],
+            }
+            for n in range(count)
+        ]
+
+    def handle(self, *args, **options):
+        report = {'rooms': options['rooms']}
+        with unthrottled(), rolled_back(keep=options['keep']):
+            hostel_id = seed_hostels(1, rooms_per_hostel=0)[0]
+            client = Client(SERVER_NAME='localhost')
+            client.force_login(User.objects.get(username='bench-manager'))
+
+            sample = self.payload(hostel_id, options['single_sample'], 'single-')
+            start = time.perf_counter()
+            for item in sample:
+                if client.post('/api/rooms/', item, content_type='application/json').status_code != 201:
+                    raise CommandError('POST /api/rooms/ failed')
+            elapsed = time.perf_counter() - start
+            report['single_rows_per_second'] = round(len(sample) / elapsed, 1)
+            report['single_estimated_seconds'] = round(options['rooms'] * elapsed / len(sample), 2)
+
+            rooms = self.payload(hostel_id, options['rooms'], 'bulk-')
+            start = time.perf_counter()
+            response = client.post('/api/rooms/bulk/', json.dumps(rooms), content_type='application/json')
+            elapsed = time.perf_counter() - start
+            if response.status_code != 201:
+                raise CommandError(f'POST /api/rooms/bulk/ returned {response.status_code}')
+            report['bulk_seconds'] = round(elapsed, 2)
+            report['bulk_rows_per_second'] = round(options['rooms'] / elapsed, 1)
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,139 @@
+import json
+import random
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, models
+from django.db.models.functions import Lower
+
+from api.availability import available_rooms
+from api.benchmark import (
+    CITIES, percentiles, rolled_back, seed_bookings, seed_community, seed_hostels,
+    seed_reviews, timed,
+)
+from api.models import Booking, CommunityComment, CommunityPost, Hostel, Review, Room
+
+# Indexes added by migration 0006, and the foreign key indexes it dropped
+# because a composite index now leads with the same column.
+PASS_INDEXES = [
+    (Hostel, 'hostel_active_created_idx'),
+    (Hostel, 'hostel_city_created_idx'),
+    (Review, 'review_hostel_created_idx'),
+    (CommunityPost, 'communitypost_category_idx'),
+    (CommunityComment, 'communitycomment_post_idx'),
+]
+DROPPED_FK_INDEXES = [
+    (Review, 'hostel'),
+    (CommunityPost, 'category'),
+    (CommunityComment, 'post'),
+    (Booking, 'user'),
+]
+
+
+def _index(model, name):
+    return next(index for index in model._meta.indexes if index.name == name)
+
+
+def _fk_index(model, field):
+    return models.Index(fields=[field], name=f'bench_{model._meta.model_name}_{field}'[:30])
+
+
+def _drop(index):
+    # Index.remove_sql() needs an entered schema editor, which SQLite refuses
+    # inside the benchmark transaction.
+    return f'DROP INDEX {connection.ops.quote_name(index.name)}'
+
+
+def _execute(statements):
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(str(statement))
+        cursor.execute('ANALYZE')
+
+
+def use_previous_indexes():
+    """Swap this pass's indexes for the single-column ones they replaced."""
+    editor = connection.schema_editor()
+    _execute(
+        [_drop(_index(model, name)) for model, name in PASS_INDEXES]
+        + [_fk_index(model, field).create_sql(model, editor) for model, field in DROPPED_FK_INDEXES]
+    )
+
+
+def use_current_indexes():
+    editor = connection.schema_editor()
+    _execute(
+        [_drop(_fk_index(model, field)) for model, field in DROPPED_FK_INDEXES]
+        + [_index(model, name).create_sql(model, editor) for model, name in PASS_INDEXES]
+    )
+
+
+def explain(queryset):
+    sql, params = queryset.query.sql_with_params()
+    prefix = 'EXPLAIN QUERY PLAN' if connection.vendor == 'sqlite' else 'EXPLAIN'
+    with connection.cursor() as cursor:
+        cursor.execute(f'{prefix} {sql}', params)
+        return [' '.join(str(col) for col in row) for row in cursor.fetchall()]
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a large dataset, then record EXPLAIN plans and latencies of the hot '
+        'list filters with the previous index set and with the current one. '
+        'Seeded rows and index changes are rolled back unless --keep is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hostels', type=int, default=50_000)
+        parser.add_argument('--bookings', type=int, default=500_000)
+        parser.add_argument('--reviews', type=int, default=500_000)
+        parser.add_argument('--posts', type=int, default=100_000)
+        parser.add_argument('--comments', type=int, default=500_000)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows.')
+
+    def handle(self, *args, **options):
+        report = {
+            key: options[key] for key in ('hostels', 'bookings', 'reviews', 'posts', 'comments')
+        }
+        with rolled_back(keep=options['keep']):
+            start = time.perf_counter()
+            hostel_ids = seed_hostels(options['hostels'], 5, inactive_ratio=0.7)
+            room_ids = list(Room.objects.filter(hostel_id__in=hostel_ids).values_list('pk', flat=True))
+            seed_bookings(options['bookings'], room_ids)
+            seed_reviews(options['reviews'], hostel_ids)
+            category_ids = seed_community(20, options['posts'], options['comments'])
+            report['seed_seconds'] = round(time.perf_counter() - start, 2)
+
+            rng = random.Random(1)
+            hostel_id = rng.choice(hostel_ids)
+            post_id = CommunityPost.objects.filter(category_id=category_ids[0]).values_list('pk', flat=True).first()
+            check_in = date.today() + timedelta(days=30)
+            queries = {
+                'hostel_list_active': lambda: Hostel.objects.filter(is_active=True)
+                    .order_by('-created_at', '-id')[:21],
+                'hostel_list_city': lambda: Hostel.objects.alias(city_key=Lower('city'))
+                    .filter(city_key=CITIES[0][0].lower()).order_by('-created_at', '-id')[:21],
+                'reviews_by_hostel': lambda: Review.objects.filter(hostel_id=hostel_id)
+                    .order_by('-created_at', '-id')[:21],
+                'community_posts_by_category': lambda: CommunityPost.objects
+                    .filter(category_id=category_ids[0])
+                    .order_by('-is_pinned', '-created_at', '-id')[:21],
+                'community_comments_by_post': lambda: CommunityComment.objects
+                    .filter(post_id=post_id).order_by('created_at', 'id')[:21],
+                'available_rooms_in_hostel': lambda: available_rooms(
+                    check_in, check_in + timedelta(days=5), hostel_id,
+                ),
+            }
+
+            results = {name: {} for name in queries}
+            for phase, prepare in (('before', use_previous_indexes), ('after', use_current_indexes)):
+                prepare()
+                for name, build in queries.items():
+                    results[name][phase] = {
+                        'plan': explain(build()),
+                        **percentiles(timed(lambda: list(build()), options['repeat'])),
+                    }
+            report['queries'] = results
+        self.stdout.write(json.dumps(report, indent=2))
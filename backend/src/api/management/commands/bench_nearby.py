@@ -0,0 +1,62 @@
+import json
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from api import geo
+from api.benchmark import CITY_CENTRES, percentiles, rolled_back, seed_hostels, timed, unthrottled
+from api.models import Hostel, University
+
+RADII_KM = [1, 5, 20, 50]
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed synthetic geolocated hostels and report /api/hostels/nearby/ latency '
+        'against a haversine scan of every hostel. Seeded rows are rolled back '
+        'unless --keep is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hostels', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows.')
+
+    def handle(self, *args, **options):
+        report = {'hostels': options['hostels'], 'radii': {}}
+        with unthrottled(), rolled_back(keep=options['keep']):
+            start = time.perf_counter()
+            seed_hostels(options['hostels'], rooms_per_hostel=1)
+            latitude, longitude = CITY_CENTRES['Legon']
+            university = University.objects.create(
+                name='Bench University', location='Legon', description='',
+                latitude=latitude, longitude=longitude,
+            )
+            report['seed_seconds'] = round(time.perf_counter() - start, 2)
+
+            client = Client(SERVER_NAME='localhost')
+            client.force_login(User.objects.get(username='bench-manager'))
+            url = '/api/hostels/nearby/'
+            active = Hostel.objects.filter(is_active=True)
+            for radius in RADII_KM:
+                params = {'university_id': university.pk, 'radius_km': radius}
+                response = client.get(url, params)
+                if response.status_code != 200:
+                    raise CommandError(f'{url} returned {response.status_code}')
+                indexed = geo.nearby(active, latitude, longitude, radius).order_by('distance_km', 'id')
+                # The same query without the grid cell filter.
+                scan = (
+                    active.annotate(distance_km=geo.distance_km(latitude, longitude))
+                    .filter(distance_km__lte=radius).order_by('distance_km', 'id')
+                )
+                box = geo.bounding_box(latitude, longitude, radius)
+                report['radii'][radius] = {
+                    'matches': indexed.count(),
+                    'candidates': active.filter(geo.within_box(*box)).count(),
+                    'endpoint': percentiles(timed(lambda: client.get(url, params), options['repeat'])),
+                    'indexed_query': percentiles(timed(lambda: list(indexed[:21]), options['repeat'])),
+                    'full_scan': percentiles(timed(lambda: list(scan[:21]), options['repeat'])),
+                }
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,48 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from api import search
+from api.benchmark import percentiles, rolled_back, seed_hostels, timed, unthrottled
+
+QUERIES = [
+    'accra', 'kumasi wifi', 'quiet study', 'modern hostel', 'gen', 'air cond',
+    'secure campus shuttle', 'rooftop garden lounge', 'legon furnished ensuite', 'zzzz',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a synthetic hostel corpus, build the search index and report '
+        '/api/search/ latency. Seeded rows are rolled back unless --keep is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hostels', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows.')
+
+    def handle(self, *args, **options):
+        report = {'hostels': options['hostels'], 'queries': {}}
+        with unthrottled(), rolled_back(keep=options['keep']):
+            start = time.perf_counter()
+            seed_hostels(options['hostels'])
+            report['seed_seconds'] = round(time.perf_counter() - start, 2)
+
+            start = time.perf_counter()
+            search.rebuild_index(search.HOSTEL)
+            report['index_seconds'] = round(time.perf_counter() - start, 2)
+
+            client = Client(SERVER_NAME='localhost')
+            response = client.get('/api/search/', {'q': QUERIES[0]})
+            if response.status_code != 200:
+                raise CommandError(f'/api/search/ returned {response.status_code}')
+            for query in QUERIES:
+                samples = timed(
+                    lambda: client.get('/api/search/', {'q': query, 'page_size': 20}),
+                    options['repeat'],
+                )
+                report['queries'][query] = percentiles(samples)
+        self.stdout.write(json.dumps(report, indent=2))
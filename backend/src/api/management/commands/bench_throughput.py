@@ -0,0 +1,128 @@
+import json
+import random
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client
+
+from api.benchmark import seed_hostels, unthrottled
+from api.models import Hostel, Message
+
+# (label, CONN_MAX_AGE, SQLite journal mode); the journal mode is ignored on PostgreSQL.
+PROFILES = [
+    ('per-request connections, rollback journal', 0, 'DELETE'),
+    ('persistent connections, rollback journal', 60, 'DELETE'),
+    ('persistent connections, WAL', 60, 'WAL'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive the API from several threads with a mix of hostel reads and '
+        'message writes, and report requests per second for each connection '
+        'profile. Seeded rows are deleted afterwards unless --keep is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hostels', type=int, default=5_000)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument('--write-ratio', type=float, default=0.1)
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows.')
+
+    def handle(self, *args, **options):
+        # Rows must be committed so that every thread's connection can see them.
+        first_hostel = (Hostel.objects.order_by('-pk').values_list('pk', flat=True).first() or 0) + 1
+        hostel_ids = seed_hostels(options['hostels'], rooms_per_hostel=1)
+        users = [
+            User.objects.get_or_create(username=f'bench-load-{n}')[0]
+            for n in range(options['threads'] + 1)
+        ]
+        settings_dict = connections.settings['default']
+        original = dict(settings_dict, OPTIONS=dict(settings_dict['OPTIONS']))
+        report = {
+            'vendor': connection.vendor,
+            'threads': options['threads'],
+            'write_ratio': options['write_ratio'],
+            'profiles': {},
+        }
+        try:
+            for label, max_age, journal_mode in PROFILES:
+                if connection.vendor == 'sqlite':
+                    self._set_journal_mode(settings_dict, journal_mode)
+                elif journal_mode != 'WAL':
+                    continue
+                settings_dict['CONN_MAX_AGE'] = max_age
+                with unthrottled():
+                    report['profiles'][label] = self._run(users, hostel_ids, options)
+        finally:
+            settings_dict.clear()
+            settings_dict.update(original)
+            if connection.vendor == 'sqlite':
+                self._set_journal_mode(settings_dict, None)
+            if not options['keep']:
+                Message.objects.filter(sender__in=users).delete()
+                Hostel.objects.filter(pk__gte=first_hostel).delete()
+                User.objects.filter(pk__in=[user.pk for user in users]).delete()
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def _set_journal_mode(self, settings_dict, journal_mode):
+        """Switch the database file's journal mode and the one new connections set."""
+        options = settings_dict['OPTIONS']
+        if journal_mode is not None:
+            options['init_command'] = f'PRAGMA journal_mode={journal_mode};PRAGMA synchronous=NORMAL;'
+        connection.close()
+        # The journal mode is stored in the database file, and WAL can only
+        # be left while no other connection is open.
+        with connection.cursor() as cursor:
+            cursor.execute(options['init_command'].split(';')[0])
+        connection.close()
+
+    def _run(self, users, hostel_ids, options):
+        deadline = time.perf_counter() + options['seconds']
+        counts = [{'reads': 0, 'writes': 0, 'errors': 0} for _ in range(options['threads'])]
+        ready = threading.Barrier(options['threads'])
+
+        def worker(index):
+            rng = random.Random(index)
+            client = Client(SERVER_NAME='localhost')
+            client.force_login(users[index])
+            receiver = users[-1]
+            ready.wait()
+            try:
+                while time.perf_counter() < deadline:
+                    try:
+                        if rng.random() < options['write_ratio']:
+                            response = client.post(
+                                '/api/messages/', {'receiver_id': receiver.pk, 'content': 'load test'},
+                                content_type='application/json',
+                            )
+                            kind = 'writes'
+                        elif rng.random() < 0.5:
+                            response = client.get('/api/hostels/', {'page_size': 20})
+                            kind = 'reads'
+                        else:
+                            response = client.get(f'/api/hostels/{rng.choice(hostel_ids)}/')
+                            kind = 'reads'
+                    except Exception:
+                        counts[index]['errors'] += 1
+                        continue
+                    counts[index][kind if response.status_code < 400 else 'errors'] += 1
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(options['threads'])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        totals = {key: sum(count[key] for count in counts) for key in counts[0]}
+        return {
+            **totals,
+            'requests_per_second': round((totals['reads'] + totals['writes']) / elapsed, 1),
+        }
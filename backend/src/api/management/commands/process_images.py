@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from api import images
+from api.models import ImageAsset
+
+
+class Command(BaseCommand):
+    help = (
+        'Render images the task worker did not finish: pending and failed ones, '
+        'and ones stuck processing (for example after a restart).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stuck-minutes', type=int, default=10,
+            help='Treat images processing for longer than this as abandoned.',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options['stuck_minutes'])
+        ImageAsset.objects.filter(status='PROCESSING', updated_at__lt=cutoff).update(status='PENDING')
+        asset_ids = ImageAsset.objects.filter(
+            Q(status='PENDING') | Q(status='FAILED')
+        ).values_list('pk', flat=True)
+        ready = failed = 0
+        for asset_id in asset_ids.iterator():
+            try:
+                images.process_image(asset_id)
+            except Exception as exc:
+                self.stderr.write(f'Image {asset_id}: {exc}')
+            if ImageAsset.objects.filter(pk=asset_id, status='READY').exists():
+                ready += 1
+            else:
+                failed += 1
+        self.stdout.write(self.style.SUCCESS(f'Processed {ready} image(s); {failed} failed.'))
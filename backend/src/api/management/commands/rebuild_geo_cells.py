@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.geo import rebuild_geo_cells
+
+
+class Command(BaseCommand):
+    help = 'Recompute the grid cell that indexes each hostel for /api/hostels/nearby/.'
+
+    def handle(self, *args, **options):
+        changed = rebuild_geo_cells()
+        self.stdout.write(self.style.SUCCESS(f'Updated the grid cell of {changed} hostel(s).'))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.ratings import find_rating_mismatches, rebuild_hostel_ratings
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized hostel rating aggregates from the Review table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Only report hostels whose stored aggregates are stale; exit non-zero if any are.',
+        )
+        parser.add_argument(
+            '--hostel', type=int, action='append', dest='hostel_ids',
+            help='Restrict to the given hostel id. May be repeated.',
+        )
+
+    def handle(self, *args, **options):
+        hostel_ids = options['hostel_ids']
+        if options['verify']:
+            mismatches = find_rating_mismatches(hostel_ids)
+            for hostel, expected in mismatches:
+                self.stdout.write(
+                    f'Hostel {hostel.pk}: stored {hostel.review_count} reviews / '
+                    f'sum {hostel.rating_sum}, expected {expected["review_count"]} / '
+                    f'{expected["rating_sum"]}'
+                )
+            if mismatches:
+                raise CommandError(f'{len(mismatches)} hostel(s) have stale rating aggregates.')
+            self.stdout.write(self.style.SUCCESS('All hostel rating aggregates are up to date.'))
+            return
+
+        fixed = rebuild_hostel_ratings(hostel_ids)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rating aggregates for {fixed} hostel(s).'))
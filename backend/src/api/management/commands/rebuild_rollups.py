@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.rollups import find_rollup_mismatches, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily hostel and room rollups from the Booking and Review tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Only report hostels whose stored rollups are stale; exit non-zero if any are.',
+        )
+        parser.add_argument(
+            '--hostel', type=int, action='append', dest='hostel_ids',
+            help='Restrict to the given hostel id. May be repeated.',
+        )
+
+    def handle(self, *args, **options):
+        hostel_ids = options['hostel_ids']
+        if options['verify']:
+            stale = find_rollup_mismatches(hostel_ids)
+            for hostel_id in stale:
+                self.stdout.write(f'Hostel {hostel_id}: stale daily rollups')
+            if stale:
+                raise CommandError(f'{len(stale)} hostel(s) have stale daily rollups.')
+            self.stdout.write(self.style.SUCCESS('All daily rollups are up to date.'))
+            return
+
+        written = rebuild_rollups(hostel_ids)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} daily rollup row(s).'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from api import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index from the Hostel, Room and University tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--type', choices=sorted(search.DOC_TYPES), action='append', dest='doc_types',
+            help='Only rebuild the given document type. May be repeated.',
+        )
+
+    def handle(self, *args, **options):
+        for doc_type in options['doc_types'] or sorted(search.DOC_TYPES):
+            count = search.rebuild_index(doc_type)
+            self.stdout.write(self.style.SUCCESS(f'Indexed {count} {doc_type} document(s).'))
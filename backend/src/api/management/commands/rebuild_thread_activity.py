@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.activity import THREADS, find_activity_mismatches, rebuild_activity
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the denormalized reply counts, last activity times and hot scores of '
+        'forum topics and community posts from their replies.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Only report threads whose stored counters are stale; exit non-zero if any are.',
+        )
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            stale = 0
+            for model in THREADS:
+                for thread, expected in find_activity_mismatches(model):
+                    stale += 1
+                    self.stdout.write(
+                        f'{model.__name__} {thread.pk}: stored {thread.reply_count} replies, '
+                        f'last activity {thread.last_activity_at:%Y-%m-%d %H:%M:%S}; expected '
+                        f'{expected["reply_count"]}, {expected["last_activity_at"]:%Y-%m-%d %H:%M:%S}'
+                    )
+            if stale:
+                raise CommandError(f'{stale} thread(s) have stale activity counters.')
+            self.stdout.write(self.style.SUCCESS('All thread activity counters are up to date.'))
+            return
+
+        for model in THREADS:
+            fixed = rebuild_activity(model)
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt activity counters for {fixed} {model.__name__}(s).'))
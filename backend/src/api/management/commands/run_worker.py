@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api import tasks
+
+
+class Command(BaseCommand):
+    help = (
+        'Run queued background tasks and queue the periodic ones in TASK_SCHEDULE. '
+        'Start several workers to run tasks in parallel.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit once no task is due.')
+        parser.add_argument('--batch', type=int, default=10, help='Tasks claimed at a time.')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when idle.')
+        parser.add_argument(
+            '--stale-seconds', type=int, default=600,
+            help='Requeue tasks that have been running for longer than this.',
+        )
+
+    def handle(self, *args, **options):
+        worker = tasks.worker_id()
+        succeeded = failed = 0
+        while True:
+            close_old_connections()
+            tasks.release_stale(options['stale_seconds'])
+            tasks.schedule_periodic()
+            claimed = tasks.claim(worker, options['batch'])
+            for task in claimed:
+                if tasks.run(task):
+                    succeeded += 1
+                else:
+                    failed += 1
+            if not claimed:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f'Ran {succeeded} task(s); {failed} failed.'))
@@ -0,0 +1,269 @@
+import logging
+import threading
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the request latency histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Statements kept for the slow request log
+SLOW_LOG_MAX_QUERIES = 50
+
+
+class RouteStats:
+    __slots__ = ('buckets', 'count', 'duration', 'queries', 'sql_seconds', 'serialize_seconds', 'bytes')
+
+    def __init__(self):
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.count = 0
+        self.duration = 0.0
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.bytes = 0
+
+
+class Registry:
+    """
+    Per-process request metrics, keyed by URL name and method. Every worker
+    process keeps its own, so scrape each of them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routes = {}
+        self.statuses = {}
+
+    def record(self, route, method, status, duration, queries, sql_seconds, serialize_seconds, size):
+        key = (route, method)
+        with self._lock:
+            stats = self.routes.get(key)
+            if stats is None:
+                stats = self.routes[key] = RouteStats()
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    stats.buckets[index] += 1
+                    break
+            stats.count += 1
+            stats.duration += duration
+            stats.queries += queries
+            stats.sql_seconds += sql_seconds
+            stats.serialize_seconds += serialize_seconds
+            stats.bytes += size
+            status_key = (route, method, str(status))
+            self.statuses[status_key] = self.statuses.get(status_key, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self.routes.clear()
+            self.statuses.clear()
+
+    def render(self):
+        """The metrics in the Prometheus text exposition format."""
+        with self._lock:
+            routes = {key: _copy(stats) for key, stats in self.routes.items()}
+            statuses = dict(self.statuses)
+        lines = [
+            '# HELP unistay_http_requests_total Requests handled.',
+            '# TYPE unistay_http_requests_total counter',
+        ]
+        for (route, method, status), count in sorted(statuses.items()):
+            lines.append(f'unistay_http_requests_total{_labels(route=route, method=method, status=status)} {count}')
+        lines += [
+            '# HELP unistay_http_request_duration_seconds Time to produce a response.',
+            '# TYPE unistay_http_request_duration_seconds histogram',
+        ]
+        for (route, method), stats in sorted(routes.items()):
+            cumulative = 0
+            for bound, count in zip(DURATION_BUCKETS, stats.buckets):
+                cumulative += count
+                lines.append(
+                    f'unistay_http_request_duration_seconds_bucket'
+                    f'{_labels(route=route, method=method, le=_number(bound))} {cumulative}'
+                )
+            labels = _labels(route=route, method=method)
+            lines += [
+                f'unistay_http_request_duration_seconds_bucket{_labels(route=route, method=method, le="+Inf")} {stats.count}',
+                f'unistay_http_request_duration_seconds_sum{labels} {_number(stats.duration)}',
+                f'unistay_http_request_duration_seconds_count{labels} {stats.count}',
+            ]
+        for name, kind, help_text, attribute in COUNTERS:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+            for (route, method), stats in sorted(routes.items()):
+                value = getattr(stats, attribute)
+                lines.append(f'{name}{_labels(route=route, method=method)} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+# (metric, type, help, RouteStats attribute)
+COUNTERS = [
+    ('unistay_http_db_queries_total', 'counter', 'SQL queries run while handling requests.', 'queries'),
+    ('unistay_http_db_seconds_total', 'counter', 'Time spent in SQL queries.', 'sql_seconds'),
+    ('unistay_http_serialize_seconds_total', 'counter', 'Time spent rendering response bodies.', 'serialize_seconds'),
+    ('unistay_http_response_bytes_total', 'counter', 'Size of response bodies.', 'bytes'),
+]
+
+
+def _copy(stats):
+    copy = RouteStats()
+    for attribute in RouteStats.__slots__:
+        value = getattr(stats, attribute)
+        setattr(copy, attribute, list(value) if isinstance(value, list) else value)
+    return copy
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry = Registry()
+
+
+class QueryRecorder:
+    """``execute_wrapper`` that counts and times queries, keeping the SQL when asked."""
+
+    def __init__(self, keep_sql):
+        self.keep_sql = keep_sql
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.seconds += elapsed
+            if self.keep_sql and len(self.statements) < SLOW_LOG_MAX_QUERIES:
+                self.statements.append((elapsed, sql))
+
+
+class MetricsMiddleware:
+    """
+    Records latency, SQL query count and time, render time and response
+    size for every request, labelled with the URL name and method. Requests
+    slower than ``METRICS_SLOW_REQUEST_SECONDS`` are logged with their SQL.
+
+    Streaming responses are measured until their body has been sent (or the
+    client went away), including the queries made while producing it. They
+    are left out of the slow request log, since event streams stay open.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def _recording(recorder):
+        stack = ExitStack()
+        for alias in settings.DATABASES:
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        return stack
+
+    def _start(self, request):
+        threshold = getattr(settings, 'METRICS_SLOW_REQUEST_SECONDS', None)
+        recorder = QueryRecorder(keep_sql=threshold is not None)
+        request._metrics_serialize_seconds = 0.0
+        return recorder, self._recording(recorder), threshold, time.perf_counter()
+
+    def _finish(self, request, response, recorder, threshold, start, size=None):
+        if response.streaming and size is None:
+            self._measure_stream(request, response, recorder, start)
+            return
+        duration = time.perf_counter() - start
+        match = request.resolver_match
+        route = match.view_name if match is not None else '<unmatched>'
+        registry.record(
+            route, request.method, response.status_code, duration, recorder.count,
+            recorder.seconds, request._metrics_serialize_seconds,
+            len(response.content) if size is None else size,
+        )
+        if threshold is not None and duration >= threshold:
+            logger.warning(
+                'Slow request: %s %s took %.3fs with %d queries (%.3fs)\n%s',
+                request.method, request.get_full_path(), duration, recorder.count, recorder.seconds,
+                '\n'.join(f'  {elapsed * 1000:.1f}ms {sql}' for elapsed, sql in recorder.statements),
+            )
+
+    def _measure_stream(self, request, response, recorder, start):
+        """Record the response once its body has been iterated."""
+        content = response.streaming_content
+        # Only the queries made while a chunk is produced are counted, so the
+        # wrappers are never left installed while the server has control.
+        if response.is_async:
+            async def measured():
+                size = 0
+                try:
+                    iterator = aiter(content)
+                    while True:
+                        with self._recording(recorder):
+                            try:
+                                chunk = await anext(iterator)
+                            except StopAsyncIteration:
+                                return
+                        size += len(chunk)
+                        yield chunk
+                finally:
+                    self._finish(request, response, recorder, None, start, size)
+        else:
+            def measured():
+                size = 0
+                try:
+                    iterator = iter(content)
+                    while True:
+                        with self._recording(recorder):
+                            try:
+                                chunk = next(iterator)
+                            except StopIteration:
+                                return
+                        size += len(chunk)
+                        yield chunk
+                finally:
+                    self._finish(request, response, recorder, None, start, size)
+        response.streaming_content = measured()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self._acall(request)
+        recorder, stack, threshold, start = self._start(request)
+        with stack:
+            response = self.get_response(request)
+        self._finish(request, response, recorder, threshold, start)
+        return response
+
+    async def _acall(self, request):
+        recorder, stack, threshold, start = self._start(request)
+        with stack:
+            response = await self.get_response(request)
+        self._finish(request, response, recorder, threshold, start)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after every process_template_response
+        # hook has run; time it from here to the post-render callback.
+        start = time.perf_counter()
+
+        def rendered(response):
+            request._metrics_serialize_seconds += time.perf_counter() - start
+
+        response.add_post_render_callback(rendered)
+        return response
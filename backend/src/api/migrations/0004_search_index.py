@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_cursor_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('doc_type', models.CharField(max_length=20)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('length', models.PositiveIntegerField()),
+            ],
+            options={
+                'unique_together': {('doc_type', 'object_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('doc_type', models.CharField(max_length=20)),
+                ('term', models.CharField(max_length=64)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('term_frequency', models.PositiveIntegerField()),
+                ('doc_length', models.PositiveIntegerField()),
+                ('impact', models.FloatField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['doc_type', 'term', '-impact', 'object_id', 'term_frequency', 'doc_length'], name='searchposting_term_idx'), models.Index(fields=['doc_type', 'object_id'], name='searchposting_doc_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('doc_type', models.CharField(max_length=20)),
+                ('term', models.CharField(max_length=64)),
+                ('document_frequency', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('doc_type', 'term')},
+            },
+        ),
+    ]
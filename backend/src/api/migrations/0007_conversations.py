@@ -0,0 +1,114 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Greatest, Least
+
+
+def backfill_conversations(apps, schema_editor):
+    Conversation = apps.get_model('api', 'Conversation')
+    ConversationParticipant = apps.get_model('api', 'ConversationParticipant')
+    Message = apps.get_model('api', 'Message')
+    pairs = (
+        Message.objects.order_by()
+        .annotate(low=Least('sender_id', 'receiver_id'), high=Greatest('sender_id', 'receiver_id'))
+        .values('low', 'high')
+    )
+    Conversation.objects.bulk_create([
+        Conversation(
+            user_low_id=row['low'], user_high_id=row['high'],
+            last_message_id=row['last_id'], last_message_at=row['last_at'],
+        )
+        for row in pairs.annotate(last_id=Max('id'), last_at=Max('created_at'))
+    ], batch_size=1000)
+    Message.objects.update(conversation_id=Subquery(
+        Conversation.objects.filter(
+            user_low_id=Least(OuterRef('sender_id'), OuterRef('receiver_id')),
+            user_high_id=Greatest(OuterRef('sender_id'), OuterRef('receiver_id')),
+        ).values('pk')[:1]
+    ))
+    unread = {
+        (row['conversation_id'], row['receiver_id']): row['unread']
+        for row in Message.objects.order_by().values('conversation_id', 'receiver_id')
+        .annotate(unread=Count('id', filter=Q(is_read=False)))
+    }
+    participants = []
+    for conversation in Conversation.objects.iterator():
+        users = {conversation.user_low_id, conversation.user_high_id}
+        for user_id in users:
+            other_id = next(iter(users - {user_id}), user_id)
+            participants.append(ConversationParticipant(
+                conversation_id=conversation.pk, user_id=user_id, other_user_id=other_id,
+                unread_count=unread.get((conversation.pk, user_id), 0),
+                last_message_at=conversation.last_message_at,
+            ))
+    ConversationParticipant.objects.bulk_create(participants, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationParticipant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('last_message_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_message_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.message')),
+                ('user_high', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user_low', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='conversation',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='api.conversation'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'created_at', 'id'], name='message_conversation_idx'),
+        ),
+        migrations.AddField(
+            model_name='conversationparticipant',
+            name='conversation',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participants', to='api.conversation'),
+        ),
+        migrations.AddField(
+            model_name='conversationparticipant',
+            name='other_user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='conversationparticipant',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='conversations', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='conversation',
+            unique_together={('user_low', 'user_high')},
+        ),
+        migrations.AddIndex(
+            model_name='conversationparticipant',
+            index=models.Index(fields=['user', 'last_message_at', 'id'], name='participant_inbox_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='conversationparticipant',
+            unique_together={('user', 'conversation')},
+        ),
+        migrations.RunPython(backfill_conversations, migrations.RunPython.noop),
+    ]
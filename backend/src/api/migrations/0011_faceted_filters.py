@@ -0,0 +1,124 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+
+
+def _normalize(name):
+    return ' '.join(str(name).split()).lower()[:100]
+
+
+def backfill(apps, schema_editor):
+    Amenity = apps.get_model('api', 'Amenity')
+    Hostel = apps.get_model('api', 'Hostel')
+    Room = apps.get_model('api', 'Room')
+    links = [
+        (Hostel, apps.get_model('api', 'HostelAmenity'), 'hostel_id'),
+        (Room, apps.get_model('api', 'RoomAmenity'), 'room_id'),
+    ]
+    Hostel.objects.filter(review_count__gt=0).update(
+        rating_average=Cast(F('rating_sum'), FloatField()) / F('review_count')
+    )
+    names = {}
+    for model, link_model, owner in links:
+        for owner_id, values in model.objects.values_list('pk', 'amenities').iterator(chunk_size=2000):
+            for value in values if isinstance(values, list) else []:
+                if isinstance(value, str) and value.strip():
+                    names.setdefault((model, _normalize(value)), set()).add(owner_id)
+    ids = {}
+    for _, name in names:
+        if name not in ids:
+            ids[name] = Amenity.objects.get_or_create(name=name)[0].pk
+    for model, link_model, owner in links:
+        link_model.objects.bulk_create([
+            link_model(**{owner: owner_id, 'amenity_id': ids[name]})
+            for (owner_model, name), owner_ids in names.items() if owner_model is model
+            for owner_id in owner_ids
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_geo_coordinates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Amenity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HostelAmenity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RoomAmenity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='hostel',
+            name='rating_average',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='hostel',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['price_per_night', 'id'], name='hostel_active_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hostel',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['rating_average', 'id'], name='hostel_active_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['price_per_night', 'id'], name='room_price_idx'),
+        ),
+        migrations.AddField(
+            model_name='hostelamenity',
+            name='amenity',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.amenity'),
+        ),
+        migrations.AddField(
+            model_name='hostelamenity',
+            name='hostel',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='amenity_links', to='api.hostel'),
+        ),
+        migrations.AddField(
+            model_name='roomamenity',
+            name='amenity',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.amenity'),
+        ),
+        migrations.AddField(
+            model_name='roomamenity',
+            name='room',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='amenity_links', to='api.room'),
+        ),
+        migrations.AddIndex(
+            model_name='hostelamenity',
+            index=models.Index(fields=['amenity', 'hostel'], name='hostelamenity_amenity_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='hostelamenity',
+            unique_together={('hostel', 'amenity')},
+        ),
+        migrations.AddIndex(
+            model_name='roomamenity',
+            index=models.Index(fields=['amenity', 'room'], name='roomamenity_amenity_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='roomamenity',
+            unique_together={('room', 'amenity')},
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:31
+
+import math
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+# api.activity.HOT_DECAY_SECONDS when this migration was written
+HOT_DECAY_SECONDS = 12 * 3600
+
+
+def backfill_thread_activity(apps, schema_editor):
+    for model_name, replies in (('ForumTopic', 'posts'), ('CommunityPost', 'comments')):
+        model = apps.get_model('api', model_name)
+        rows = model.objects.order_by().values('pk', 'created_at').annotate(
+            counted=Count(replies), latest=Max(f'{replies}__created_at'),
+        )
+        threads = []
+        for row in rows.iterator():
+            created_at = row['created_at']
+            threads.append(model(
+                pk=row['pk'],
+                reply_count=row['counted'],
+                last_activity_at=max(row['latest'] or created_at, created_at),
+                hot_score=math.log10(1 + row['counted']) + created_at.timestamp() / HOT_DECAY_SECONDS,
+            ))
+        model.objects.bulk_update(threads, ['reply_count', 'last_activity_at', 'hot_score'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_faceted_filters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='communitypost',
+            name='hot_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='communitypost',
+            name='last_activity_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='communitypost',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='forumtopic',
+            name='hot_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='forumtopic',
+            name='last_activity_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='forumtopic',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='communitypost',
+            index=models.Index(fields=['is_pinned', 'last_activity_at', 'id'], name='communitypost_activity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='communitypost',
+            index=models.Index(fields=['is_pinned', 'hot_score', 'id'], name='communitypost_hot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='communitypost',
+            index=models.Index(fields=['category', 'is_pinned', 'last_activity_at', 'id'], name='communitypost_cat_activity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='communitypost',
+            index=models.Index(fields=['category', 'is_pinned', 'hot_score', 'id'], name='communitypost_cat_hot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='forumtopic',
+            index=models.Index(fields=['last_activity_at', 'id'], name='forumtopic_activity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='forumtopic',
+            index=models.Index(fields=['hot_score', 'id'], name='forumtopic_hot_idx'),
+        ),
+        migrations.RunPython(backfill_thread_activity, migrations.RunPython.noop),
+    ]
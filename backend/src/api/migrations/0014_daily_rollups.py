@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_refresh_tokens'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HostelDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('nights_booked', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('cancellations', models.IntegerField(default=0)),
+                ('reviews_1_count', models.IntegerField(default=0)),
+                ('reviews_2_count', models.IntegerField(default=0)),
+                ('reviews_3_count', models.IntegerField(default=0)),
+                ('reviews_4_count', models.IntegerField(default=0)),
+                ('reviews_5_count', models.IntegerField(default=0)),
+                ('hostel', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='api.hostel')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('hostel', 'date'), name='hosteldailystats_hostel_date_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RoomDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('nights_booked', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('cancellations', models.IntegerField(default=0)),
+                ('room', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='api.room')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('room', 'date'), name='roomdailystats_room_date_uniq')],
+            },
+        ),
+    ]
@@ -1,6 +1,10 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db.models.functions import Lower
+from django.utils import timezone
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -9,6 +13,9 @@ class Profile(models.Model):
     birth_date = models.DateField(null=True, blank=True)
     phone_number = models.CharField(max_length=15, blank=True)
     profile_picture = models.ImageField(upload_to='profile_pics/', null=True, blank=True)
+    picture = models.ForeignKey(
+        'ImageAsset', on_delete=models.SET_NULL, related_name='+', null=True, blank=True
+    )
     is_manager = models.BooleanField(default=False)
     is_admin = models.BooleanField(default=False)
     
@@ -31,10 +38,71 @@ class Hostel(models.Model):
     amenities = models.JSONField(default=list)
     rules = models.JSONField(default=list)
     images = models.JSONField(default=list)  # List of image URLs
+    cover_image = models.ForeignKey(
+        'ImageAsset', on_delete=models.SET_NULL, related_name='+', null=True, blank=True
+    )
+    gallery = models.ManyToManyField('ImageAsset', related_name='+', blank=True)
+    latitude = models.FloatField(
+        null=True, blank=True, validators=[MinValueValidator(-90), MaxValueValidator(90)]
+    )
+    longitude = models.FloatField(
+        null=True, blank=True, validators=[MinValueValidator(-180), MaxValueValidator(180)]
+    )
+    # Grid cell of the coordinates, maintained by api.geo
+    geo_cell = models.BigIntegerField(null=True, blank=True, editable=False)
+    # Rating aggregates, maintained by api.ratings from Review writes
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_average = models.FloatField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='hostel_created_idx'),
+            models.Index(
+                fields=['created_at', 'id'],
+                condition=models.Q(is_active=True),
+                name='hostel_active_created_idx',
+            ),
+            models.Index(Lower('city'), 'created_at', 'id', name='hostel_city_created_idx'),
+            models.Index(
+                fields=['price_per_night', 'id'],
+                condition=models.Q(is_active=True),
+                name='hostel_active_price_idx',
+            ),
+            models.Index(
+                fields=['rating_average', 'id'],
+                condition=models.Q(is_active=True),
+                name='hostel_active_rating_idx',
+            ),
+            # Not partial: SQLite cannot use a partial index for the OR of
+            # cell ranges that api.geo queries with.
+            models.Index(
+                fields=['geo_cell', 'is_active', 'price_per_night', 'latitude', 'longitude'],
+                name='hostel_geo_cell_idx',
+            ),
+        ]
     
     def __str__(self):
         return self.name
 
+    @property
+    def average_rating(self):
+        if not self.review_count:
+            return 0
+        return self.rating_sum / self.review_count
+
+    @property
+    def rating_histogram(self):
+        return {
+            rating: getattr(self, f'rating_{rating}_count')
+            for rating in range(1, 6)
+        }
+
 class Room(models.Model):
     ROOM_TYPES = [
         ('SINGLE', 'Single Room'),
@@ -52,10 +120,45 @@ class Room(models.Model):
     is_available = models.BooleanField(default=True)
     amenities = models.JSONField(default=list)
     images = models.JSONField(default=list)
+    cover_image = models.ForeignKey(
+        'ImageAsset', on_delete=models.SET_NULL, related_name='+', null=True, blank=True
+    )
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['price_per_night', 'id'], name='room_price_idx'),
+        ]
     
     def __str__(self):
         return f'{self.hostel.name} - Room {self.room_number}'
 
+# Normalized copies of the amenities JSON lists, maintained by api.amenities
+class Amenity(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    
+    def __str__(self):
+        return self.name
+
+class HostelAmenity(models.Model):
+    hostel = models.ForeignKey(Hostel, on_delete=models.CASCADE, related_name='amenity_links', db_index=False)
+    amenity = models.ForeignKey(Amenity, on_delete=models.CASCADE, related_name='+', db_index=False)
+
+    class Meta:
+        unique_together = ('hostel', 'amenity')
+        indexes = [
+            models.Index(fields=['amenity', 'hostel'], name='hostelamenity_amenity_idx'),
+        ]
+
+class RoomAmenity(models.Model):
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='amenity_links', db_index=False)
+    amenity = models.ForeignKey(Amenity, on_delete=models.CASCADE, related_name='+', db_index=False)
+
+    class Meta:
+        unique_together = ('room', 'amenity')
+        indexes = [
+            models.Index(fields=['amenity', 'room'], name='roomamenity_amenity_idx'),
+        ]
+
 class Booking(models.Model):
     STATUS_CHOICES = [
         ('PENDING', 'Pending'),
@@ -64,7 +167,7 @@ class Booking(models.Model):
         ('COMPLETED', 'Completed'),
     ]
     
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bookings')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bookings', db_index=False)
     room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='bookings')
     check_in_date = models.DateField()
     check_out_date = models.DateField()
@@ -73,17 +176,38 @@ class Booking(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     special_requests = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='booking_user_created_idx'),
+            models.Index(
+                fields=['room', 'check_out_date', 'check_in_date'],
+                condition=~models.Q(status='CANCELLED'),
+                name='booking_room_dates_idx',
+            ),
+            models.Index(
+                fields=['check_out_date'],
+                condition=models.Q(status='CONFIRMED'),
+                name='booking_confirmed_checkout_idx',
+            ),
+        ]
     
     def __str__(self):
         return f'Booking {self.id} - {self.user.username}'
 
 class Review(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reviews')
-    hostel = models.ForeignKey(Hostel, on_delete=models.CASCADE, related_name='reviews')
+    hostel = models.ForeignKey(Hostel, on_delete=models.CASCADE, related_name='reviews', db_index=False)
     rating = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])
     comment = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='review_created_idx'),
+            models.Index(fields=['hostel', 'created_at', 'id'], name='review_hostel_created_idx'),
+        ]
     
     def __str__(self):
         return f'Review by {self.user.username} for {self.hostel.name}'
@@ -95,20 +219,68 @@ class Favorite(models.Model):
     
     class Meta:
         unique_together = ('user', 'hostel')
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='favorite_user_created_idx'),
+        ]
     
     def __str__(self):
         return f'{self.user.username} - {self.hostel.name}'
 
 class Message(models.Model):
-    sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_messages')
-    receiver = models.ForeignKey(User, on_delete=models.CASCADE, related_name='received_messages')
+    sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_messages', db_index=False)
+    receiver = models.ForeignKey(User, on_delete=models.CASCADE, related_name='received_messages', db_index=False)
+    conversation = models.ForeignKey(
+        'Conversation', on_delete=models.CASCADE, related_name='messages',
+        null=True, blank=True, db_index=False
+    )
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sender', 'created_at', 'id'], name='message_sender_created_idx'),
+            models.Index(fields=['receiver', 'created_at', 'id'], name='message_receiver_created_idx'),
+            models.Index(fields=['conversation', 'created_at', 'id'], name='message_conversation_idx'),
+        ]
     
     def __str__(self):
         return f'Message from {self.sender.username} to {self.receiver.username}'
 
+class Conversation(models.Model):
+    # The two participants, stored so that user_low_id <= user_high_id
+    user_low = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    user_high = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    # Maintained by api.conversations from Message writes
+    last_message = models.ForeignKey(
+        Message, on_delete=models.SET_NULL, related_name='+', null=True, blank=True
+    )
+    last_message_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user_low', 'user_high')
+    
+    def __str__(self):
+        return f'Conversation between {self.user_low_id} and {self.user_high_id}'
+
+class ConversationParticipant(models.Model):
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='participants')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='conversations', db_index=False)
+    other_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    # Maintained by api.conversations from Message writes
+    unread_count = models.PositiveIntegerField(default=0)
+    last_message_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'conversation')
+        indexes = [
+            models.Index(fields=['user', 'last_message_at', 'id'], name='participant_inbox_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.user_id} in conversation {self.conversation_id}'
+
 class MaintenanceRequest(models.Model):
     STATUS_CHOICES = [
         ('PENDING', 'Pending'),
@@ -117,13 +289,18 @@ class MaintenanceRequest(models.Model):
         ('CANCELLED', 'Cancelled'),
     ]
     
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='maintenance_requests')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='maintenance_requests', db_index=False)
     hostel = models.ForeignKey(Hostel, on_delete=models.CASCADE, related_name='maintenance_requests')
     title = models.CharField(max_length=200)
     description = models.TextField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='maintenance_user_created_idx'),
+        ]
     
     def __str__(self):
         return f'Maintenance Request: {self.title}'
@@ -135,16 +312,32 @@ class ForumTopic(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
+    # Maintained by api.activity from ForumPost writes
+    reply_count = models.PositiveIntegerField(default=0)
+    last_activity_at = models.DateTimeField(default=timezone.now)
+    hot_score = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='forumtopic_created_idx'),
+            models.Index(fields=['last_activity_at', 'id'], name='forumtopic_activity_idx'),
+            models.Index(fields=['hot_score', 'id'], name='forumtopic_hot_idx'),
+        ]
     
     def __str__(self):
         return self.title
 
 class ForumPost(models.Model):
-    topic = models.ForeignKey(ForumTopic, on_delete=models.CASCADE, related_name='posts')
+    topic = models.ForeignKey(ForumTopic, on_delete=models.CASCADE, related_name='posts', db_index=False)
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='forum_posts')
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['topic', 'created_at', 'id'], name='forumpost_topic_created_idx'),
+        ]
     
     def __str__(self):
         return f'Post by {self.author.username} in {self.topic.title}'
@@ -155,6 +348,15 @@ class University(models.Model):
     description = models.TextField()
     website = models.URLField(blank=True)
     logo = models.ImageField(upload_to='university_logos/', null=True, blank=True)
+    logo_image = models.ForeignKey(
+        'ImageAsset', on_delete=models.SET_NULL, related_name='+', null=True, blank=True
+    )
+    latitude = models.FloatField(
+        null=True, blank=True, validators=[MinValueValidator(-90), MaxValueValidator(90)]
+    )
+    longitude = models.FloatField(
+        null=True, blank=True, validators=[MinValueValidator(-180), MaxValueValidator(180)]
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -172,7 +374,7 @@ class CommunityCategory(models.Model):
         return self.name
 
 class CommunityPost(models.Model):
-    category = models.ForeignKey(CommunityCategory, on_delete=models.CASCADE, related_name='posts')
+    category = models.ForeignKey(CommunityCategory, on_delete=models.CASCADE, related_name='posts', db_index=False)
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='community_posts')
     title = models.CharField(max_length=200)
     content = models.TextField()
@@ -180,16 +382,220 @@ class CommunityPost(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_pinned = models.BooleanField(default=False)
     is_closed = models.BooleanField(default=False)
+    # Maintained by api.activity from CommunityComment writes
+    reply_count = models.PositiveIntegerField(default=0)
+    last_activity_at = models.DateTimeField(default=timezone.now)
+    hot_score = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_pinned', 'created_at', 'id'], name='communitypost_feed_idx'),
+            models.Index(
+                fields=['category', 'is_pinned', 'created_at', 'id'],
+                name='communitypost_category_idx',
+            ),
+            models.Index(fields=['is_pinned', 'last_activity_at', 'id'], name='communitypost_activity_idx'),
+            models.Index(fields=['is_pinned', 'hot_score', 'id'], name='communitypost_hot_idx'),
+            models.Index(
+                fields=['category', 'is_pinned', 'last_activity_at', 'id'],
+                name='communitypost_cat_activity_idx',
+            ),
+            models.Index(
+                fields=['category', 'is_pinned', 'hot_score', 'id'],
+                name='communitypost_cat_hot_idx',
+            ),
+        ]
     
     def __str__(self):
         return self.title
 
 class CommunityComment(models.Model):
-    post = models.ForeignKey(CommunityPost, on_delete=models.CASCADE, related_name='comments')
+    post = models.ForeignKey(CommunityPost, on_delete=models.CASCADE, related_name='comments', db_index=False)
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='community_comments')
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created_at', 'id'], name='communitycomment_post_idx'),
+        ]
     
     def __str__(self):
         return f'Comment by {self.author.username} on {self.post.title}'
+
+# Uploaded images, resized into renditions by api.images
+class ImageAsset(models.Model):
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('PROCESSING', 'Processing'),
+        ('READY', 'Ready'),
+        ('FAILED', 'Failed'),
+    ]
+    
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='images')
+    original = models.ImageField(upload_to='images/originals/')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    # {name: {'name': storage path, 'width': ..., 'height': ..., 'size': ...}}
+    renditions = models.JSONField(default=dict)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f'Image {self.pk} ({self.status})'
+
+class ImageUpload(models.Model):
+    """A resumable upload; chunks are appended until ``received == size``."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='image_uploads')
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    asset = models.ForeignKey(
+        ImageAsset, on_delete=models.SET_NULL, related_name='+', null=True, blank=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f'Upload {self.pk} ({self.received}/{self.size})'
+
+# Daily rollups for the manager dashboard, maintained by api.rollups from
+# Booking and Review writes. Counters are signed so writes never fail on
+# rollups that have not been backfilled yet.
+class RoomDailyStats(models.Model):
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='daily_stats', db_index=False)
+    date = models.DateField()
+    nights_booked = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    cancellations = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['room', 'date'], name='roomdailystats_room_date_uniq'),
+        ]
+
+    def __str__(self):
+        return f'Room {self.room_id} on {self.date}'
+
+class HostelDailyStats(models.Model):
+    hostel = models.ForeignKey(Hostel, on_delete=models.CASCADE, related_name='daily_stats', db_index=False)
+    date = models.DateField()
+    nights_booked = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    cancellations = models.IntegerField(default=0)
+    reviews_1_count = models.IntegerField(default=0)
+    reviews_2_count = models.IntegerField(default=0)
+    reviews_3_count = models.IntegerField(default=0)
+    reviews_4_count = models.IntegerField(default=0)
+    reviews_5_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['hostel', 'date'], name='hosteldailystats_hostel_date_uniq'),
+        ]
+
+    def __str__(self):
+        return f'Hostel {self.hostel_id} on {self.date}'
+
+# Refresh tokens issued by api.tokens; access tokens are stateless
+class RefreshToken(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='refresh_tokens')
+    # Every token rotated from one login shares a family
+    family = models.UUIDField(db_index=True)
+    expires_at = models.DateTimeField()
+    revoked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'revoked_at'], name='refreshtoken_user_idx'),
+            models.Index(fields=['expires_at'], name='refreshtoken_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f'Refresh token {self.pk} for user {self.user_id}'
+
+# Background tasks, run by the run_worker command (see api.tasks)
+class Task(models.Model):
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+    
+    name = models.CharField(max_length=200)
+    kwargs = models.JSONField(default=dict)
+    # Enqueueing the same key twice is a no-op
+    idempotency_key = models.CharField(max_length=200, unique=True, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    run_at = models.DateTimeField()
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    last_error = models.TextField(blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['run_at', 'id'], condition=models.Q(status='PENDING'), name='task_due_idx'
+            ),
+            models.Index(
+                fields=['locked_at'], condition=models.Q(status='RUNNING'), name='task_running_idx'
+            ),
+        ]
+    
+    def __str__(self):
+        return f'{self.name} ({self.status})'
+
+# Full-text search index, maintained by api.search
+class SearchDocument(models.Model):
+    doc_type = models.CharField(max_length=20)
+    object_id = models.PositiveBigIntegerField()
+    length = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('doc_type', 'object_id')
+
+    def __str__(self):
+        return f'{self.doc_type} {self.object_id}'
+
+class SearchTerm(models.Model):
+    doc_type = models.CharField(max_length=20)
+    term = models.CharField(max_length=64)
+    document_frequency = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('doc_type', 'term')
+
+    def __str__(self):
+        return self.term
+
+class SearchPosting(models.Model):
+    doc_type = models.CharField(max_length=20)
+    term = models.CharField(max_length=64)
+    object_id = models.PositiveBigIntegerField()
+    term_frequency = models.PositiveIntegerField()
+    doc_length = models.PositiveIntegerField()
+    impact = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['doc_type', 'term', '-impact', 'object_id', 'term_frequency', 'doc_length'],
+                name='searchposting_term_idx',
+            ),
+            models.Index(fields=['doc_type', 'object_id'], name='searchposting_doc_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.term} -> {self.doc_type} {self.object_id}'
@@ -0,0 +1,178 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import reduce
+from operator import and_, or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class LinkedPagination(BasePagination):
+    """Shared page-size handling and ``{next, previous, results}`` envelope."""
+
+    page_size_query_param = 'page_size'
+    page_size = 20
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class KeysetPagination(LinkedPagination):
+    """
+    Keyset (seek) pagination over a composite ordering.
+
+    Each page is fetched with a ``WHERE (a, b, id) < (...)`` style predicate on
+    the last row of the previous page, so the cost of a page does not grow with
+    its depth. Views may set ``cursor_ordering`` to override the default key;
+    the last field must be unique.
+    """
+
+    cursor_query_param = 'cursor'
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = getattr(view, 'cursor_ordering', self.ordering)
+        self.fields = [
+            (name.lstrip('-'), name.startswith('-')) for name in self.ordering
+        ]
+        model = queryset.model
+
+        position, reverse = self.decode_cursor(request, model)
+        ordering = self.ordering if not reverse else [
+            name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering
+        ]
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(position, reverse))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.next_position = self.previous_position = None
+        if rows:
+            if has_more or reverse:
+                self.next_position = self.position_of(rows[-1])
+            if position is not None and (has_more or not reverse):
+                self.previous_position = self.position_of(rows[0])
+        return rows
+
+    def seek_filter(self, position, reverse):
+        clauses = []
+        for index, (name, descending) in enumerate(self.fields):
+            before = descending != reverse
+            lookup = f'{name}__lt' if before else f'{name}__gt'
+            equal = [Q(**{field: value}) for (field, _), value in zip(self.fields[:index], position)]
+            clauses.append(reduce(and_, equal + [Q(**{lookup: position[index]})]))
+        return reduce(or_, clauses)
+
+    def position_of(self, row):
+        if isinstance(row, dict):
+            return [row[name] for name, _ in self.fields]
+        return [getattr(row, name) for name, _ in self.fields]
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            values = payload['p']
+            if len(values) != len(self.fields):
+                raise ValueError
+            position = [
+                model._meta.get_field(name).to_python(value)
+                for (name, _), value in zip(self.fields, values)
+            ]
+            return position, bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, ValidationError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position, reverse):
+        values = [
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in position
+        ]
+        payload = {'p': values}
+        if reverse:
+            payload['r'] = 1
+        encoded = urlsafe_b64encode(json.dumps(payload, default=str).encode()).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+
+class RankedPagination(LinkedPagination):
+    """
+    Page-number pagination for ranked results that cannot be keyset-paginated.
+
+    The fetch callable returns rows for ``(offset, limit)``; one extra row is
+    requested to decide whether a next page exists, so no COUNT is issued.
+    """
+
+    page_query_param = 'page'
+    max_page = 50
+
+    def paginate_ranked(self, fetch, request):
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        try:
+            self.page = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            raise NotFound('Invalid page')
+        if not 1 <= self.page <= self.max_page:
+            raise NotFound('Invalid page')
+        rows = fetch((self.page - 1) * self.page_size, self.page_size + 1)
+        self.has_next = len(rows) > self.page_size and self.page < self.max_page
+        return rows[:self.page_size]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(self.base_url, self.page_query_param, self.page + 1)
+
+    def get_previous_link(self):
+        if self.page == 1:
+            return None
+        return replace_query_param(self.base_url, self.page_query_param, self.page - 1)
@@ -0,0 +1,72 @@
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+def _relation(model, name):
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+    return field if field.is_relation else None
+
+
+def _walk(serializer, model, prefix, select, prefetch):
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*' or '.' in field.source:
+            continue
+        relation = _relation(model, field.source)
+        if relation is None:
+            continue
+        path = prefix + field.source
+        if isinstance(field, serializers.ListSerializer):
+            prefetch.append((path, relation.related_model, type(field.child)))
+        elif isinstance(field, serializers.BaseSerializer):
+            if relation.many_to_many or relation.one_to_many:
+                continue
+            select.append(path)
+            _walk(field, relation.related_model, path + '__', select, prefetch)
+        elif isinstance(field, serializers.ManyRelatedField):
+            prefetch.append((path, relation.related_model, None))
+
+
+@lru_cache(maxsize=None)
+def get_prefetch_plan(serializer_class):
+    """
+    Return ``(select_related, prefetch_related)`` lookups for a serializer.
+
+    Nested single-object serializers become ``select_related`` joins; nested
+    ``many=True`` serializers and many-related fields become prefetches whose
+    entries are ``(lookup, related_model, child_serializer_class)``.
+    """
+    select, prefetch = [], []
+    _walk(serializer_class(), serializer_class.Meta.model, '', select, prefetch)
+    return tuple(select), tuple(prefetch)
+
+
+def apply_prefetch_plan(queryset, serializer_class):
+    select, prefetch = get_prefetch_plan(serializer_class)
+    if select:
+        queryset = queryset.select_related(*select)
+    lookups = []
+    for path, model, child_class in prefetch:
+        related = model._default_manager.all()
+        if child_class is not None:
+            related = apply_prefetch_plan(related, child_class)
+        lookups.append(Prefetch(path, queryset=related))
+    if lookups:
+        queryset = queryset.prefetch_related(*lookups)
+    return queryset
+
+
+class PrefetchPlanMixin:
+    """
+    Viewset mixin that loads everything the serializer renders up front, so
+    list and detail responses run a fixed number of queries.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return apply_prefetch_plan(queryset, self.get_serializer_class())
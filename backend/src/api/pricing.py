@@ -0,0 +1,105 @@
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .models import Room
+
+CENT = Decimal('0.01')
+
+
+class PricingRule:
+    """
+    Base class for pricing rules.
+
+    Rules are listed by dotted path (optionally with keyword arguments) in
+    ``settings.PRICING_RULES`` and applied in order to each night's rate.
+    """
+
+    def adjust(self, room, night, rate):
+        return rate
+
+
+class SeasonalRateRule(PricingRule):
+    """
+    Multiply the nightly rate inside recurring seasons.
+
+    ``seasons`` is a list of ``(start, end, multiplier)`` where ``start`` and
+    ``end`` are inclusive ``'MM-DD'`` strings; a season may wrap the new year.
+    """
+
+    def __init__(self, seasons):
+        self.seasons = [
+            (start, end, Decimal(str(multiplier))) for start, end, multiplier in seasons
+        ]
+
+    def adjust(self, room, night, rate):
+        day = night.strftime('%m-%d')
+        for start, end, multiplier in self.seasons:
+            in_season = start <= day <= end if start <= end else (day >= start or day <= end)
+            if in_season:
+                return rate * multiplier
+        return rate
+
+
+@lru_cache(maxsize=None)
+def get_pricing_rules():
+    rules = []
+    for entry in getattr(settings, 'PRICING_RULES', []):
+        if isinstance(entry, str):
+            entry = {'class': entry}
+        options = {key: value for key, value in entry.items() if key != 'class'}
+        rules.append(import_string(entry['class'])(**options))
+    return tuple(rules)
+
+
+@receiver(setting_changed)
+def reset_pricing_rules(setting, **kwargs):
+    if setting == 'PRICING_RULES':
+        get_pricing_rules.cache_clear()
+
+
+@dataclass(frozen=True)
+class Quote:
+    room_id: int
+    check_in: date
+    check_out: date
+    nights: int
+    total_price: Decimal
+
+
+def quote(room, check_in, check_out):
+    """Price a stay of ``room`` from ``check_in`` up to (not including) ``check_out``."""
+    nights = (check_out - check_in).days
+    rules = get_pricing_rules()
+    total = Decimal('0')
+    for offset in range(nights):
+        rate = room.price_per_night
+        night = check_in + timedelta(days=offset)
+        for rule in rules:
+            rate = rule.adjust(room, night, rate)
+        total += rate
+    return Quote(
+        room_id=room.pk, check_in=check_in, check_out=check_out, nights=nights,
+        total_price=total.quantize(CENT, rounding=ROUND_HALF_UP),
+    )
+
+
+def quote_many(stays):
+    """
+    Price many ``(room_id, check_in, check_out)`` stays with one room query.
+
+    Returns a list aligned with ``stays``; unknown rooms yield ``None``.
+    """
+    rooms = Room.objects.only('id', 'hostel_id', 'room_type', 'price_per_night').in_bulk(
+        {room_id for room_id, _, _ in stays}
+    )
+    return [
+        quote(rooms[room_id], check_in, check_out) if room_id in rooms else None
+        for room_id, check_in, check_out in stays
+    ]
@@ -0,0 +1,192 @@
+from functools import lru_cache
+from operator import itemgetter
+from types import SimpleNamespace
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from .models import Hostel
+from .prefetch import apply_prefetch_plan
+
+# Model properties a values() plan can compute: (model, property) -> the
+# fields the property reads.
+PROPERTY_FIELDS = {
+    (Hostel, 'average_rating'): ('rating_sum', 'review_count'),
+    (Hostel, 'rating_histogram'): tuple(f'rating_{rating}_count' for rating in range(1, 6)),
+}
+
+# Field types whose to_representation() returns database values unchanged
+IDENTITY_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.BooleanField)
+
+
+class Unsupported(Exception):
+    pass
+
+
+def _model_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+def _converting(lookup, convert):
+    def get(row):
+        value = row[lookup]
+        return None if value is None else convert(value)
+    return get
+
+
+def _property(fget, lookups, convert):
+    def get(row):
+        value = fget(SimpleNamespace(**{name: row[lookup] for name, lookup in lookups}))
+        return None if value is None else convert(value)
+    return get
+
+
+class ValuesPlan:
+    """
+    How to build a serializer's output from ``.values()`` rows instead of
+    model instances.
+
+    Plain model fields, primary-key relations, properties listed in
+    ``PROPERTY_FIELDS`` and nested single-object serializers made of those
+    are read straight from the row. Other nested single-object serializers
+    (such as images, whose URLs depend on the request) are rendered once
+    per distinct object by the serializer itself. Anything else makes the
+    serializer unsupported.
+    """
+
+    def __init__(self, serializer_class):
+        self.lookups = []
+        # (lookup of the related id, path of field names to the nested serializer)
+        self.deferred = []
+        self.nodes = self._compile(serializer_class(), serializer_class.Meta.model, '', ())
+
+    def _lookup(self, lookup):
+        if lookup not in self.lookups:
+            self.lookups.append(lookup)
+        return lookup
+
+    def _compile(self, serializer, model, prefix, path):
+        nodes = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            source = field.source
+            if source == '*' or '.' in source or isinstance(field, (
+                serializers.SerializerMethodField, serializers.ListSerializer,
+                serializers.ManyRelatedField, serializers.FileField,
+            )):
+                raise Unsupported(name)
+            model_field = _model_field(model, source)
+            if isinstance(field, serializers.BaseSerializer):
+                if not isinstance(field, serializers.ModelSerializer) or model_field is None \
+                        or not (model_field.many_to_one or model_field.one_to_one) or not model_field.concrete:
+                    raise Unsupported(name)
+                id_lookup = self._lookup(prefix + source)
+                marks = len(self.lookups), len(self.deferred)
+                try:
+                    nodes.append(('nested', name, id_lookup, self._compile(
+                        field, model_field.related_model, f'{prefix}{source}__', path + (name,)
+                    )))
+                except Unsupported:
+                    del self.lookups[marks[0]:], self.deferred[marks[1]:]
+                    self.deferred.append((id_lookup, path + (name,)))
+                    nodes.append(('deferred', name, id_lookup, len(self.deferred) - 1))
+            elif isinstance(field, serializers.RelatedField):
+                if not isinstance(field, serializers.PrimaryKeyRelatedField) or field.pk_field is not None \
+                        or model_field is None or not model_field.concrete:
+                    raise Unsupported(name)
+                nodes.append(('get', name, self._lookup(prefix + source)))
+            elif model_field is not None and model_field.concrete and not model_field.is_relation:
+                lookup = self._lookup(prefix + source)
+                if type(field) in IDENTITY_FIELDS:
+                    nodes.append(('get', name, lookup))
+                else:
+                    nodes.append(('convert', name, lookup, field))
+            elif (model, source) in PROPERTY_FIELDS:
+                lookups = [(dep, self._lookup(prefix + dep)) for dep in PROPERTY_FIELDS[(model, source)]]
+                nodes.append(('property', name, getattr(model, source).fget, lookups, field))
+            else:
+                raise Unsupported(name)
+        return nodes
+
+    def _load_deferred(self, serializer, rows):
+        results = []
+        for id_lookup, path in self.deferred:
+            field = serializer
+            for name in path:
+                field = field.fields[name]
+            ids = {row[id_lookup] for row in rows} - {None}
+            objects = apply_prefetch_plan(
+                type(field).Meta.model._default_manager.all(), type(field)
+            ).in_bulk(ids) if ids else {}
+            results.append({pk: field.to_representation(obj) for pk, obj in objects.items()})
+        return results
+
+    def _bind(self, nodes, serializer, deferred):
+        getters = []
+        for node in nodes:
+            kind, name = node[0], node[1]
+            if kind == 'get':
+                getter = itemgetter(node[2])
+            elif kind == 'convert':
+                getter = _converting(node[2], node[3].to_representation)
+            elif kind == 'property':
+                getter = _property(node[2], node[3], node[4].to_representation)
+            elif kind == 'nested':
+                getter = self._nested(node[2], self._bind(node[3], serializer, deferred))
+            else:
+                getter = _converting(node[2], deferred[node[3]].get)
+            getters.append((name, getter))
+        return getters
+
+    @staticmethod
+    def _nested(id_lookup, getters):
+        def get(row):
+            if row[id_lookup] is None:
+                return None
+            return {name: getter(row) for name, getter in getters}
+        return get
+
+    def render(self, rows, serializer):
+        """Serialize ``rows``; ``serializer`` is an instance with the request context."""
+        getters = self._bind(self.nodes, serializer, self._load_deferred(serializer, rows))
+        return [{name: getter(row) for name, getter in getters} for row in rows]
+
+
+@lru_cache(maxsize=None)
+def get_values_plan(serializer_class):
+    """The ``ValuesPlan`` of a serializer class, or ``None`` if it needs instances."""
+    try:
+        return ValuesPlan(serializer_class)
+    except Unsupported:
+        return None
+
+
+class ValuesListMixin:
+    """
+    Viewset mixin that serves list actions from ``.values()`` rows when the
+    list serializer has a ``ValuesPlan``. The JSON is the same as the
+    serializer's; everything else still goes through the serializer.
+    """
+
+    def list(self, request, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
+        plan = get_values_plan(serializer_class)
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset()).select_related(None).prefetch_related(None)
+        # Keyset pagination reads the ordering columns of the last row.
+        ordering = getattr(self, 'cursor_ordering', getattr(self.paginator, 'ordering', ()))
+        lookups = plan.lookups + [name.lstrip('-') for name in ordering if name.lstrip('-') not in plan.lookups]
+        rows = self.paginate_queryset(queryset.values(*lookups))
+        data = plan.render(
+            rows if rows is not None else list(queryset.values(*lookups)),
+            serializer_class(context=self.get_serializer_context()),
+        )
+        if rows is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
@@ -0,0 +1,88 @@
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Q, Sum
+from django.db.models.functions import Cast, Greatest
+
+from .models import Hostel, Review
+
+RATING_VALUES = range(1, 6)
+AGGREGATE_FIELDS = ['review_count', 'rating_sum', 'rating_average'] + [
+    f'rating_{rating}_count' for rating in RATING_VALUES
+]
+
+
+def _apply(hostel_id, rating, sign):
+    if hostel_id is None or rating not in RATING_VALUES:
+        return
+    Hostel.objects.filter(pk=hostel_id).update(**{
+        'review_count': F('review_count') + sign,
+        'rating_sum': F('rating_sum') + sign * rating,
+        # Every right-hand side reads the row as it was before the update.
+        'rating_average': Cast(F('rating_sum') + sign * rating, FloatField())
+            / Greatest(F('review_count') + sign, 1),
+        f'rating_{rating}_count': F(f'rating_{rating}_count') + sign,
+    })
+
+
+def record_review_change(old, new):
+    """
+    Move a review's contribution from ``old`` to ``new``.
+
+    Both arguments are ``(hostel_id, rating)`` pairs; pass ``None`` for the
+    side that does not exist (a create or a delete).
+    """
+    if old == new:
+        return
+    with transaction.atomic():
+        if old is not None:
+            _apply(*old, sign=-1)
+        if new is not None:
+            _apply(*new, sign=1)
+
+
+def compute_hostel_ratings(hostel_ids=None):
+    """Return ``{hostel_id: {field: value}}`` computed from the Review table."""
+    reviews = Review.objects.all()
+    if hostel_ids is not None:
+        reviews = reviews.filter(hostel_id__in=hostel_ids)
+    histogram = {
+        f'rating_{rating}_count': Count('id', filter=Q(rating=rating))
+        for rating in RATING_VALUES
+    }
+    rows = (
+        reviews.order_by()
+        .values('hostel_id')
+        .annotate(review_count=Count('id'), rating_sum=Sum('rating'), **histogram)
+    )
+    ratings = {}
+    for row in rows:
+        row['rating_average'] = row['rating_sum'] / row['review_count']
+        ratings[row.pop('hostel_id')] = row
+    return ratings
+
+
+def find_rating_mismatches(hostel_ids=None):
+    """Return ``(hostel, expected)`` pairs whose stored aggregates are stale."""
+    expected = compute_hostel_ratings(hostel_ids)
+    empty = dict.fromkeys(AGGREGATE_FIELDS, 0)
+    hostels = Hostel.objects.only('id', *AGGREGATE_FIELDS)
+    if hostel_ids is not None:
+        hostels = hostels.filter(pk__in=hostel_ids)
+    mismatches = []
+    for hostel in hostels.iterator(chunk_size=2000):
+        values = expected.get(hostel.pk, empty)
+        if any(getattr(hostel, field) != values[field] for field in AGGREGATE_FIELDS):
+            mismatches.append((hostel, values))
+    return mismatches
+
+
+def rebuild_hostel_ratings(hostel_ids=None, batch_size=500):
+    """Recompute stale aggregates from scratch; return the number of hostels fixed."""
+    with transaction.atomic():
+        mismatches = find_rating_mismatches(hostel_ids)
+        for hostel, values in mismatches:
+            for field, value in values.items():
+                setattr(hostel, field, value)
+        Hostel.objects.bulk_update(
+            [hostel for hostel, _ in mismatches], AGGREGATE_FIELDS, batch_size=batch_size
+        )
+    return len(mismatches)
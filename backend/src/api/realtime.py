@@ -0,0 +1,151 @@
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework.utils.encoders import JSONEncoder
+
+logger = logging.getLogger(__name__)
+
+
+class ChannelLayer:
+    """
+    Base class for realtime channel layers.
+
+    ``publish`` is called from synchronous code (views, signals) and must not
+    block on subscribers. ``subscribe`` is an async context manager yielding
+    an object whose ``get()`` coroutine returns the next payload.
+    """
+
+    def publish(self, channel, payload):
+        raise NotImplementedError
+
+    def subscribe(self, channel):
+        raise NotImplementedError
+
+
+class InMemoryChannelLayer(ChannelLayer):
+    """
+    Delivers to subscribers in the current process only; use it for local
+    development or a single ASGI worker.
+    """
+
+    def __init__(self, queue_size=1000):
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, payload):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, payload)
+            except RuntimeError:
+                # The subscriber's event loop has already closed.
+                pass
+
+    @staticmethod
+    def _offer(queue, payload):
+        try:
+            queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            # A stalled client misses events; it catches up on reconnect.
+            pass
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        entry = (asyncio.get_running_loop(), asyncio.Queue(self.queue_size))
+        with self._lock:
+            self._subscribers[channel].add(entry)
+        try:
+            yield entry[1]
+        finally:
+            with self._lock:
+                self._subscribers[channel].discard(entry)
+                if not self._subscribers[channel]:
+                    del self._subscribers[channel]
+
+
+class RedisChannelLayer(ChannelLayer):
+    """Fans events out across processes and hosts with Redis pub/sub."""
+
+    def __init__(self, url, prefix='unistay-realtime'):
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured('RedisChannelLayer requires the redis package.')
+        self.url = url
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def _name(self, channel):
+        return f'{self.prefix}:{channel}'
+
+    def publish(self, channel, payload):
+        self._client.publish(self._name(channel), json.dumps(payload, cls=JSONEncoder))
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(self._name(channel))
+        try:
+            yield _RedisSubscription(pubsub)
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+            await client.aclose()
+
+
+class _RedisSubscription:
+    def __init__(self, pubsub):
+        self.pubsub = pubsub
+
+    async def get(self):
+        while True:
+            message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=None)
+            if message is not None:
+                return json.loads(message['data'])
+
+
+@lru_cache(maxsize=None)
+def get_channel_layer():
+    config = dict(getattr(settings, 'REALTIME_CHANNEL_LAYER', {}))
+    path = config.pop('class', 'api.realtime.InMemoryChannelLayer')
+    return import_string(path)(**config)
+
+
+@receiver(setting_changed)
+def reset_channel_layer(setting, **kwargs):
+    if setting == 'REALTIME_CHANNEL_LAYER':
+        get_channel_layer.cache_clear()
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+def publish_messages(messages):
+    """Push new messages to the streams of their senders and receivers."""
+    from .serializers import MessageSerializer
+
+    layer = get_channel_layer()
+    for message in messages:
+        payload = json.loads(json.dumps(MessageSerializer(message).data, cls=JSONEncoder))
+        for user_id in {message.sender_id, message.receiver_id}:
+            try:
+                layer.publish(user_channel(user_id), payload)
+            except Exception:
+                # Delivery is best effort; clients resync with ``since``.
+                logger.exception('Could not publish message %s', message.pk)
@@ -0,0 +1,146 @@
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.http import Http404
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .cache import invalidate, tag_versions
+from .models import CommunityCategory, University
+from .prefetch import apply_prefetch_plan
+from .serializers import CommunityCategorySerializer, UniversitySerializer
+
+logger = logging.getLogger(__name__)
+
+# name -> (model, serializer class, response cache tag)
+REFERENCE_SETS = {
+    'universities': (University, UniversitySerializer, 'universities'),
+    'community_categories': (CommunityCategory, CommunityCategorySerializer, 'community-categories'),
+}
+
+
+class Entry:
+    __slots__ = ('version', 'expires', 'objects', 'rendered')
+
+    def __init__(self, version, expires, objects):
+        self.version = version
+        self.expires = expires
+        self.objects = objects
+        # origin -> Rendered; image URLs are absolute, so each site origin gets its own
+        self.rendered = {}
+
+
+class Rendered:
+    __slots__ = ('rows', 'by_id', 'key')
+
+    def __init__(self, rows, key):
+        self.rows = rows
+        self.by_id = {str(row['id']): row for row in rows}
+        self.key = key
+
+
+class ReferenceCache:
+    """
+    Per-process cache of the small, near-static reference sets.
+
+    A set is loaded once and rendered once per site origin, then kept for
+    ``REFERENCE_CACHE_TIMEOUT`` seconds. Entries are checked against the
+    set's response cache tag on every read, so a write in any worker (see
+    ``api.signals``) evicts them everywhere on the next request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def _load(self, name, version):
+        model, serializer_class, _ = REFERENCE_SETS[name]
+        objects = list(apply_prefetch_plan(model.objects.order_by('id'), serializer_class))
+        timeout = getattr(settings, 'REFERENCE_CACHE_TIMEOUT', 300)
+        entry = Entry(version, time.monotonic() + timeout, objects)
+        with self._lock:
+            self._entries[name] = entry
+        return entry
+
+    def get(self, names, request=None):
+        """Return ``{name: Rendered}``, loading the sets that are missing or stale."""
+        # Read the versions before loading, so a write racing the load
+        # leaves the entry stale rather than wrongly current.
+        versions = dict(zip(names, tag_versions([REFERENCE_SETS[name][2] for name in names]).values()))
+        origin = request.build_absolute_uri('/') if request is not None else ''
+        now = time.monotonic()
+        result = {}
+        for name in names:
+            entry = self._entries.get(name)
+            if entry is None or entry.version != versions[name] or entry.expires <= now:
+                entry = self._load(name, versions[name])
+            rendered = entry.rendered.get(origin)
+            if rendered is None:
+                serializer = REFERENCE_SETS[name][1](
+                    entry.objects, many=True, context={'request': request},
+                )
+                rendered = Rendered(serializer.data, f'{name}:{entry.version}:{origin}')
+                entry.rendered[origin] = rendered
+            result[name] = rendered
+        return result
+
+    def evict(self, name):
+        with self._lock:
+            self._entries.pop(name, None)
+        invalidate(REFERENCE_SETS[name][2])
+
+    def preload(self):
+        """Load every set, so the first requests of a worker find them cached."""
+        try:
+            self.get(list(REFERENCE_SETS))
+        except DatabaseError:
+            logger.warning('Could not preload reference data', exc_info=True)
+
+
+reference_cache = ReferenceCache()
+
+
+def reference_response(request, data, keys):
+    """A response for ``data`` with an ETag derived from the rendered sets' ``keys``."""
+    etag = quote_etag(hashlib.md5(f'{request.get_full_path()}|{"|".join(keys)}'.encode()).hexdigest())
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(data)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'public, no-cache'
+    return response
+
+
+class ReferenceDataMixin:
+    """
+    Viewset mixin that serves list and retrieve from the reference cache.
+
+    Reference sets are small enough to list whole, so lists are not
+    paginated.
+    """
+
+    reference_set = None
+    pagination_class = None
+
+    def filter_rows(self, rows):
+        return rows
+
+    def get_rendered(self):
+        return reference_cache.get([self.reference_set], self.request)[self.reference_set]
+
+    def list(self, request, *args, **kwargs):
+        rendered = self.get_rendered()
+        return reference_response(request, self.filter_rows(rendered.rows), [rendered.key])
+
+    def retrieve(self, request, *args, **kwargs):
+        rendered = self.get_rendered()
+        row = rendered.by_id.get(kwargs[self.lookup_url_kwarg or self.lookup_field])
+        if row is None:
+            raise Http404
+        return reference_response(request, row, [rendered.key])
@@ -0,0 +1,39 @@
+import re
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+# orjson writes floats below 1e-4 in positional notation and exponents
+# without a sign or zero padding, where the json module writes "1e-05" and
+# "1e+16". Output containing anything that looks like either is re-encoded
+# with the json module; false positives inside strings only cost time.
+_FLOAT_MISMATCH = re.compile(rb'0\.0000|\de[-\d]')
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    ``JSONRenderer`` that encodes with orjson when it is installed. The
+    output is byte-for-byte what ``JSONRenderer`` produces, and anything
+    orjson cannot reproduce falls back to it. The exception is NaN and
+    infinity, which orjson writes as ``null``.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact \
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(
+                data, default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS,
+            )
+        except (orjson.JSONEncodeError, TypeError):
+            return super().render(data, accepted_media_type, renderer_context)
+        if _FLOAT_MISMATCH.search(content):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Like JSONRenderer, escape the separators JavaScript treats as newlines.
+        return content.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
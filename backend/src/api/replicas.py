@@ -0,0 +1,71 @@
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Whether reads in the current request may go to a replica.
+_use_replicas = ContextVar('use_replicas', default=False)
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias != 'default']
+
+
+class ReplicaRouter:
+    """
+    Sends reads made while handling a safe-method request to a random read
+    replica, and everything else to ``default``. Once the request writes,
+    or while a transaction is open on ``default``, reads stay on the
+    primary so the request sees its own changes.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _use_replicas.get() or connections['default'].in_atomic_block:
+            return 'default'
+        aliases = replica_aliases()
+        return random.choice(aliases) if aliases else 'default'
+
+    def db_for_write(self, model, **hints):
+        _use_replicas.set(False)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+class ReplicaMiddleware:
+    """Allow replica reads for the duration of GET, HEAD and OPTIONS requests."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _enable(self, request):
+        return _use_replicas.set(request.method in SAFE_METHODS and bool(replica_aliases()))
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self._acall(request)
+        token = self._enable(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _use_replicas.reset(token)
+
+    async def _acall(self, request):
+        token = self._enable(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            _use_replicas.reset(token)
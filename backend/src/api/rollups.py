@@ -0,0 +1,284 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import ROUND_DOWN, Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import Booking, Hostel, HostelDailyStats, Review, Room, RoomDailyStats
+
+# Stays in these states count as booked nights and revenue
+BOOKED_STATUSES = ('CONFIRMED', 'COMPLETED')
+RATING_VALUES = range(1, 6)
+STAY_FIELDS = ['nights_booked', 'revenue', 'cancellations']
+REVIEW_FIELDS = [f'reviews_{rating}_count' for rating in RATING_VALUES]
+CENT = Decimal('0.01')
+
+
+def stay_key(booking):
+    """What a booking contributes to the rollups depends on these fields only."""
+    return (
+        booking.room_id, booking.check_in_date, booking.check_out_date,
+        booking.status, booking.total_price,
+    )
+
+
+def stay_deltas(key):
+    """
+    Return ``{date: {field: delta}}`` for one booking.
+
+    Booked stays add a night and an even share of ``total_price`` to every
+    night from check-in to check-out; the cents that do not divide go to the
+    first nights. Cancelled stays count once, on their check-in date.
+    """
+    _, check_in, check_out, status, total_price = key
+    if status == 'CANCELLED':
+        return {check_in: {'cancellations': 1}}
+    nights = (check_out - check_in).days
+    if status not in BOOKED_STATUSES or nights <= 0:
+        return {}
+    total_price = Decimal(total_price)
+    share = (total_price / nights).quantize(CENT, rounding=ROUND_DOWN)
+    extra_cents = int((total_price - share * nights) / CENT)
+    return {
+        check_in + timedelta(days=night): {
+            'nights_booked': 1, 'revenue': share + CENT if night < extra_cents else share,
+        }
+        for night in range(nights)
+    }
+
+
+def review_deltas(key, day):
+    hostel_id, rating = key
+    if rating not in RATING_VALUES:
+        return {}
+    return {day: {f'reviews_{rating}_count': 1}}
+
+
+def _add(model, owner, owner_id, deltas, sign):
+    if owner_id is None or not deltas:
+        return
+    model.objects.bulk_create(
+        [model(**{f'{owner}_id': owner_id, 'date': day}) for day in deltas], ignore_conflicts=True,
+    )
+    # Days with the same deltas share one UPDATE; a stay has at most two kinds.
+    days_by_delta = defaultdict(list)
+    for day, delta in deltas.items():
+        days_by_delta[tuple(sorted(delta.items()))].append(day)
+    for delta, days in days_by_delta.items():
+        model.objects.filter(**{f'{owner}_id': owner_id, 'date__in': days}).update(**{
+            field: F(field) + sign * value for field, value in delta
+        })
+
+
+def _apply_stay(key, sign, deleting):
+    deltas = stay_deltas(key)
+    if not deltas:
+        return
+    room_id = key[0]
+    if (Room, room_id) not in deleting:
+        _add(RoomDailyStats, 'room', room_id, deltas, sign)
+    hostel_id = Room.objects.filter(pk=room_id).values_list('hostel_id', flat=True).first()
+    if (Hostel, hostel_id) not in deleting:
+        _add(HostelDailyStats, 'hostel', hostel_id, deltas, sign)
+
+
+def record_stay_changes(changes, deleting=frozenset()):
+    """
+    Move bookings' contributions; ``changes`` holds ``(old, new)`` pairs of
+    ``stay_key()`` values, ``None`` for the side that does not exist.
+
+    Rooms and hostels in ``deleting``, ``(model, pk)`` pairs, are being
+    deleted with their rollups, so theirs are left alone.
+    """
+    with transaction.atomic():
+        for old, new in changes:
+            if old == new:
+                continue
+            if old is not None:
+                _apply_stay(old, -1, deleting)
+            if new is not None:
+                _apply_stay(new, 1, deleting)
+
+
+def record_review_change(old, new, created_at, deleting=frozenset()):
+    """
+    Move a review's count between ``(hostel_id, rating)`` pairs, on the day
+    it was written. Hostels in ``deleting`` are skipped, as above.
+    """
+    if old == new:
+        return
+    day = timezone.localdate(created_at)
+    with transaction.atomic():
+        for key, sign in [(old, -1), (new, 1)]:
+            if key is not None and (Hostel, key[0]) not in deleting:
+                _add(HostelDailyStats, 'hostel', key[0], review_deltas(key, day), sign=sign)
+
+
+def _accumulate(totals, key, deltas):
+    for day, delta in deltas.items():
+        row = totals[key + (day,)]
+        for field, value in delta.items():
+            row[field] = row.get(field, 0) + value
+
+
+def compute_rollups(hostel_ids):
+    """
+    Return ``(room_rows, hostel_rows)`` computed from the Booking and Review
+    tables, each ``{(owner_id, date): {field: value}}``.
+    """
+    rooms, hostels = defaultdict(dict), defaultdict(dict)
+    bookings = Booking.objects.filter(room__hostel_id__in=hostel_ids).values_list(
+        'room_id', 'check_in_date', 'check_out_date', 'status', 'total_price', 'room__hostel_id',
+    )
+    for *key, hostel_id in bookings.iterator(chunk_size=2000):
+        deltas = stay_deltas(key)
+        _accumulate(rooms, (key[0],), deltas)
+        _accumulate(hostels, (hostel_id,), deltas)
+    reviews = Review.objects.filter(hostel_id__in=hostel_ids).values_list('hostel_id', 'rating', 'created_at')
+    for hostel_id, rating, created_at in reviews.iterator(chunk_size=2000):
+        _accumulate(hostels, (hostel_id,), review_deltas((hostel_id, rating), timezone.localdate(created_at)))
+    return rooms, hostels
+
+
+def _stored(model, owner, fields, hostel_ids):
+    lookup = 'room__hostel_id__in' if owner == 'room' else 'hostel_id__in'
+    rows = model.objects.filter(**{lookup: hostel_ids}).values_list(f'{owner}_id', 'date', *fields)
+    return {
+        (owner_id, day): values
+        for owner_id, day, *values in rows.iterator(chunk_size=2000)
+        # Rows left at zero by decrements are the same as no row.
+        if any(values)
+    }
+
+
+def _expected(computed, fields):
+    return {
+        key: [row.get(field, 0) for field in fields]
+        for key, row in computed.items() if any(row.values())
+    }
+
+
+def _hostel_batches(hostel_ids, batch_size):
+    if hostel_ids is None:
+        hostel_ids = list(Hostel.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(hostel_ids), batch_size):
+        yield hostel_ids[start:start + batch_size]
+
+
+def find_rollup_mismatches(hostel_ids=None, batch_size=200):
+    """Return the ids of hostels whose stored rollups (or their rooms') are stale."""
+    stale = []
+    for batch in _hostel_batches(hostel_ids, batch_size):
+        rooms, hostels = compute_rollups(batch)
+        hostel_fields = STAY_FIELDS + REVIEW_FIELDS
+        expected_hostels = _expected(hostels, hostel_fields)
+        stored_hostels = _stored(HostelDailyStats, 'hostel', hostel_fields, batch)
+        expected_rooms = _expected(rooms, STAY_FIELDS)
+        stored_rooms = _stored(RoomDailyStats, 'room', STAY_FIELDS, batch)
+        room_hostels = dict(Room.objects.filter(hostel_id__in=batch).values_list('pk', 'hostel_id'))
+        for key in expected_hostels.keys() | stored_hostels.keys():
+            if expected_hostels.get(key) != stored_hostels.get(key):
+                stale.append(key[0])
+        for key in expected_rooms.keys() | stored_rooms.keys():
+            if expected_rooms.get(key) != stored_rooms.get(key):
+                stale.append(room_hostels[key[0]])
+    return sorted(set(stale))
+
+
+def rebuild_rollups(hostel_ids=None, batch_size=200):
+    """Recompute the rollups of ``hostel_ids`` (all hostels by default); return the rows written."""
+    written = 0
+    for batch in _hostel_batches(hostel_ids, batch_size):
+        rooms, hostels = compute_rollups(batch)
+        with transaction.atomic():
+            RoomDailyStats.objects.filter(room__hostel_id__in=batch).delete()
+            HostelDailyStats.objects.filter(hostel_id__in=batch).delete()
+            room_rows = [
+                RoomDailyStats(room_id=room_id, date=day, **values)
+                for (room_id, day), values in rooms.items()
+            ]
+            hostel_rows = [
+                HostelDailyStats(hostel_id=hostel_id, date=day, **values)
+                for (hostel_id, day), values in hostels.items()
+            ]
+            RoomDailyStats.objects.bulk_create(room_rows, batch_size=2000)
+            HostelDailyStats.objects.bulk_create(hostel_rows, batch_size=2000)
+        written += len(room_rows) + len(hostel_rows)
+    return written
+
+
+def _metrics(row, capacity):
+    """Render summed counters; ``capacity`` is the room-nights available."""
+    nights = row.get('nights_booked') or 0
+    return {
+        'nights_booked': nights,
+        'occupancy_rate': round(nights / capacity, 4) if capacity else None,
+        'revenue': str(Decimal(row.get('revenue') or 0).quantize(CENT)),
+        'cancellations': row.get('cancellations') or 0,
+    }
+
+
+def _reviews(row):
+    return {str(rating): row.get(f'reviews_{rating}_count') or 0 for rating in RATING_VALUES}
+
+
+def dashboard(hostels, date_from, date_to):
+    """
+    Booking and review figures for ``hostels`` between ``date_from`` and
+    ``date_to`` inclusive, read from the rollups alone.
+
+    Occupancy divides booked nights by the nights the hostels' current rooms
+    could have been booked.
+    """
+    days = (date_to - date_from).days + 1
+    hostels = list(hostels.order_by('id').values('id', 'name'))
+    hostel_ids = [hostel['id'] for hostel in hostels]
+    rooms_by_hostel = defaultdict(list)
+    rooms = Room.objects.filter(hostel_id__in=hostel_ids).order_by('id').values('id', 'hostel_id', 'room_number')
+    for room in rooms:
+        rooms_by_hostel[room['hostel_id']].append(room)
+    sums = {field: Sum(field) for field in STAY_FIELDS + REVIEW_FIELDS}
+    hostel_stats = HostelDailyStats.objects.filter(
+        hostel_id__in=hostel_ids, date__range=(date_from, date_to)
+    )
+    per_hostel = {
+        row['hostel_id']: row for row in hostel_stats.values('hostel_id').annotate(**sums).order_by()
+    }
+    per_day = {row['date']: row for row in hostel_stats.values('date').annotate(**sums).order_by()}
+    totals = hostel_stats.aggregate(**sums)
+    per_room = {
+        row['room_id']: row for row in RoomDailyStats.objects.filter(
+            room__hostel_id__in=hostel_ids, date__range=(date_from, date_to)
+        ).values('room_id').annotate(**{field: Sum(field) for field in STAY_FIELDS}).order_by()
+    }
+    room_count = sum(len(rooms) for rooms in rooms_by_hostel.values())
+    return {
+        'from': date_from,
+        'to': date_to,
+        'totals': {
+            **_metrics(totals, room_count * days), 'new_reviews': _reviews(totals), 'room_count': room_count,
+        },
+        'hostels': [
+            {
+                'id': hostel['id'],
+                'name': hostel['name'],
+                'room_count': len(rooms_by_hostel[hostel['id']]),
+                **_metrics(per_hostel.get(hostel['id'], {}), len(rooms_by_hostel[hostel['id']]) * days),
+                'new_reviews': _reviews(per_hostel.get(hostel['id'], {})),
+                'rooms': [
+                    {
+                        'id': room['id'], 'room_number': room['room_number'],
+                        **_metrics(per_room.get(room['id'], {}), days),
+                    }
+                    for room in rooms_by_hostel[hostel['id']]
+                ],
+            }
+            for hostel in hostels
+        ],
+        'daily': [
+            {'date': day, **_metrics(per_day.get(day, {}), room_count), 'new_reviews': _reviews(per_day.get(day, {}))}
+            for day in (date_from + timedelta(days=offset) for offset in range(days))
+        ],
+    }
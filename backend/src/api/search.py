@@ -0,0 +1,296 @@
+import math
+import re
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count, F
+
+from .cache import invalidate
+from .models import Hostel, University, SearchDocument, SearchPosting, SearchTerm
+
+HOSTEL = 'hostel'
+UNIVERSITY = 'university'
+
+TOKEN_RE = re.compile(r'(\w+)(\*?)')
+MAX_TERM_LENGTH = 64
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_EXPANSIONS = 10
+# Postings read per term at query time, best impact first
+CHAMPION_LIST_SIZE = 1000
+BM25_K1 = 1.2
+BM25_B = 0.75
+STATS_CACHE_TIMEOUT = 300
+BATCH_SIZE = 500
+
+# Response cache tag of each document type's search results
+CACHE_TAGS = {HOSTEL: 'search', UNIVERSITY: 'universities'}
+
+_pending_documents = ContextVar('pending_search_documents', default=None)
+
+
+def tokenize(text):
+    return [match.group(1)[:MAX_TERM_LENGTH] for match in TOKEN_RE.finditer(str(text).lower())]
+
+
+def _join(values):
+    if isinstance(values, (list, tuple)):
+        return ' '.join(str(value) for value in values)
+    return str(values or '')
+
+
+def hostel_fields(hostel):
+    fields = [
+        (hostel.name, 3),
+        (hostel.city, 2),
+        (hostel.state, 1),
+        (hostel.country, 1),
+        (hostel.description, 1),
+        (_join(hostel.amenities), 1),
+    ]
+    fields.extend((_join(room.amenities), 1) for room in hostel.rooms.all())
+    return fields
+
+
+def university_fields(university):
+    return [
+        (university.name, 3),
+        (university.location, 2),
+        (university.description, 1),
+    ]
+
+
+DOC_TYPES = {
+    HOSTEL: (lambda: Hostel.objects.prefetch_related('rooms'), hostel_fields),
+    UNIVERSITY: (lambda: University.objects.all(), university_fields),
+}
+
+
+def bm25_weight(term_frequency, doc_length, average_length):
+    """BM25 term weight without the idf factor."""
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_length / (average_length or 1.0))
+    return term_frequency * (BM25_K1 + 1) / (term_frequency + norm)
+
+
+def _term_frequencies(doc_type, obj):
+    _, fields_for = DOC_TYPES[doc_type]
+    frequencies = Counter()
+    for text, weight in fields_for(obj):
+        for token in tokenize(text):
+            frequencies[token] += weight
+    return frequencies
+
+
+def _analyze(doc_type, objects, average_length=None):
+    """
+    Build the document rows, postings and per-term document counts for ``objects``.
+
+    Each posting stores its BM25 weight as ``impact`` so the best postings of a
+    term can be read straight off the index. ``average_length`` is only used
+    for that ordering; query-time scores use the current collection stats.
+    """
+    analyzed = [(obj.pk, _term_frequencies(doc_type, obj)) for obj in objects]
+    if average_length is None:
+        average_length = collection_stats(doc_type)[1]
+    if not average_length and analyzed:
+        average_length = sum(sum(f.values()) for _, f in analyzed) / len(analyzed)
+    documents, postings, document_counts = [], [], Counter()
+    for object_id, frequencies in analyzed:
+        length = sum(frequencies.values())
+        documents.append(SearchDocument(doc_type=doc_type, object_id=object_id, length=length))
+        postings.extend(
+            SearchPosting(
+                doc_type=doc_type, term=term, object_id=object_id,
+                term_frequency=frequency, doc_length=length,
+                impact=bm25_weight(frequency, length, average_length),
+            )
+            for term, frequency in frequencies.items()
+        )
+        document_counts.update(frequencies.keys())
+    return documents, postings, document_counts
+
+
+def _adjust_document_frequencies(doc_type, deltas):
+    terms = SearchTerm.objects.filter(doc_type=doc_type)
+    added = [term for term, delta in deltas.items() if delta > 0]
+    SearchTerm.objects.bulk_create(
+        [SearchTerm(doc_type=doc_type, term=term) for term in added],
+        ignore_conflicts=True, batch_size=BATCH_SIZE,
+    )
+    by_delta = defaultdict(list)
+    for term, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(term)
+    for delta, changed in by_delta.items():
+        terms.filter(term__in=changed).update(
+            document_frequency=F('document_frequency') + delta
+        )
+    removed = [term for term, delta in deltas.items() if delta < 0]
+    if removed:
+        terms.filter(term__in=removed, document_frequency__lte=0).delete()
+
+
+def index_documents(doc_type, object_ids):
+    """
+    (Re)index the given objects; ids that no longer exist are dropped from the
+    index. Cached search responses are evicted, once the transaction commits,
+    when any document's terms changed.
+    """
+    object_ids = list(object_ids)
+    if not object_ids:
+        return
+    queryset_for, _ = DOC_TYPES[doc_type]
+    with transaction.atomic():
+        postings = SearchPosting.objects.filter(doc_type=doc_type, object_id__in=object_ids)
+        old_postings = set(postings.values_list('object_id', 'term', 'term_frequency'))
+        old_counts = Counter(term for _, term, _ in old_postings)
+        documents, new_postings, new_counts = _analyze(
+            doc_type, queryset_for().filter(pk__in=object_ids)
+        )
+        if old_postings != {(p.object_id, p.term, p.term_frequency) for p in new_postings}:
+            transaction.on_commit(partial(invalidate, CACHE_TAGS[doc_type]))
+        postings.delete()
+        SearchDocument.objects.filter(doc_type=doc_type, object_id__in=object_ids).delete()
+        SearchDocument.objects.bulk_create(documents)
+        SearchPosting.objects.bulk_create(new_postings, batch_size=BATCH_SIZE)
+        new_counts.subtract(old_counts)
+        _adjust_document_frequencies(doc_type, new_counts)
+
+
+def queue_index(doc_type, object_ids):
+    """Index now, or at the end of the enclosing ``batched_indexing()`` block."""
+    pending = _pending_documents.get()
+    if pending is None:
+        index_documents(doc_type, object_ids)
+    else:
+        pending[doc_type].update(object_ids)
+
+
+@contextmanager
+def batched_indexing():
+    """Collect ``queue_index`` calls and index each document once on exit."""
+    if _pending_documents.get() is not None:
+        yield
+        return
+    pending = defaultdict(set)
+    token = _pending_documents.set(pending)
+    try:
+        yield
+    finally:
+        _pending_documents.reset(token)
+    for doc_type, object_ids in pending.items():
+        index_documents(doc_type, object_ids)
+
+
+def rebuild_index(doc_type, batch_size=BATCH_SIZE):
+    """Drop and rebuild the whole index for ``doc_type``; return the number of documents."""
+    queryset_for, _ = DOC_TYPES[doc_type]
+    with transaction.atomic():
+        SearchPosting.objects.filter(doc_type=doc_type).delete()
+        SearchDocument.objects.filter(doc_type=doc_type).delete()
+        SearchTerm.objects.filter(doc_type=doc_type).delete()
+        cache.delete(_stats_key(doc_type))
+        document_counts = Counter()
+        total = 0
+        average_length = None
+        ids = list(queryset_for().order_by('pk').values_list('pk', flat=True))
+        for start in range(0, len(ids), batch_size):
+            batch = queryset_for().filter(pk__in=ids[start:start + batch_size])
+            documents, postings, counts = _analyze(doc_type, batch, average_length)
+            if average_length is None and documents:
+                # Estimate the collection average from the first batch.
+                average_length = sum(d.length for d in documents) / len(documents)
+            SearchDocument.objects.bulk_create(documents)
+            SearchPosting.objects.bulk_create(postings, batch_size=batch_size)
+            document_counts.update(counts)
+            total += len(documents)
+        SearchTerm.objects.bulk_create(
+            [
+                SearchTerm(doc_type=doc_type, term=term, document_frequency=count)
+                for term, count in document_counts.items()
+            ],
+            batch_size=batch_size,
+        )
+    cache.delete(_stats_key(doc_type))
+    return total
+
+
+def _stats_key(doc_type):
+    return f'search:stats:{doc_type}'
+
+
+def collection_stats(doc_type):
+    """Return ``(document_count, average_length)``, cached for a few minutes."""
+    stats = cache.get(_stats_key(doc_type))
+    if stats is None:
+        aggregate = SearchDocument.objects.filter(doc_type=doc_type).aggregate(
+            count=Count('id'), average=Avg('length')
+        )
+        stats = (aggregate['count'], aggregate['average'] or 0.0)
+        cache.set(_stats_key(doc_type), stats, STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def parse_query(query):
+    """
+    Split a query into ``(token, is_prefix)`` pairs.
+
+    The last token, and any token written as ``word*``, is matched as a prefix.
+    """
+    matches = list(TOKEN_RE.finditer(query.lower()))
+    parsed = []
+    for index, match in enumerate(matches):
+        token = match.group(1)[:MAX_TERM_LENGTH]
+        is_prefix = bool(match.group(2)) or index == len(matches) - 1
+        parsed.append((token, is_prefix and len(token) >= MIN_PREFIX_LENGTH))
+    return parsed
+
+
+def expand_terms(doc_type, parsed):
+    """Return ``{term: document_frequency}`` for the index terms a query matches."""
+    terms = SearchTerm.objects.filter(doc_type=doc_type, document_frequency__gt=0)
+    exact = [token for token, is_prefix in parsed if not is_prefix]
+    matched = dict(terms.filter(term__in=exact).values_list('term', 'document_frequency'))
+    for token, is_prefix in parsed:
+        if not is_prefix:
+            continue
+        # The range keeps the lookup on the (doc_type, term) index on every backend.
+        expansions = (
+            terms.filter(term__gte=token, term__lt=token + '\U0010ffff', term__startswith=token)
+            .order_by('-document_frequency')
+            .values_list('term', 'document_frequency')[:MAX_PREFIX_EXPANSIONS]
+        )
+        matched.update(expansions)
+    return matched
+
+
+def search(doc_type, query, offset=0, limit=20):
+    """
+    Rank documents of ``doc_type`` against ``query`` with BM25.
+
+    Only the ``CHAMPION_LIST_SIZE`` highest-impact postings of each matched
+    term are considered, so the cost is bounded however common a term is.
+    Returns a list of ``(object_id, score)`` pairs, best match first.
+    """
+    parsed = parse_query(query)
+    if not parsed:
+        return []
+    matched = expand_terms(doc_type, parsed)
+    if not matched:
+        return []
+    count, average_length = collection_stats(doc_type)
+    scores = defaultdict(float)
+    for term, df in matched.items():
+        idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+        champions = (
+            SearchPosting.objects.filter(doc_type=doc_type, term=term)
+            .order_by('-impact')
+            .values_list('object_id', 'term_frequency', 'doc_length')[:CHAMPION_LIST_SIZE]
+        )
+        for object_id, frequency, length in champions:
+            scores[object_id] += idf * bm25_weight(frequency, length, average_length)
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    return ranked[offset:offset + limit]
@@ -1,8 +1,18 @@
+from datetime import timedelta
+from functools import partial
+
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from . import amenities, availability, conversations, images, jobs, pricing, realtime, rollups, search
+from .bulk import BulkListSerializer
+from .cache import invalidate
 from .models import (
-    Profile, Hostel, Room, Booking, Review, 
-    Favorite, Message, MaintenanceRequest,
+    Profile, Hostel, Room, Booking, Review, ImageAsset, ImageUpload,
+    Favorite, Message, ConversationParticipant, MaintenanceRequest,
     ForumTopic, ForumPost, University,
     CommunityCategory, CommunityPost, CommunityComment
 )
@@ -13,48 +23,322 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ('id', 'username', 'email', 'first_name', 'last_name', 'date_joined')
         read_only_fields = ('date_joined',)
 
+class ImageAssetSerializer(serializers.ModelSerializer):
+    file = serializers.ImageField(source='original', write_only=True)
+    src = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
+    renditions = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ImageAsset
+        fields = ('id', 'file', 'status', 'width', 'height', 'src', 'srcset', 
+                 'renditions', 'created_at')
+        read_only_fields = ('status', 'width', 'height', 'created_at')
+    
+    def validate_file(self, value):
+        try:
+            value.name = images.original_name(value)
+        except images.InvalidImage as exc:
+            raise serializers.ValidationError(str(exc))
+        return value
+    
+    def _url(self, name):
+        url = default_storage.url(name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+    
+    def get_src(self, asset):
+        # The original is never served; it has no src until it is rendered.
+        full = asset.renditions.get('full')
+        if asset.status != 'READY' or full is None:
+            return None
+        return self._url(full['name'])
+    
+    def get_srcset(self, asset):
+        renditions = sorted(asset.renditions.values(), key=lambda rendition: rendition['width'])
+        return ', '.join(f"{self._url(rendition['name'])} {rendition['width']}w" for rendition in renditions)
+    
+    def get_renditions(self, asset):
+        return {
+            name: {'url': self._url(rendition['name']), 'width': rendition['width'], 
+                   'height': rendition['height']}
+            for name, rendition in asset.renditions.items()
+        }
+
+class OwnedImageField(serializers.PrimaryKeyRelatedField):
+    """Accepts the ids of images the requesting user uploaded (any image for staff)."""
+    
+    def get_queryset(self):
+        queryset = ImageAsset.objects.all()
+        request = self.context.get('request')
+        if request is None or request.user.is_staff:
+            return queryset
+        return queryset.filter(owner=request.user)
+
+class ImageUploadSerializer(serializers.ModelSerializer):
+    asset = ImageAssetSerializer(read_only=True)
+    
+    class Meta:
+        model = ImageUpload
+        fields = ('id', 'filename', 'size', 'received', 'asset', 'created_at')
+        read_only_fields = ('received', 'created_at')
+    
+    def validate_size(self, value):
+        limit = getattr(settings, 'IMAGE_UPLOAD_MAX_BYTES', 50 * 1024 * 1024)
+        if not 0 < value <= limit:
+            raise serializers.ValidationError(f'Size must be between 1 and {limit} bytes.')
+        return value
+
 class ProfileSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
+    picture = ImageAssetSerializer(read_only=True)
+    picture_id = OwnedImageField(source='picture', write_only=True, required=False, allow_null=True)
     
     class Meta:
         model = Profile
         fields = ('id', 'user', 'bio', 'location', 'birth_date', 'phone_number', 
-                 'profile_picture', 'is_manager', 'is_admin')
+                 'profile_picture', 'picture', 'picture_id', 'is_manager', 'is_admin')
         read_only_fields = ('is_manager', 'is_admin')
 
 class RoomSerializer(serializers.ModelSerializer):
+    cover_image = ImageAssetSerializer(read_only=True)
+    cover_image_id = OwnedImageField(source='cover_image', write_only=True, required=False, allow_null=True)
+    
     class Meta:
         model = Room
         fields = ('id', 'hostel', 'room_number', 'room_type', 'capacity', 
-                 'price_per_night', 'is_available', 'amenities', 'images')
+                 'price_per_night', 'is_available', 'amenities', 'images',
+                 'cover_image', 'cover_image_id')
+        list_serializer_class = BulkListSerializer
+    
+    def bulk_saved(self, rooms):
+        amenities.sync(rooms)
+        hostel_ids = {room.hostel_id for room in rooms}
+        search.queue_index(search.HOSTEL, hostel_ids)
+        transaction.on_commit(partial(invalidate, *(f'hostel:{hostel_id}' for hostel_id in hostel_ids)))
 
 class HostelSerializer(serializers.ModelSerializer):
     manager = UserSerializer(read_only=True)
     rooms = RoomSerializer(many=True, read_only=True)
-    average_rating = serializers.SerializerMethodField()
+    average_rating = serializers.FloatField(read_only=True)
+    rating_histogram = serializers.DictField(child=serializers.IntegerField(), read_only=True)
+    cover_image = ImageAssetSerializer(read_only=True)
+    cover_image_id = OwnedImageField(source='cover_image', write_only=True, required=False, allow_null=True)
+    gallery = ImageAssetSerializer(many=True, read_only=True)
+    gallery_ids = OwnedImageField(source='gallery', many=True, write_only=True, required=False)
     
     class Meta:
         model = Hostel
         fields = ('id', 'name', 'description', 'address', 'city', 'state', 
-                 'country', 'zip_code', 'price_per_night', 'manager', 'created_at', 
-                 'updated_at', 'is_active', 'amenities', 'rules', 'images', 
-                 'rooms', 'average_rating')
+                 'country', 'zip_code', 'latitude', 'longitude', 'price_per_night',
+                 'manager', 'created_at', 'updated_at', 'is_active', 'amenities', 'rules', 'images', 
+                 'cover_image', 'cover_image_id', 'gallery', 'gallery_ids',
+                 'rooms', 'average_rating', 'review_count', 'rating_histogram')
+        read_only_fields = ('review_count',)
+
+class HostelSummarySerializer(serializers.ModelSerializer):
+    average_rating = serializers.FloatField(read_only=True)
+    cover_image = ImageAssetSerializer(read_only=True)
     
-    def get_average_rating(self, obj):
-        reviews = obj.reviews.all()
-        if not reviews:
-            return 0
-        return sum(review.rating for review in reviews) / len(reviews)
+    class Meta:
+        model = Hostel
+        fields = ('id', 'name', 'city', 'state', 'country', 'latitude', 'longitude',
+                 'price_per_night', 'manager', 'created_at', 'is_active', 'amenities',
+                 'images', 'cover_image', 'average_rating', 'review_count')
+        read_only_fields = fields
+
+class NearbyHostelSerializer(HostelSummarySerializer):
+    distance_km = serializers.FloatField(read_only=True)
+    
+    class Meta(HostelSummarySerializer.Meta):
+        fields = HostelSummarySerializer.Meta.fields + ('distance_km',)
+        read_only_fields = fields
+
+
+def _validate_stay(check_in, check_out, field='check_out'):
+    """Reject stays that end before they start or run past ``MAX_STAY_NIGHTS``."""
+    if check_out <= check_in:
+        raise serializers.ValidationError({field: 'Check-out must be after check-in.'})
+    limit = getattr(settings, 'MAX_STAY_NIGHTS', 365)
+    if (check_out - check_in).days > limit:
+        raise serializers.ValidationError({field: f'Stays are limited to {limit} nights.'})
+
+
+class AvailabilityQuerySerializer(serializers.Serializer):
+    hostel_id = serializers.IntegerField(required=False)
+    check_in = serializers.DateField()
+    check_out = serializers.DateField()
+    
+    def validate(self, attrs):
+        _validate_stay(attrs['check_in'], attrs['check_out'])
+        return attrs
+
+class LoginSerializer(serializers.Serializer):
+    username = serializers.CharField()
+    password = serializers.CharField(trim_whitespace=False, write_only=True)
+
+class RefreshTokenSerializer(serializers.Serializer):
+    refresh = serializers.CharField()
+    # Revoke only: end every login of the user, not just this one
+    everywhere = serializers.BooleanField(default=False)
+
+class NearbyQuerySerializer(serializers.Serializer):
+    university_id = serializers.PrimaryKeyRelatedField(
+        queryset=University.objects.all(), source='university'
+    )
+    radius_km = serializers.FloatField(min_value=0.1, max_value=50, default=5)
+    price_max = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    
+    def validate_university_id(self, university):
+        if university.latitude is None or university.longitude is None:
+            raise serializers.ValidationError('This university has no coordinates.')
+        return university
+
+class ExportQuerySerializer(serializers.Serializer):
+    hostel_id = serializers.IntegerField(required=False)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    
+    def validate(self, attrs):
+        if 'date_from' in attrs and 'date_to' in attrs and attrs['date_to'] < attrs['date_from']:
+            raise serializers.ValidationError({'date_to': 'End date must not be before start date.'})
+        return attrs
+
+class StatsQuerySerializer(serializers.Serializer):
+    # ``from`` is a keyword, so the fields are declared here.
+    max_days = 366
+    
+    def get_fields(self):
+        return {
+            'from': serializers.DateField(required=False),
+            'to': serializers.DateField(required=False),
+            'hostel_id': serializers.IntegerField(required=False),
+        }
+    
+    def validate(self, attrs):
+        attrs.setdefault('to', timezone.localdate())
+        attrs.setdefault('from', attrs['to'] - timedelta(days=29))
+        if attrs['to'] < attrs['from']:
+            raise serializers.ValidationError({'to': 'End date must not be before start date.'})
+        if (attrs['to'] - attrs['from']).days >= self.max_days:
+            raise serializers.ValidationError({'to': f'At most {self.max_days} days per request.'})
+        return attrs
+
+class QuoteItemSerializer(serializers.Serializer):
+    room_id = serializers.IntegerField()
+    check_in = serializers.DateField()
+    check_out = serializers.DateField()
+    
+    def validate(self, attrs):
+        _validate_stay(attrs['check_in'], attrs['check_out'])
+        return attrs
+
+class QuoteRequestSerializer(serializers.Serializer):
+    items = QuoteItemSerializer(many=True, allow_empty=False, max_length=500)
+
+class QuoteSerializer(serializers.Serializer):
+    room_id = serializers.IntegerField()
+    check_in = serializers.DateField()
+    check_out = serializers.DateField()
+    nights = serializers.IntegerField()
+    total_price = serializers.DecimalField(max_digits=10, decimal_places=2)
 
 class BookingSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     room = RoomSerializer(read_only=True)
+    room_id = serializers.PrimaryKeyRelatedField(
+        queryset=Room.objects.all(), source='room', write_only=True
+    )
+    user_id = serializers.PrimaryKeyRelatedField(
+        queryset=User.objects.all(), source='user', write_only=True,
+        default=serializers.CurrentUserDefault()
+    )
     
     class Meta:
         model = Booking
-        fields = ('id', 'user', 'room', 'check_in_date', 'check_out_date', 
+        fields = ('id', 'user', 'user_id', 'room', 'room_id', 'check_in_date', 'check_out_date', 
                  'status', 'total_price', 'created_at', 'updated_at', 
                  'special_requests')
+        read_only_fields = ('total_price',)
+        list_serializer_class = BulkListSerializer
+    
+    def validate_user_id(self, user):
+        request = self.context.get('request')
+        if request is not None and not request.user.is_staff and user != request.user:
+            raise serializers.ValidationError('Only staff can book on behalf of other users.')
+        return user
+    
+    def validate(self, attrs):
+        check_in = attrs.get('check_in_date', getattr(self.instance, 'check_in_date', None))
+        check_out = attrs.get('check_out_date', getattr(self.instance, 'check_out_date', None))
+        if check_in and check_out:
+            _validate_stay(check_in, check_out, 'check_out_date')
+        return attrs
+    
+    def _check_availability(self, attrs, instance=None):
+        status = attrs.get('status', getattr(instance, 'status', 'PENDING'))
+        if status not in availability.BLOCKING_STATUSES:
+            return
+        room = attrs.get('room', getattr(instance, 'room', None))
+        check_in = attrs.get('check_in_date', getattr(instance, 'check_in_date', None))
+        check_out = attrs.get('check_out_date', getattr(instance, 'check_out_date', None))
+        availability.lock_room(room.pk)
+        if availability.has_conflict(room.pk, check_in, check_out, getattr(instance, 'pk', None)):
+            raise serializers.ValidationError(
+                {'non_field_errors': ['This room is already booked for some of these dates.']}
+            )
+    
+    def _price(self, attrs, instance=None):
+        if instance is not None and not {'room', 'check_in_date', 'check_out_date'} & set(attrs):
+            return
+        room = attrs.get('room', getattr(instance, 'room', None))
+        check_in = attrs.get('check_in_date', getattr(instance, 'check_in_date', None))
+        check_out = attrs.get('check_out_date', getattr(instance, 'check_out_date', None))
+        attrs['total_price'] = pricing.quote(room, check_in, check_out).total_price
+    
+    def create(self, validated_data):
+        with transaction.atomic():
+            self._check_availability(validated_data)
+            self._price(validated_data)
+            return super().create(validated_data)
+    
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            self._check_availability(validated_data, instance)
+            self._price(validated_data, instance)
+            return super().update(instance, validated_data)
+    
+    def bulk_prepare(self, bookings, validated_data, created):
+        changed = [
+            position for position, attrs in enumerate(validated_data)
+            if created or {'room', 'check_in_date', 'check_out_date', 'status'} & set(attrs)
+        ]
+        conflicts = availability.find_batch_conflicts([bookings[position] for position in changed])
+        if conflicts:
+            raise serializers.ValidationError({
+                changed[index]: {
+                    'non_field_errors': ['This room is already booked for some of these dates.']
+                }
+                for index in sorted(conflicts)
+            })
+        for position in changed:
+            booking = bookings[position]
+            booking.total_price = pricing.quote(
+                booking.room, booking.check_in_date, booking.check_out_date
+            ).total_price
+        return ('total_price',) if changed else ()
+    
+    def bulk_saved(self, bookings):
+        # bulk_create() and bulk_update() send no signals.
+        jobs.queue_booking_notifications([
+            booking for booking in bookings if booking.status != booking._saved_status
+        ])
+        rollups.record_stay_changes([
+            (booking._saved_stay_key, rollups.stay_key(booking)) for booking in bookings
+        ])
+        for booking in bookings:
+            booking._saved_status = booking.status
+            booking._saved_stay_key = rollups.stay_key(booking)
 
 class ReviewSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
@@ -71,23 +355,84 @@ class FavoriteSerializer(serializers.ModelSerializer):
         model = Favorite
         fields = ('id', 'user', 'hostel', 'created_at')
 
+class FavoriteSummarySerializer(serializers.ModelSerializer):
+    hostel = HostelSummarySerializer(read_only=True)
+    
+    class Meta:
+        model = Favorite
+        fields = ('id', 'user', 'hostel', 'created_at')
+
 class MessageSerializer(serializers.ModelSerializer):
     sender = UserSerializer(read_only=True)
     receiver = UserSerializer(read_only=True)
+    receiver_id = serializers.PrimaryKeyRelatedField(
+        queryset=User.objects.all(), source='receiver', write_only=True
+    )
+    
+    class Meta:
+        model = Message
+        fields = ('id', 'conversation', 'sender', 'receiver', 'receiver_id', 'content',
+                 'created_at', 'is_read')
+        read_only_fields = ('conversation',)
+        list_serializer_class = BulkListSerializer
+    
+    def validate_receiver_id(self, value):
+        if self.instance is not None and value != self.instance.receiver:
+            raise serializers.ValidationError('A message cannot be moved to another receiver.')
+        return value
     
+    def bulk_prepare(self, messages, validated_data, created):
+        if created:
+            conversations.assign_conversations(messages)
+    
+    def bulk_saved(self, messages):
+        # bulk_create() and bulk_update() send no signals, so do their work here.
+        if self.parent.instance:
+            changes = []
+            for message in messages:
+                new = conversations.unread_key(
+                    message.conversation_id, message.receiver_id, message.is_read
+                )
+                changes.append((message._saved_unread_key, new))
+                message._saved_unread_key = new
+            conversations.record_unread_changes(changes)
+            return
+        conversations.record_new_messages(messages)
+        transaction.on_commit(partial(realtime.publish_messages, messages))
+
+class MessageSummarySerializer(serializers.ModelSerializer):
     class Meta:
         model = Message
         fields = ('id', 'sender', 'receiver', 'content', 'created_at', 'is_read')
 
+class ConversationSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='conversation_id', read_only=True)
+    other_user = UserSerializer(read_only=True)
+    last_message = MessageSummarySerializer(source='conversation.last_message', read_only=True)
+    
+    class Meta:
+        model = ConversationParticipant
+        fields = ('id', 'other_user', 'unread_count', 'last_message_at', 'last_message')
+
 class MaintenanceRequestSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     hostel = HostelSerializer(read_only=True)
+    hostel_id = serializers.PrimaryKeyRelatedField(
+        queryset=Hostel.objects.all(), source='hostel', write_only=True
+    )
     
     class Meta:
         model = MaintenanceRequest
-        fields = ('id', 'user', 'hostel', 'title', 'description', 'status', 
+        fields = ('id', 'user', 'hostel', 'hostel_id', 'title', 'description', 'status', 
                  'created_at', 'updated_at')
 
+class MaintenanceRequestSummarySerializer(serializers.ModelSerializer):
+    hostel = HostelSummarySerializer(read_only=True)
+    
+    class Meta:
+        model = MaintenanceRequest
+        fields = ('id', 'user', 'hostel', 'title', 'status', 'created_at', 'updated_at')
+
 class ForumPostSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     
@@ -102,12 +447,26 @@ class ForumTopicSerializer(serializers.ModelSerializer):
     class Meta:
         model = ForumTopic
         fields = ('id', 'title', 'description', 'created_by', 'created_at', 
-                 'updated_at', 'is_active', 'posts')
+                 'updated_at', 'is_active', 'reply_count', 'last_activity_at', 'posts')
+        read_only_fields = ('reply_count', 'last_activity_at')
+
+class ForumTopicSummarySerializer(serializers.ModelSerializer):
+    created_by = UserSerializer(read_only=True)
+    
+    class Meta:
+        model = ForumTopic
+        fields = ('id', 'title', 'description', 'created_by', 'created_at', 
+                 'updated_at', 'is_active', 'reply_count', 'last_activity_at')
+        read_only_fields = ('reply_count', 'last_activity_at')
 
 class UniversitySerializer(serializers.ModelSerializer):
+    logo_image = ImageAssetSerializer(read_only=True)
+    logo_image_id = OwnedImageField(source='logo_image', write_only=True, required=False, allow_null=True)
+    
     class Meta:
         model = University
-        fields = ('id', 'name', 'location', 'description', 'website', 'logo')
+        fields = ('id', 'name', 'location', 'description', 'website', 'latitude',
+                 'longitude', 'logo', 'logo_image', 'logo_image_id')
 
 class CommunityCategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -128,4 +487,15 @@ class CommunityPostSerializer(serializers.ModelSerializer):
     class Meta:
         model = CommunityPost
         fields = ('id', 'category', 'author', 'title', 'content', 
-                 'created_at', 'updated_at', 'is_pinned', 'is_closed', 'comments') 
\ No newline at end of file
+                 'created_at', 'updated_at', 'is_pinned', 'is_closed', 'reply_count',
+                 'last_activity_at', 'comments')
+        read_only_fields = ('reply_count', 'last_activity_at')
+
+class CommunityPostSummarySerializer(serializers.ModelSerializer):
+    author = UserSerializer(read_only=True)
+    
+    class Meta:
+        model = CommunityPost
+        fields = ('id', 'category', 'author', 'title', 'created_at', 
+                 'updated_at', 'is_pinned', 'is_closed', 'reply_count', 'last_activity_at')
+        read_only_fields = ('reply_count', 'last_activity_at')
@@ -0,0 +1,379 @@
+from functools import partial
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import activity, amenities, conversations, geo, images, jobs, realtime, rollups, search, tokens
+from .cache import invalidate
+from .models import (
+    Booking, CommunityCategory, CommunityComment, CommunityPost, ForumPost, ForumTopic, Hostel,
+    ImageAsset, MaintenanceRequest, Message, Review, Room, University,
+)
+from .ratings import record_review_change
+from .reference import reference_cache
+
+_UNKNOWN = object()
+
+
+def _deleting(origin):
+    """
+    ``(model, pk)`` pairs being deleted by the ``delete()`` call ``origin``,
+    so dependents' ``post_delete`` hooks can skip work on their parents.
+    """
+    if origin is None:
+        return set()
+    if not hasattr(origin, '_deleting'):
+        origin._deleting = set()
+    return origin._deleting
+
+
+@receiver(pre_delete, sender=Hostel)
+@receiver(pre_delete, sender=Room)
+def remember_deleted_parent(sender, instance, origin=None, **kwargs):
+    # Every pre_delete of a cascade runs before any post_delete.
+    _deleting(origin).add((sender, instance.pk))
+
+
+def _rating_key(hostel_id, rating):
+    if hostel_id is None or rating is None:
+        return None
+    return (hostel_id, rating)
+
+
+def _saved_rating_key(review):
+    key = review._saved_rating_key
+    if key is _UNKNOWN:
+        # The instance was loaded with deferred fields; read the stored row.
+        row = Review.objects.filter(pk=review.pk).values('hostel_id', 'rating').first()
+        key = _rating_key(row['hostel_id'], row['rating']) if row else None
+    return key
+
+
+# Review rating aggregates
+@receiver(post_init, sender=Review)
+def remember_review_rating(sender, instance, **kwargs):
+    if instance.pk is None:
+        instance._saved_rating_key = None
+    elif instance.get_deferred_fields() & {'hostel_id', 'rating'}:
+        instance._saved_rating_key = _UNKNOWN
+    else:
+        instance._saved_rating_key = _rating_key(instance.hostel_id, instance.rating)
+
+
+@receiver(pre_save, sender=Review)
+@receiver(pre_delete, sender=Review)
+def resolve_review_rating(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk is not None:
+        instance._saved_rating_key = _saved_rating_key(instance)
+
+
+@receiver(post_save, sender=Review)
+def update_ratings_on_review_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    new = _rating_key(instance.hostel_id, instance.rating)
+    old = None if created else instance._saved_rating_key
+    record_review_change(old, new)
+    rollups.record_review_change(old, new, instance.created_at)
+    instance._saved_rating_key = new
+
+
+@receiver(post_delete, sender=Review)
+def update_ratings_on_review_delete(sender, instance, origin=None, **kwargs):
+    record_review_change(instance._saved_rating_key, None)
+    rollups.record_review_change(
+        instance._saved_rating_key, None, instance.created_at, deleting=_deleting(origin),
+    )
+    instance._saved_rating_key = None
+
+
+# Geo grid cells
+@receiver(pre_save, sender=Hostel)
+def set_geo_cell(sender, instance, raw=False, **kwargs):
+    instance.geo_cell = geo.cell_for(instance.latitude, instance.longitude)
+
+
+# Normalized amenities
+@receiver(post_save, sender=Hostel)
+@receiver(post_save, sender=Room)
+def sync_amenities(sender, instance, raw=False, **kwargs):
+    if not raw:
+        amenities.sync([instance])
+
+
+# Search index
+@receiver(post_save, sender=Hostel)
+@receiver(post_delete, sender=Hostel)
+def index_hostel(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.queue_index(search.HOSTEL, [instance.pk])
+
+
+@receiver(post_save, sender=Room)
+def index_room_hostel(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.queue_index(search.HOSTEL, [instance.hostel_id])
+
+
+@receiver(post_delete, sender=Room)
+def index_deleted_room_hostel(sender, instance, origin=None, **kwargs):
+    # A hostel deleted with its rooms leaves the index once, from index_hostel.
+    if (Hostel, instance.hostel_id) not in _deleting(origin):
+        search.queue_index(search.HOSTEL, [instance.hostel_id])
+
+
+@receiver(post_save, sender=University)
+@receiver(post_delete, sender=University)
+def index_university(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.queue_index(search.UNIVERSITY, [instance.pk])
+
+
+# Response cache invalidation, after commit: a request that read the old
+# rows before then must not be cached under the new version.
+# Search results are evicted by api.search when a document's terms change.
+@receiver(post_save, sender=Hostel)
+@receiver(post_delete, sender=Hostel)
+def invalidate_hostel_responses(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidate, f'hostel:{instance.pk}'))
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_parent_hostel_responses(sender, instance, raw=False, **kwargs):
+    transaction.on_commit(partial(invalidate, f'hostel:{instance.hostel_id}'))
+
+
+@receiver(post_save, sender=University)
+@receiver(post_delete, sender=University)
+def invalidate_university_responses(sender, instance, **kwargs):
+    # evict() also invalidates the 'universities' tag.
+    transaction.on_commit(partial(reference_cache.evict, 'universities'))
+
+
+@receiver(post_save, sender=CommunityCategory)
+@receiver(post_delete, sender=CommunityCategory)
+def invalidate_category_responses(sender, instance, **kwargs):
+    transaction.on_commit(partial(reference_cache.evict, 'community_categories'))
+
+
+# Cached users for token authentication
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    tokens.forget_user(instance.pk)
+
+
+# Conversation pointers and unread counters
+def _saved_unread_key(message):
+    key = message._saved_unread_key
+    if key is _UNKNOWN:
+        # The instance was loaded with deferred fields; read the stored row.
+        row = Message.objects.filter(pk=message.pk).values(
+            'conversation_id', 'receiver_id', 'is_read'
+        ).first()
+        key = conversations.unread_key(**row) if row else None
+    return key
+
+
+@receiver(post_init, sender=Message)
+def remember_message_unread(sender, instance, **kwargs):
+    if instance.pk is None:
+        instance._saved_unread_key = None
+    elif instance.get_deferred_fields() & {'conversation_id', 'receiver_id', 'is_read'}:
+        instance._saved_unread_key = _UNKNOWN
+    else:
+        instance._saved_unread_key = conversations.unread_key(
+            instance.conversation_id, instance.receiver_id, instance.is_read
+        )
+
+
+@receiver(pre_save, sender=Message)
+def prepare_message(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if instance._state.adding:
+        conversations.assign_conversations([instance])
+    else:
+        instance._saved_unread_key = _saved_unread_key(instance)
+
+
+@receiver(pre_delete, sender=Message)
+def resolve_message_unread(sender, instance, **kwargs):
+    instance._saved_unread_key = _saved_unread_key(instance)
+
+
+@receiver(post_save, sender=Message)
+def update_conversation_on_message_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    new = conversations.unread_key(instance.conversation_id, instance.receiver_id, instance.is_read)
+    if created:
+        conversations.record_new_messages([instance])
+    else:
+        conversations.record_unread_changes([(instance._saved_unread_key, new)])
+    instance._saved_unread_key = new
+
+
+@receiver(post_delete, sender=Message)
+def update_conversation_on_message_delete(sender, instance, **kwargs):
+    conversations.record_unread_changes([(instance._saved_unread_key, None)])
+    if instance.conversation_id is not None:
+        conversations.refresh_last_message([instance.conversation_id])
+
+
+# Forum and community thread activity
+# reply model -> (thread model, attname of the reply's thread)
+_REPLY_THREADS = {
+    reply_model: (thread_model, reply_model._meta.get_field(field).attname)
+    for thread_model, (reply_model, field) in activity.THREADS.items()
+}
+
+
+def _saved_thread_id(reply):
+    thread_id = reply._saved_thread_id
+    if thread_id is _UNKNOWN:
+        # The instance was loaded with deferred fields; read the stored row.
+        attname = _REPLY_THREADS[type(reply)][1]
+        thread_id = type(reply).objects.filter(pk=reply.pk).values_list(attname, flat=True).first()
+    return thread_id
+
+
+@receiver(post_save, sender=ForumTopic)
+@receiver(post_save, sender=CommunityPost)
+def start_thread_activity(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        activity.record_new_thread(instance)
+
+
+@receiver(post_init, sender=ForumPost)
+@receiver(post_init, sender=CommunityComment)
+def remember_reply_thread(sender, instance, **kwargs):
+    attname = _REPLY_THREADS[sender][1]
+    if instance.pk is None:
+        instance._saved_thread_id = None
+    elif attname in instance.get_deferred_fields():
+        instance._saved_thread_id = _UNKNOWN
+    else:
+        instance._saved_thread_id = getattr(instance, attname)
+
+
+@receiver(pre_save, sender=ForumPost)
+@receiver(pre_save, sender=CommunityComment)
+@receiver(pre_delete, sender=ForumPost)
+@receiver(pre_delete, sender=CommunityComment)
+def resolve_reply_thread(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk is not None:
+        instance._saved_thread_id = _saved_thread_id(instance)
+
+
+@receiver(post_save, sender=ForumPost)
+@receiver(post_save, sender=CommunityComment)
+def update_thread_on_reply_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    thread_model, attname = _REPLY_THREADS[sender]
+    new = getattr(instance, attname)
+    activity.record_reply_change(
+        thread_model, None if created else instance._saved_thread_id, new, instance.created_at
+    )
+    instance._saved_thread_id = new
+
+
+@receiver(post_delete, sender=ForumPost)
+@receiver(post_delete, sender=CommunityComment)
+def update_thread_on_reply_delete(sender, instance, **kwargs):
+    activity.record_reply_change(
+        _REPLY_THREADS[sender][0], instance._saved_thread_id, None, instance.created_at
+    )
+    instance._saved_thread_id = None
+
+
+# Daily rollups for the manager dashboard
+_STAY_FIELDS = {'room_id', 'check_in_date', 'check_out_date', 'status', 'total_price'}
+
+
+@receiver(post_init, sender=Booking)
+def remember_booking_stay(sender, instance, **kwargs):
+    if instance.pk is None:
+        instance._saved_stay_key = None
+    elif instance.get_deferred_fields() & _STAY_FIELDS:
+        instance._saved_stay_key = _UNKNOWN
+    else:
+        instance._saved_stay_key = rollups.stay_key(instance)
+
+
+@receiver(pre_save, sender=Booking)
+@receiver(pre_delete, sender=Booking)
+def resolve_booking_stay(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk is not None and instance._saved_stay_key is _UNKNOWN:
+        # The instance was loaded with deferred fields; read the stored row.
+        stored = Booking.objects.filter(pk=instance.pk).first()
+        instance._saved_stay_key = rollups.stay_key(stored) if stored else None
+
+
+@receiver(post_save, sender=Booking)
+def update_rollups_on_booking_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    new = rollups.stay_key(instance)
+    rollups.record_stay_changes([(None if created else instance._saved_stay_key, new)])
+    instance._saved_stay_key = new
+
+
+@receiver(post_delete, sender=Booking)
+def update_rollups_on_booking_delete(sender, instance, origin=None, **kwargs):
+    # The rollups of a room or hostel deleted along with its bookings are gone
+    # already; recreating them would break the delete.
+    rollups.record_stay_changes([(instance._saved_stay_key, None)], deleting=_deleting(origin))
+    instance._saved_stay_key = None
+
+
+# Realtime message delivery
+@receiver(post_save, sender=Message)
+def push_new_message(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        transaction.on_commit(partial(realtime.publish_messages, [instance]))
+
+
+# Image files
+@receiver(post_delete, sender=ImageAsset)
+def delete_image_files(sender, instance, **kwargs):
+    transaction.on_commit(partial(images.delete_files, instance))
+
+
+# Booking and maintenance notifications, sent by the task worker
+@receiver(post_init, sender=Booking)
+@receiver(post_init, sender=MaintenanceRequest)
+def remember_status(sender, instance, **kwargs):
+    if instance.pk is None:
+        instance._saved_status = None
+    elif 'status' in instance.get_deferred_fields():
+        instance._saved_status = _UNKNOWN
+    else:
+        instance._saved_status = instance.status
+
+
+@receiver(pre_save, sender=Booking)
+@receiver(pre_save, sender=MaintenanceRequest)
+def resolve_status(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk is not None and instance._saved_status is _UNKNOWN:
+        instance._saved_status = sender.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+
+@receiver(post_save, sender=Booking)
+def queue_booking_notification(sender, instance, created, raw=False, **kwargs):
+    if not raw and (created or instance.status != instance._saved_status):
+        jobs.queue_booking_notifications([instance])
+    instance._saved_status = instance.status
+
+
+@receiver(post_save, sender=MaintenanceRequest)
+def queue_maintenance_notification(sender, instance, created, raw=False, **kwargs):
+    if not raw and (created or instance.status != instance._saved_status):
+        jobs.queue_maintenance_notifications([instance])
+    instance._saved_status = instance.status
@@ -0,0 +1,157 @@
+import logging
+import os
+import socket
+import traceback
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_DELAY = 3600
+
+
+def task(max_attempts=5, retry_delay=30, atomic=True):
+    """
+    Mark a function as a task the worker may run. Failed attempts are retried
+    after ``retry_delay`` seconds, doubling each time. ``atomic`` tasks run in
+    a transaction, so a failed attempt leaves no partial writes behind.
+    """
+    def decorator(func):
+        func.task_options = {
+            'max_attempts': max_attempts, 'retry_delay': retry_delay, 'atomic': atomic,
+        }
+        return func
+    return decorator
+
+
+def task_name(func):
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def get_task(name):
+    func = import_string(name)
+    if not hasattr(func, 'task_options'):
+        raise ImproperlyConfigured(f'{name} is not a task.')
+    return func
+
+
+def enqueue_many(func, calls, run_at=None):
+    """
+    Queue ``func(**kwargs)`` for each ``(key, kwargs)`` in ``calls``.
+
+    Tasks are written in the caller's transaction, so they exist exactly when
+    the change that caused them commits. A task whose idempotency key is
+    already taken is skipped; ``None`` keys never collide.
+    """
+    run_at = run_at or timezone.now()
+    Task.objects.bulk_create([
+        Task(
+            name=task_name(func), kwargs=kwargs, idempotency_key=key, run_at=run_at,
+            max_attempts=func.task_options['max_attempts'],
+        )
+        for key, kwargs in calls
+    ], ignore_conflicts=True)
+
+
+def enqueue(func, key=None, run_at=None, **kwargs):
+    enqueue_many(func, [(key, kwargs)], run_at=run_at)
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim(worker, limit=10):
+    """Mark up to ``limit`` due tasks as running for ``worker`` and return them."""
+    now = timezone.now()
+    with transaction.atomic():
+        due = list(
+            Task.objects.select_for_update(skip_locked=True)
+            .filter(status='PENDING', run_at__lte=now)
+            .order_by('run_at', 'id').values_list('pk', flat=True)[:limit]
+        )
+        if not due:
+            return []
+        # Re-checking the status keeps two workers apart on databases
+        # without row locks.
+        Task.objects.filter(pk__in=due, status='PENDING').update(
+            status='RUNNING', locked_by=worker, locked_at=now, attempts=F('attempts') + 1
+        )
+        return list(
+            Task.objects.filter(pk__in=due, status='RUNNING', locked_by=worker, locked_at=now)
+            .order_by('run_at', 'id')
+        )
+
+
+def _finish(task, **fields):
+    Task.objects.filter(pk=task.pk, locked_by=task.locked_by).update(
+        locked_by='', locked_at=None, updated_at=timezone.now(), **fields
+    )
+
+
+def run(task):
+    """Run one claimed task and record its outcome. Returns ``True`` on success."""
+    options = {'retry_delay': 30, 'atomic': True}
+    try:
+        func = get_task(task.name)
+        options = func.task_options
+        if options['atomic']:
+            with transaction.atomic():
+                func(**task.kwargs)
+        else:
+            func(**task.kwargs)
+    except Exception:
+        logger.exception('Task %s (%s) failed', task.pk, task.name)
+        now = timezone.now()
+        if task.attempts >= task.max_attempts:
+            _finish(task, status='FAILED', finished_at=now, last_error=traceback.format_exc())
+        else:
+            delay = min(options['retry_delay'] * 2 ** (task.attempts - 1), MAX_RETRY_DELAY)
+            _finish(
+                task, status='PENDING', run_at=now + timedelta(seconds=delay),
+                last_error=traceback.format_exc(),
+            )
+        return False
+    _finish(task, status='DONE', finished_at=timezone.now(), last_error='')
+    return True
+
+
+def release_stale(timeout):
+    """
+    Return tasks whose worker went away more than ``timeout`` seconds ago to
+    the queue, or fail them if they have no attempts left.
+    """
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    stale = Task.objects.filter(status='RUNNING', locked_at__lt=cutoff)
+    error = 'The worker stopped while running this task.'
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='FAILED', finished_at=timezone.now(), locked_by='', locked_at=None, last_error=error,
+    )
+    retried = stale.update(status='PENDING', locked_by='', locked_at=None, last_error=error)
+    return failed + retried
+
+
+def schedule_periodic(now=None):
+    """
+    Queue today's run of each ``TASK_SCHEDULE`` entry once its time has
+    passed. The key is derived from the date, so several workers (or a
+    restarted one) queue each run only once.
+    """
+    now = timezone.localtime(now)
+    for name, entry in getattr(settings, 'TASK_SCHEDULE', {}).items():
+        run_at = timezone.make_aware(datetime.combine(
+            now.date(), time(entry.get('hour', 0), entry.get('minute', 0))
+        ))
+        if now >= run_at:
+            enqueue(
+                get_task(entry['task']), key=f'{name}:{run_at.date().isoformat()}', run_at=run_at,
+                **entry.get('kwargs', {}),
+            )
@@ -1,3 +1,1075 @@
-from django.test import TestCase
+import csv
+import json
+import shutil
+import tempfile
+import threading
+import time
+import warnings
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+from rest_framework.test import APIClient
+from unistay.settings import postgres_database
+
+from . import activity, availability, geo, images, jobs, metrics, pricing, projection, rollups, search, tasks, tokens, views
+from .cache import SingleFlight, invalidate
+from .models import (
+    Profile, Hostel, Room, Booking, Review, Favorite, Message, MaintenanceRequest, ConversationParticipant,
+    ForumTopic, ForumPost, University, CommunityCategory, CommunityPost, CommunityComment, ImageAsset, Task,
+    HostelDailyStats, RoomDailyStats,
+)
+
+
+def create_hostel(manager, name='Hostel', rooms=1, **fields):
+    hostel = Hostel.objects.create(**{
+        'name': name, 'description': 'Near campus', 'address': '1 Main St', 'city': 'Accra',
+        'state': 'Greater Accra', 'country': 'Ghana', 'zip_code': '00233', 'price_per_night': 50,
+        'manager': manager, **fields,
+    })
+    for number in range(rooms):
+        Room.objects.create(
+            hostel=hostel, room_number=str(number), room_type='SINGLE', capacity=1, price_per_night=50,
+        )
+    return hostel
+
+
+class ListQueryBudgetTests(TestCase):
+    """Every list route runs a fixed number of queries, whatever the page size."""
+
+    # route -> maximum number of queries for a list request
+    budgets = {
+        '/api/profiles/': 1,
+        '/api/hostels/': 2,
+        '/api/rooms/': 1,
+        '/api/bookings/': 1,
+        '/api/reviews/': 1,
+        '/api/favorites/': 2,
+        '/api/messages/': 1,
+        '/api/conversations/': 1,
+        '/api/maintenance-requests/': 2,
+        '/api/forum-topics/': 2,
+        '/api/forum-posts/': 1,
+        '/api/community-posts/?sort=hot': 2,
+        '/api/search/?q=Hostel': 4,
+    }
+
+    def setUp(self):
+        self.user = User.objects.create_user('student', password='secret')
+        self.user.is_staff = True
+        self.user.save()
+        Profile.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.serial = 0
+
+    def create_rows(self, count):
+        for _ in range(count):
+            self.serial += 1
+            n = self.serial
+            other = User.objects.create(username=f'user{n}')
+            hostel = Hostel.objects.create(
+                name=f'Hostel {n}', description='Near campus', address=f'{n} Main St',
+                city='Accra', state='Greater Accra', country='Ghana', zip_code='00233',
+                price_per_night=50, manager=other,
+            )
+            room = None
+            for number in range(2):
+                room = Room.objects.create(
+                    hostel=hostel, room_number=f'{n}-{number}', room_type='SINGLE',
+                    capacity=1, price_per_night=50,
+                )
+            Booking.objects.create(
+                user=self.user, room=room, check_in_date=date(2024, 1, 1),
+                check_out_date=date(2024, 1, 3), total_price=100,
+            )
+            Review.objects.create(user=other, hostel=hostel, rating=4, comment='Nice')
+            Favorite.objects.create(user=self.user, hostel=hostel)
+            Message.objects.create(sender=other, receiver=self.user, content='Hi')
+            MaintenanceRequest.objects.create(
+                user=self.user, hostel=hostel, title='Leak', description='Tap leaks'
+            )
+            topic = ForumTopic.objects.create(title=f'Topic {n}', description='...', created_by=other)
+            for _ in range(2):
+                ForumPost.objects.create(topic=topic, author=other, content='Reply')
+            category, _ = CommunityCategory.objects.get_or_create(name='General')
+            post = CommunityPost.objects.create(category=category, author=other, title='Post', content='...')
+            CommunityComment.objects.create(post=post, author=self.user, content='Reply')
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return len(queries)
+
+    def test_list_routes_stay_within_query_budget(self):
+        self.create_rows(2)
+        small = {url: self.count_queries(url) for url in self.budgets}
+        self.create_rows(8)
+        for url, budget in self.budgets.items():
+            with self.subTest(url=url):
+                large = self.count_queries(url)
+                self.assertEqual(large, small[url])
+                self.assertLessEqual(large, budget)
+
+
+class ValuesListTests(TestCase):
+    """List responses built from values() rows match the serializers byte for byte."""
+
+    urls = [
+        '/api/hostels/', '/api/hostels/?sort=-rating', '/api/rooms/', '/api/bookings/',
+        '/api/reviews/', '/api/favorites/', '/api/messages/', '/api/maintenance-requests/',
+        '/api/forum-topics/', '/api/forum-topics/?sort=hot', '/api/forum-posts/',
+    ]
+
+    def setUp(self):
+        self.user = User.objects.create_user('student', email='s@example.com', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        cover = ImageAsset.objects.create(
+            owner=self.user, original='images/originals/a.jpg', status='READY', width=800, height=600,
+            renditions={'thumb': {'name': 'images/a-thumb.webp', 'width': 160, 'height': 120}},
+        )
+        for n in range(3):
+            manager = User.objects.create(username=f'manager{n}', first_name='Kwame \u2028 Mensah')
+            hostel = Hostel.objects.create(
+                name=f'Hostel {n} \u00e9', description='Near campus', address=f'{n} Main St',
+                city='Accra', state='Greater Accra', country='Ghana', zip_code='00233',
+                price_per_night='49.90', manager=manager, amenities=['wifi'],
+                latitude=5.6 + n / 100000, longitude=-0.00001 * n,
+                cover_image=cover if n else None,
+            )
+            room = Room.objects.create(
+                hostel=hostel, room_number=str(n), room_type='DOUBLE', capacity=2,
+                price_per_night='20.50', cover_image=cover if n == 2 else None,
+            )
+            Booking.objects.create(
+                user=self.user, room=room, check_in_date=date(2024, 1, 1),
+                check_out_date=date(2024, 1, 3), total_price=41,
+            )
+            Review.objects.create(user=manager, hostel=hostel, rating=n + 3, comment='"Quoted"')
+            Favorite.objects.create(user=self.user, hostel=hostel)
+            Message.objects.create(sender=manager, receiver=self.user, content='Hi')
+            MaintenanceRequest.objects.create(user=self.user, hostel=hostel, title='Leak', description='...')
+            topic = ForumTopic.objects.create(title=f'Topic {n}', description='...', created_by=manager)
+            ForumPost.objects.create(topic=topic, author=self.user, content='Reply')
+
+    def test_values_lists_match_serializer_output(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                cache.clear()
+                fast = self.client.get(url, {'page_size': 2})
+                cache.clear()
+                with mock.patch.object(projection, 'get_values_plan', return_value=None):
+                    slow = self.client.get(url, {'page_size': 2})
+                self.assertEqual(fast.status_code, 200)
+                self.assertEqual(fast.content, slow.content)
+                if fast.data['next']:
+                    cursor = self.client.get(fast.data['next'])
+                    self.assertEqual(cursor.status_code, 200)
+
+
+class ThreadActivityTests(TestCase):
+    """Reply counters follow reply writes and order the feeds."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('student', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_counters_follow_replies(self):
+        quiet = ForumTopic.objects.create(title='Quiet', description='...', created_by=self.user)
+        busy = ForumTopic.objects.create(title='Busy', description='...', created_by=self.user)
+        ForumTopic.objects.filter(pk=busy.pk).update(created_at=quiet.created_at)
+        activity.rebuild_activity(ForumTopic)
+        posts = [ForumPost.objects.create(topic=busy, author=self.user, content='Reply') for _ in range(3)]
+        moved = ForumPost.objects.only('id').get(pk=posts[0].pk)
+        moved.topic = quiet
+        moved.save()
+        posts[1].delete()
+
+        self.assertEqual(activity.find_activity_mismatches(ForumTopic), [])
+        busy.refresh_from_db()
+        self.assertEqual((busy.reply_count, busy.last_activity_at), (1, posts[2].created_at))
+        response = self.client.get('/api/forum-topics/', {'sort': 'active'})
+        self.assertEqual([row['id'] for row in response.data['results']], [busy.pk, quiet.pk])
+        self.assertEqual(self.client.get('/api/forum-topics/', {'sort': 'oldest'}).status_code, 400)
+
+
+class SearchIndexTests(TestCase):
+    """The inverted index follows hostel and room writes."""
+
+    def test_cascade_delete_drops_hostel_once(self):
+        manager = User.objects.create_user('manager')
+        hostel = create_hostel(manager, name='Riverside Lodge', rooms=3)
+        client = APIClient()
+        self.assertEqual([row['id'] for row in client.get('/api/search/?q=riverside').data['results']], [hostel.pk])
+
+        hostel_id = hostel.pk
+        with mock.patch('api.search.index_documents', wraps=search.index_documents) as index:
+            hostel.delete()
+        index.assert_called_once_with(search.HOSTEL, [hostel_id])
+        cache.clear()
+        self.assertEqual(client.get('/api/search/?q=riverside').data['results'], [])
+
+    def test_edits_evict_cached_results(self):
+        cache.clear()
+        manager = User.objects.create_user('manager')
+        hostel = create_hostel(manager, name='Hilltop House')
+        client = APIClient()
+        self.assertEqual(client.get('/api/search/?q=lakeside').data['results'], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            hostel.name = 'Lakeside House'
+            hostel.save()
+        self.assertEqual([row['id'] for row in client.get('/api/search/?q=lakeside').data['results']], [hostel.pk])
+        room = hostel.rooms.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            room.amenities = ['sauna']
+            room.save()
+        self.assertEqual([row['id'] for row in client.get('/api/search/?q=sauna').data['results']], [hostel.pk])
+
+    def test_write_during_render_is_not_cached(self):
+        cache.clear()
+        hostel = create_hostel(User.objects.create_user('manager'), name='Hilltop House')
+        client = APIClient()
+        render = views._search
+
+        def racing_render(request):
+            response = render(request)
+            Hostel.objects.filter(pk=hostel.pk).update(price_per_night=80)
+            invalidate(f'hostel:{hostel.pk}')
+            return response
+
+        with mock.patch('api.views._search', racing_render):
+            client.get('/api/search/?q=hilltop')
+        response = client.get('/api/search/?q=hilltop')
+        self.assertEqual(response.data['results'][0]['price_per_night'], '80.00')
+
+
+class CacheInvalidationTests(TransactionTestCase):
+    """Cached responses are evicted when a write commits, not before."""
+
+    def test_read_before_commit_is_not_served_after_it(self):
+        cache.clear()
+        hostel = create_hostel(User.objects.create_user('manager'))
+        client = APIClient()
+        client.force_authenticate(hostel.manager)
+        url = f'/api/hostels/{hostel.pk}/'
+        reads = []
+
+        def read():
+            # Another connection sees only what is committed.
+            reads.append(client.get(url).data['price_per_night'])
+            connection.close()
+
+        with transaction.atomic():
+            hostel.price_per_night = 80
+            hostel.save()
+            thread = threading.Thread(target=read)
+            thread.start()
+            thread.join()
+        self.assertEqual(reads, ['50.00'])
+        self.assertEqual(client.get(url).data['price_per_night'], '80.00')
+
+
+class AvailabilityTests(TestCase):
+    """Stays hold a room for [check_in, check_out); cancelled ones hold nothing."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('student')
+        self.room = create_hostel(self.user).rooms.get()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def book(self, check_in, check_out, status='PENDING'):
+        return Booking.objects.create(
+            user=self.user, room=self.room, check_in_date=check_in, check_out_date=check_out,
+            status=status, total_price=50,
+        )
+
+    def available(self, check_in, check_out):
+        response = self.client.get('/api/rooms/available/', {'check_in': check_in, 'check_out': check_out})
+        return [row['id'] for row in response.data['results']]
+
+    def test_overlap_edges(self):
+        self.book(date(2024, 3, 10), date(2024, 3, 12))
+        self.book(date(2024, 3, 1), date(2024, 3, 20), status='CANCELLED')
+        # Same-day turnover: leaving guests free the room for arrivals.
+        self.assertFalse(availability.has_conflict(self.room.pk, date(2024, 3, 12), date(2024, 3, 14)))
+        self.assertFalse(availability.has_conflict(self.room.pk, date(2024, 3, 8), date(2024, 3, 10)))
+        self.assertTrue(availability.has_conflict(self.room.pk, date(2024, 3, 11), date(2024, 3, 12)))
+        self.assertTrue(availability.has_conflict(self.room.pk, date(2024, 3, 1), date(2024, 3, 20)))
+        self.assertEqual(self.available('2024-03-12', '2024-03-14'), [self.room.pk])
+        self.assertEqual(self.available('2024-03-09', '2024-03-11'), [])
+
+    def test_booking_rejects_overlap(self):
+        self.book(date(2024, 3, 10), date(2024, 3, 12), status='CONFIRMED')
+        data = {'room_id': self.room.pk, 'check_in_date': '2024-03-11', 'check_out_date': '2024-03-13'}
+        self.assertEqual(self.client.post('/api/bookings/', data).status_code, 400)
+        data['check_in_date'] = '2024-03-12'
+        self.assertEqual(self.client.post('/api/bookings/', data).status_code, 201)
+
+
+@override_settings(PRICING_RULES=[
+    {'class': 'api.pricing.SeasonalRateRule', 'seasons': [('12-30', '01-01', 1.5), ('06-01', '06-01', '0.333')]},
+])
+class PricingTests(TestCase):
+    """Stays are priced per night on the server, within MAX_STAY_NIGHTS."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('student')
+        self.room = create_hostel(self.user).rooms.get()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_rules_apply_per_night(self):
+        # Seasons wrap the new year: Dec 30, Dec 31 and Jan 1 cost 75, Jan 2 costs 50.
+        priced = pricing.quote(self.room, date(2024, 12, 29), date(2025, 1, 3))
+        self.assertEqual((priced.nights, priced.total_price), (5, Decimal('325.00')))
+        # Each night is summed unrounded and the total rounded half up once.
+        priced = pricing.quote(self.room, date(2024, 6, 1), date(2024, 6, 2))
+        self.assertEqual(priced.total_price, Decimal('16.65'))
+
+    def test_bookings_and_quotes_are_priced_and_bounded(self):
+        response = self.client.post('/api/bookings/', {
+            'room_id': self.room.pk, 'check_in_date': '2024-12-31', 'check_out_date': '2025-01-03',
+            'total_price': '1.00',
+        })
+        self.assertEqual(response.data['total_price'], '200.00')
+
+        item = {'room_id': self.room.pk, 'check_in': '2024-01-01', 'check_out': '2025-01-01'}
+        with override_settings(MAX_STAY_NIGHTS=366):
+            response = self.client.post('/api/bookings/quote/', {'items': [item]}, format='json')
+            self.assertEqual(response.data['quotes'][0]['nights'], 366)
+        self.assertEqual(self.client.post('/api/bookings/quote/', {'items': [item]}, format='json').status_code, 400)
+        response = self.client.post('/api/bookings/', {
+            'room_id': self.room.pk, 'check_in_date': '0001-01-01', 'check_out_date': '9999-12-31',
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('check_out_date', response.data)
+
+
+class BulkWriteTests(TestCase):
+    """Bulk endpoints apply a whole list in one transaction or report errors per item."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('student')
+        self.other = User.objects.create_user('other')
+        self.hostel = create_hostel(self.other, rooms=0)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def bulk(self, method, data):
+        return getattr(self.client, method)('/api/rooms/bulk/', data, format='json')
+
+    def rooms(self, count):
+        return [
+            {'hostel': self.hostel.pk, 'room_number': str(n), 'room_type': 'SINGLE', 'capacity': 1,
+             'price_per_night': '40.00'}
+            for n in range(count)
+        ]
+
+    def test_create_update_delete(self):
+        response = self.bulk('post', self.rooms(3))
+        self.assertEqual(response.status_code, 201)
+        ids = [row['id'] for row in response.data]
+        response = self.bulk('patch', [{'id': pk, 'capacity': 2} for pk in ids])
+        self.assertEqual([row['capacity'] for row in response.data], [2, 2, 2])
+        self.assertEqual(self.bulk('delete', {'ids': ids[:2]}).status_code, 204)
+        self.assertEqual(list(Room.objects.values_list('pk', flat=True)), ids[2:])
+
+    def test_errors_are_reported_per_item(self):
+        items = self.rooms(3)
+        items[1]['capacity'] = 'many'
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            response = self.bulk('post', items)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data), [1])
+        self.assertFalse(Room.objects.exists())
+
+        room_id = self.bulk('post', self.rooms(1)).data[0]['id']
+        self.assertEqual(self.bulk('patch', [{'id': True, 'capacity': 2}]).status_code, 400)
+        self.assertEqual(self.bulk('delete', {'ids': [True]}).status_code, 400)
+        self.assertEqual(Room.objects.get(pk=room_id).capacity, 1)
+        with mock.patch.object(views.RoomViewSet, 'bulk_max_items', 2):
+            self.assertEqual(self.bulk('post', self.rooms(3)).status_code, 400)
+
+    def test_bookings_are_scoped_to_their_owner(self):
+        room = create_hostel(self.other).rooms.get()
+        theirs = Booking.objects.create(
+            user=self.other, room=room, check_in_date=date(2024, 1, 1), check_out_date=date(2024, 1, 2),
+            total_price=50,
+        )
+        response = self.client.patch('/api/bookings/bulk/', [{'id': theirs.pk, 'status': 'CANCELLED'}], format='json')
+        self.assertEqual(response.data, {0: {'id': ['Not found.']}})
+        response = self.client.delete('/api/bookings/bulk/', {'ids': [theirs.pk]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(Booking.objects.filter(pk=theirs.pk, status='PENDING').exists())
+
+
+class ExportTests(TestCase):
+    """Exports stream a manager's own rows, filtered, as CSV or NDJSON."""
+
+    def setUp(self):
+        self.manager = User.objects.create_user('manager')
+        Profile.objects.create(user=self.manager, is_manager=True)
+        self.hostel = create_hostel(self.manager)
+        self.other = create_hostel(User.objects.create_user('other'))
+        guest = User.objects.create_user('guest')
+        self.bookings = [
+            Booking.objects.create(
+                user=guest, room=hostel.rooms.get(), check_in_date=check_in,
+                check_out_date=check_in.replace(day=3), total_price=100,
+            )
+            for hostel, check_in in [
+                (self.hostel, date(2024, 1, 1)), (self.hostel, date(2024, 2, 1)), (self.other, date(2024, 1, 1)),
+            ]
+        ]
+        Review.objects.create(user=guest, hostel=self.hostel, rating=1, comment='=HYPERLINK("http://x")')
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def export(self, path, **params):
+        response = self.client.get(f'/api/exports/{path}', params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def csv_rows(self, path, **params):
+        return list(csv.DictReader(self.export(path, **params).splitlines()))
+
+    def test_managers_export_their_hostels(self):
+        ids = lambda rows: [int(row['id']) for row in rows]
+        mine = [booking.pk for booking in self.bookings[:2]]
+        self.assertEqual(ids(self.csv_rows('bookings.csv')), mine)
+        self.assertEqual(ids(self.csv_rows('bookings.csv', date_from='2024-01-15')), mine[1:])
+        self.assertEqual(ids(self.csv_rows('bookings.csv', date_to='2024-01-01')), mine[:1])
+        self.assertEqual(ids(self.csv_rows('bookings.csv', hostel_id=self.other.pk)), [])
+        lines = self.export('bookings.ndjson', hostel_id=self.hostel.pk).splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], mine)
+
+        guest = APIClient()
+        guest.force_authenticate(User.objects.create_user('student'))
+        self.assertEqual(guest.get('/api/exports/bookings.csv').status_code, 403)
+        self.client.force_authenticate(User.objects.create_user('staff', is_staff=True))
+        self.assertEqual(len(self.csv_rows('bookings.csv')), 3)
+
+    def test_formulas_are_escaped_in_csv_only(self):
+        [row] = self.csv_rows('reviews.csv')
+        self.assertEqual(row['comment'], '\'=HYPERLINK("http://x")')
+        [line] = self.export('reviews.ndjson').splitlines()
+        self.assertEqual(json.loads(line)['comment'], '=HYPERLINK("http://x")')
+
+
+class HostelFilterTests(TestCase):
+    """Hostel and room lists filter, sort and count facets from the query string."""
+
+    def setUp(self):
+        self.manager = User.objects.create_user('manager')
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def ids(self, path, **params):
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return sorted(row['id'] for row in response.data['results'])
+
+    def test_city_matches_part_of_the_name(self):
+        accra = create_hostel(self.manager, city='Accra', rooms=0)
+        kumasi = create_hostel(self.manager, city='Kumasi', rooms=0)
+        self.assertEqual(self.ids('/api/hostels/', city='acc'), [accra.pk])
+        self.assertEqual(self.ids('/api/hostels/', city='acc,MAS'), [accra.pk, kumasi.pk])
+        self.assertEqual(self.ids('/api/hostels/', city_exact='acc'), [])
+        self.assertEqual(self.ids('/api/hostels/', city_exact='ACCRA'), [accra.pk])
+
+    def test_managers_see_their_inactive_hostels(self):
+        active = create_hostel(User.objects.create_user('other'), rooms=0)
+        create_hostel(User.objects.create_user('closed'), is_active=False, rooms=0)
+        mine = create_hostel(self.manager, is_active=False, rooms=0)
+        self.assertEqual(self.ids('/api/hostels/'), [active.pk, mine.pk])
+        self.client.force_authenticate(User.objects.create_user('staff', is_staff=True))
+        self.assertEqual(len(self.ids('/api/hostels/')), 3)
+
+    def create_rooms(self, *rooms):
+        hostel = create_hostel(self.manager, rooms=0)
+        return [
+            Room.objects.create(
+                hostel=hostel, room_number=str(number), room_type=room_type, capacity=1,
+                price_per_night=price, amenities=amenities,
+            ).pk
+            for number, (room_type, price, amenities) in enumerate(rooms)
+        ]
+
+    def test_range_bounds_are_inclusive(self):
+        rooms = self.create_rooms(('SINGLE', 40, []), ('SINGLE', 50, []), ('SINGLE', 100, []), ('SINGLE', 101, []))
+        self.assertEqual(self.ids('/api/rooms/', price_min=50, price_max=100), rooms[1:3])
+        self.assertEqual(self.ids('/api/rooms/', price_max=40), rooms[:1])
+        response = self.client.get('/api/rooms/', {'price_min': 100, 'price_max': 50})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('price_max', response.data)
+
+    def test_amenities_must_all_be_present(self):
+        rooms = self.create_rooms(
+            ('SINGLE', 50, ['WiFi', 'Parking']), ('SINGLE', 50, ['wifi']), ('SINGLE', 50, ['parking']),
+        )
+        self.assertEqual(self.ids('/api/rooms/', amenities='wifi,PARKING'), rooms[:1])
+        self.assertEqual(self.ids('/api/rooms/', amenities=' wifi '), rooms[:2])
+
+    def test_facets_apply_every_filter_but_their_own(self):
+        self.create_rooms(('SINGLE', 40, ['wifi']), ('DOUBLE', 60, ['wifi']), ('SINGLE', 150, []))
+        facets = self.client.get('/api/rooms/facets/', {'room_type': 'SINGLE', 'price_max': 100}).data
+        self.assertEqual(facets['room_type'], [{'value': 'DOUBLE', 'count': 1}, {'value': 'SINGLE', 'count': 1}])
+        self.assertEqual([bucket['count'] for bucket in facets['price']], [1, 0, 1, 0, 0])
+        self.assertEqual(facets['amenities'], [{'value': 'wifi', 'count': 1}])
+
+    def test_unknown_sort_is_rejected(self):
+        cheap, dear = create_hostel(self.manager, price_per_night=30), create_hostel(self.manager, price_per_night=90)
+        response = self.client.get('/api/hostels/', {'sort': '-price'})
+        self.assertEqual([row['id'] for row in response.data['results']], [dear.pk, cheap.pk])
+        self.assertEqual(self.client.get('/api/hostels/', {'sort': 'name'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/rooms/', {'sort': 'name'}).status_code, 400)
+
+
+class NearbyHostelTests(TestCase):
+    """Nearby hostels come from the grid cells around a campus, nearest first."""
+
+    def setUp(self):
+        self.manager = User.objects.create_user('manager')
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def campus(self, latitude, longitude):
+        return University.objects.create(
+            name='Campus', location='Campus', description='...', latitude=latitude, longitude=longitude,
+        )
+
+    def hostel(self, latitude, longitude, **fields):
+        return create_hostel(self.manager, latitude=latitude, longitude=longitude, rooms=0, **fields)
+
+    def nearby(self, university, **params):
+        response = self.client.get('/api/hostels/nearby/', {'university_id': university.pk, **params})
+        self.assertEqual(response.status_code, 200, response.data)
+        return [(row['id'], row['distance_km']) for row in response.data['results']]
+
+    def test_hostels_within_the_radius_nearest_first(self):
+        legon = self.campus(5.65, -0.19)
+        three_km = self.hostel(5.623, -0.19, price_per_night=40)
+        one_km = self.hostel(5.659, -0.19, price_per_night=90)
+        eight_km = self.hostel(5.65, -0.118, price_per_night=40)
+        self.hostel(5.652, -0.19, is_active=False)
+        create_hostel(self.manager, rooms=0)
+
+        rows = self.nearby(legon)
+        self.assertEqual([pk for pk, _ in rows], [one_km.pk, three_km.pk])
+        self.assertAlmostEqual(rows[0][1], 1.0, places=1)
+        self.assertAlmostEqual(rows[1][1], 3.0, places=1)
+        rows = self.nearby(legon, radius_km=10)
+        self.assertEqual([pk for pk, _ in rows], [one_km.pk, three_km.pk, eight_km.pk])
+        self.assertEqual([pk for pk, _ in self.nearby(legon, radius_km=10, price_max=50)], [three_km.pk, eight_km.pk])
+
+    def test_radius_across_the_antimeridian(self):
+        south, north, west, east = geo.bounding_box(-16.5, 179.98, 20)
+        self.assertGreater(west, east)
+        suva = self.campus(-16.5, 179.98)
+        east_side = self.hostel(-16.5, 179.9)
+        west_side = self.hostel(-16.5, -179.95)
+        self.hostel(-16.5, -179.5)
+        self.assertEqual([pk for pk, _ in self.nearby(suva, radius_km=20)], [west_side.pk, east_side.pk])
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    """Racing requests for the same dates produce one booking."""
+
+    def test_one_of_many_concurrent_bookings_wins(self):
+        room = create_hostel(User.objects.create_user('manager')).rooms.get()
+        users = [User.objects.create_user(f'student{n}') for n in range(8)]
+        start, statuses = threading.Barrier(len(users)), []
+
+        def book(user):
+            client = APIClient()
+            client.force_authenticate(user)
+            start.wait()
+            try:
+                statuses.append(client.post('/api/bookings/', {
+                    'room_id': room.pk, 'check_in_date': '2024-05-01', 'check_out_date': '2024-05-04',
+                }).status_code)
+            finally:
+                connections.close_all()
+
+        with override_settings(THROTTLE_BUCKETS={}):
+            threads = [threading.Thread(target=book, args=(user,)) for user in users]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(sorted(statuses), [201] + [400] * 7)
+        self.assertEqual(Booking.objects.filter(room=room).count(), 1)
+
+
+class ConversationTests(TestCase):
+    """Unread counters and inbox order follow message writes."""
+
+    def setUp(self):
+        self.user, self.bob, self.carol = [User.objects.create_user(name) for name in ('alice', 'bob', 'carol')]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def send(self, sender, receiver, content='Hi'):
+        return Message.objects.create(sender=sender, receiver=receiver, content=content)
+
+    def inbox(self):
+        return [(row['other_user']['username'], row['unread_count']) for row in self.client.get('/api/conversations/').data['results']]
+
+    def test_unread_counters(self):
+        self.send(self.bob, self.user)
+        self.send(self.bob, self.user)
+        self.send(self.user, self.bob)
+        self.assertEqual(self.inbox(), [('bob', 2)])
+        conversation_id = self.client.get('/api/conversations/').data['results'][0]['id']
+        self.client.post(f'/api/conversations/{conversation_id}/read/')
+        self.send(self.bob, self.user)
+        self.assertEqual(self.inbox(), [('bob', 1)])
+        response = self.client.post('/api/messages/bulk/', [
+            {'receiver_id': self.bob.pk, 'content': 'One'}, {'receiver_id': self.carol.pk, 'content': 'Two'},
+        ], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.inbox(), [('carol', 0), ('bob', 1)])
+        self.assertEqual(ConversationParticipant.objects.get(user=self.bob, other_user=self.user).unread_count, 2)
+
+    def test_deleting_the_newest_message_reorders_the_inbox(self):
+        self.send(self.bob, self.user)
+        self.send(self.carol, self.user)
+        newest = self.send(self.bob, self.user)
+        self.assertEqual(self.inbox(), [('bob', 2), ('carol', 1)])
+        newest.delete()
+        self.assertEqual(self.inbox(), [('carol', 1), ('bob', 1)])
+
+
+class MessageStreamTests(TransactionTestCase):
+    """New messages are pushed as server-sent events under ASGI."""
+
+    async def test_stream_replays_missed_messages(self):
+        sender = await User.objects.acreate(username='sender')
+        receiver = await User.objects.acreate(username='receiver')
+        message = await Message.objects.acreate(sender=sender, receiver=receiver, content='Hi')
+        access = (await sync_to_async(tokens.issue_tokens)(receiver))['access']
+        stream = ApplicationCommunicator(get_asgi_application(), {
+            'type': 'http', 'method': 'GET', 'path': '/api/messages/stream/', 'query_string': b'since=0',
+            'headers': [(b'host', b'testserver'), (b'authorization', f'Bearer {access}'.encode())],
+        })
+        await stream.send_input({'type': 'http.request', 'body': b''})
+        start = await stream.receive_output(5)
+        event = await stream.receive_output(5)
+        # The client hanging up ends the stream.
+        await stream.send_input({'type': 'http.disconnect'})
+        await stream.wait(5)
+        self.assertEqual(start['status'], 200)
+        self.assertIn((b'Content-Type', b'text/event-stream'), start['headers'])
+        self.assertIn(f'id: {message.pk}\nevent: message\n', event['body'].decode())
+
+    def test_wsgi_is_refused(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('receiver'))
+        self.assertEqual(client.get('/api/messages/stream/').status_code, 501)
+
+
+def png_bytes(size=(800, 600)):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'teal').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class ImageUploadTests(TestCase):
+    """Uploads are checked and renamed before they are stored, and served only as renditions."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user('student')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def start(self, data, filename='photo.png'):
+        response = self.client.post('/api/image-uploads/', {'filename': filename, 'size': len(data)}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return f"/api/image-uploads/{response.data['id']}/"
+
+    def put(self, url, data, start, total):
+        return self.client.put(
+            url, data=data, content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{start + len(data) - 1}/{total}',
+        )
+
+    def test_chunked_upload_resumes_from_offset(self):
+        data = png_bytes()
+        url = self.start(data, filename='../../photo.html')
+        self.assertEqual(self.put(url, data[:100], 0, len(data)).data['received'], 100)
+        self.assertEqual(self.client.get(url).data['received'], 100)
+        response = self.put(url, data[200:], 200, len(data))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['received'], 100)
+        response = self.put(url, data[100:], 100, len(data))
+        self.assertEqual(response.status_code, 201)
+        asset = ImageAsset.objects.get(pk=response.data['asset']['id'])
+        self.assertRegex(asset.original.name, r'^images/originals/[0-9a-f]{32}\.png$')
+        self.assertEqual(self.put(url, data[:1], 0, len(data)).status_code, 409)
+
+    def test_non_images_are_rejected(self):
+        data = b'<script>alert(1)</script>'
+        url = self.start(data, filename='photo.png')
+        self.assertEqual(self.put(url, data, 0, len(data)).status_code, 400)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        response = self.client.post('/api/images/', {'file': SimpleUploadedFile('photo.png', data)})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ImageAsset.objects.exists())
+
+    def test_renditions_replace_the_original(self):
+        response = self.client.post('/api/images/', {'file': SimpleUploadedFile('photo.jpg', png_bytes())})
+        self.assertEqual(response.status_code, 202)
+        self.assertIsNone(response.data['src'])
+        asset = ImageAsset.objects.get(pk=response.data['id'])
+        self.assertTrue(asset.original.name.endswith('.png'))
+
+        images.process_image(asset.pk)
+        asset.refresh_from_db()
+        self.assertEqual((asset.status, asset.width, asset.height), ('READY', 800, 600))
+        self.assertEqual(asset.renditions['card']['width'], 480)
+        self.assertTrue(all(default_storage.exists(r['name']) for r in asset.renditions.values()))
+        src = self.client.get(f'/api/images/{asset.pk}/').data['src']
+        self.assertTrue(src.endswith(asset.renditions['full']['name']))
+
+    def test_only_undecodable_images_fail_for_good(self):
+        asset = ImageAsset.objects.create(
+            owner=self.user, original=SimpleUploadedFile('photo.png', png_bytes()),
+        )
+        with self.assertLogs('api.images', 'ERROR'):
+            with mock.patch.object(images, 'render', side_effect=OSError('storage unavailable')):
+                with self.assertRaises(OSError):
+                    images.process_image(asset.pk)
+            self.assertEqual(ImageAsset.objects.get(pk=asset.pk).status, 'FAILED')
+            with mock.patch.object(images, 'render', side_effect=UnidentifiedImageError('not an image')):
+                images.process_image(asset.pk)
+        self.assertEqual(ImageAsset.objects.get(pk=asset.pk).status, 'FAILED')
+        images.process_image(asset.pk)
+        self.assertEqual(ImageAsset.objects.get(pk=asset.pk).status, 'READY')
+
+
+@tasks.task()
+def noop_task():
+    pass
+
+
+@tasks.task(max_attempts=3, retry_delay=10)
+def failing_task():
+    raise RuntimeError('boom')
+
+
+class TaskQueueTests(TestCase):
+    """Tasks are claimed once, retried with backoff, deduplicated by key and pruned."""
+
+    def test_due_tasks_are_claimed_once(self):
+        tasks.enqueue(noop_task)
+        tasks.enqueue(noop_task)
+        tasks.enqueue(noop_task, run_at=timezone.now() + timedelta(hours=1))
+        claimed = tasks.claim('worker-a')
+        self.assertEqual([(task.status, task.attempts) for task in claimed], [('RUNNING', 1)] * 2)
+        self.assertEqual(tasks.claim('worker-b'), [])
+        self.assertTrue(all(tasks.run(task) for task in claimed))
+        self.assertEqual(Task.objects.filter(status='DONE').count(), 2)
+
+    def test_failures_back_off_then_fail(self):
+        tasks.enqueue(failing_task)
+        delays = []
+        with self.assertLogs('api.tasks', 'ERROR'):
+            for attempt in range(3):
+                Task.objects.update(run_at=timezone.now())
+                [claimed] = tasks.claim('worker')
+                self.assertFalse(tasks.run(claimed))
+                task = Task.objects.get()
+                delays.append(round((task.run_at - task.updated_at).total_seconds()))
+        self.assertEqual(delays[:2], [10, 20])
+        self.assertEqual((task.status, task.attempts), ('FAILED', 3))
+        self.assertIn('boom', task.last_error)
+        self.assertEqual(tasks.claim('worker'), [])
+
+    def test_idempotency_keys(self):
+        tasks.enqueue(noop_task, key='once')
+        tasks.enqueue(noop_task, key='once')
+        tasks.enqueue(noop_task)
+        tasks.enqueue(noop_task)
+        self.assertEqual(Task.objects.count(), 3)
+
+    @override_settings(TASK_SCHEDULE={'nightly': {'task': 'api.tests.noop_task', 'hour': 2}})
+    def test_periodic_tasks_are_queued_once_a_day(self):
+        tasks.schedule_periodic(timezone.make_aware(datetime(2024, 1, 1, 1)))
+        self.assertFalse(Task.objects.exists())
+        tasks.schedule_periodic(timezone.make_aware(datetime(2024, 1, 1, 3)))
+        tasks.schedule_periodic(timezone.make_aware(datetime(2024, 1, 1, 4)))
+        tasks.schedule_periodic(timezone.make_aware(datetime(2024, 1, 2, 3)))
+        self.assertEqual(
+            list(Task.objects.order_by('run_at').values_list('idempotency_key', flat=True)),
+            ['nightly:2024-01-01', 'nightly:2024-01-02'],
+        )
+
+    @override_settings(TASK_RETENTION_DAYS=7)
+    def test_finished_tasks_are_pruned(self):
+        old, recent = timezone.now() - timedelta(days=8), timezone.now() - timedelta(days=1)
+        for status, finished_at in [('DONE', old), ('FAILED', old), ('DONE', recent), ('PENDING', None)]:
+            Task.objects.create(
+                name=tasks.task_name(noop_task), status=status, run_at=old, finished_at=finished_at,
+            )
+        self.assertEqual(jobs.delete_finished_tasks(batch_size=1), 2)
+        self.assertEqual(sorted(Task.objects.values_list('status', flat=True)), ['DONE', 'PENDING'])
+
+
+class DatabaseUrlTests(TestCase):
+    def test_prisma_parameters_are_not_passed_to_libpq(self):
+        database = postgres_database(
+            'postgres://app:p%40ss@db:5432/unistay?schema=public&connection_limit=5&sslmode=require'
+        )
+        self.assertEqual(
+            (database['NAME'], database['USER'], database['PASSWORD'], database['HOST'], database['PORT']),
+            ('unistay', 'app', 'p@ss', 'db', '5432'),
+        )
+        self.assertEqual(database['OPTIONS'], {'sslmode': 'require', 'options': '-c search_path=public'})
+
+
+class MetricsTests(TestCase):
+    """Requests are recorded per route and exposed to staff in the Prometheus format."""
+
+    def setUp(self):
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+        self.staff = User.objects.create_user('staff', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def scrape(self):
+        response = self.client.get('/api/_metrics')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_requests_are_recorded(self):
+        self.assertEqual(self.client.get('/api/hostels/').status_code, 200)
+        output = self.scrape()
+        self.assertIn('unistay_http_requests_total{route="hostel-list",method="GET",status="200"} 1\n', output)
+        self.assertIn(
+            'unistay_http_request_duration_seconds_count{route="hostel-list",method="GET"} 1\n', output,
+        )
+        stats = metrics.registry.routes[('hostel-list', 'GET')]
+        self.assertGreater(stats.queries, 0)
+        self.assertGreater(stats.bytes, 0)
+
+        student = APIClient()
+        student.force_authenticate(User.objects.create_user('student'))
+        self.assertEqual(student.get('/api/_metrics').status_code, 403)
+        self.assertIn(APIClient().get('/api/_metrics').status_code, (401, 403))
+
+    def test_streaming_responses_are_measured_until_sent(self):
+        create_hostel(self.staff)
+        response = self.client.get('/api/exports/bookings.csv')
+        self.assertNotIn(('export', 'GET'), metrics.registry.routes)
+        body = b''.join(response.streaming_content)
+        response.close()
+        stats = metrics.registry.routes[('export', 'GET')]
+        self.assertEqual((stats.count, stats.bytes), (1, len(body)))
+        self.assertGreater(stats.queries, 0)
+
+
+class ReferenceDataTests(TestCase):
+    """Reference sets are served from memory and evicted by writes."""
+
+    def test_reference_sets_are_cached_until_written(self):
+        cache.clear()
+        University.objects.create(name='University of Ghana', location='Legon', description='...')
+        CommunityCategory.objects.create(name='Housing')
+        client = APIClient()
+        self.assertEqual(client.get('/api/reference/').status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/reference/')
+        self.assertEqual(len(queries), 0)
+        self.assertEqual([row['name'] for row in response.data['community_categories']], ['Housing'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CommunityCategory.objects.create(name='Jobs')
+        response = client.get('/api/reference/', {'sets': 'community_categories'})
+        self.assertEqual(list(response.data), ['community_categories'])
+        self.assertEqual([row['name'] for row in response.data['community_categories']], ['Housing', 'Jobs'])
+
+
+class TokenAuthenticationTests(TestCase):
+    """Signed access tokens skip the password hash; refresh tokens rotate."""
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user('student', password='secret')
+        self.client = APIClient()
+
+    def post(self, path, data):
+        return self.client.post(path, data, format='json')
+
+    def test_login_refresh_and_revoke(self):
+        self.assertEqual(self.post('/api/login/', {'username': 'student', 'password': 'wrong'}).status_code, 401)
+        tokens = self.post('/api/login/', {'username': 'student', 'password': 'secret'}).data
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}')
+        self.assertEqual(self.client.get('/api/profiles/').status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/api/profiles/').status_code, 200)
+        self.assertEqual(len(queries), 1)
+        self.client.credentials()
+
+        rotated = self.post('/api/token/refresh/', {'refresh': tokens['refresh']})
+        self.assertEqual(rotated.status_code, 200)
+        # Replaying the used token ends the login, including the rotated token.
+        self.assertEqual(self.post('/api/token/refresh/', {'refresh': tokens['refresh']}).status_code, 401)
+        self.assertEqual(self.post('/api/token/refresh/', {'refresh': rotated.data['refresh']}).status_code, 401)
+
+        tokens = self.post('/api/login/', {'username': 'student', 'password': 'secret'}).data
+        self.assertEqual(self.post('/api/token/revoke/', {'refresh': tokens['refresh'], 'everywhere': True}).status_code, 204)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}')
+        self.assertEqual(self.client.get('/api/profiles/').status_code, 403)
+
+
+class ThrottlingTests(TestCase):
+    """Token buckets reject requests beyond their burst; identical misses coalesce."""
+
+    @override_settings(THROTTLE_BUCKETS={
+        'anon': {'rate': '60/min', 'burst': 5}, 'reference': {'rate': '60/min', 'burst': 2},
+    })
+    def test_route_bucket_limits_each_client(self):
+        cache.clear()
+        client = APIClient()
+        statuses = [client.get('/api/reference/').status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+        self.assertEqual(client.get('/api/reference/').headers['Retry-After'], '1')
+        other = APIClient(REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(other.get('/api/reference/').status_code, 200)
+
+    @override_settings(THROTTLE_BUCKETS={'anon': {'rate': '60/min', 'burst': 2}})
+    def test_forwarded_for_does_not_pick_the_bucket(self):
+        cache.clear()
+        client = APIClient()
+        statuses = [
+            client.get('/api/reference/', HTTP_X_FORWARDED_FOR=f'10.0.1.{n}').status_code for n in range(3)
+        ]
+        self.assertEqual(statuses, [200, 200, 429])
+
+    def test_single_flight_shares_one_call(self):
+        flight, release, calls = SingleFlight(), threading.Event(), []
+
+        def slow():
+            calls.append(1)
+            release.wait(5)
+            return 'result'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(flight.do('key', slow))) for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        # Give the other callers time to join the first call.
+        time.sleep(0.2)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results), [('result', False)] + [('result', True)] * 3)
+
+
+class ManagerStatsTests(TestCase):
+    """Daily rollups follow booking and review writes and feed the manager stats."""
+
+    def setUp(self):
+        self.manager = User.objects.create_user('manager', password='secret')
+        Profile.objects.create(user=self.manager, is_manager=True)
+        self.hostel = Hostel.objects.create(
+            name='Hostel', description='Near campus', address='1 Main St', city='Accra',
+            state='Greater Accra', country='Ghana', zip_code='00233', price_per_night=50,
+            manager=self.manager,
+        )
+        self.rooms = [
+            Room.objects.create(
+                hostel=self.hostel, room_number=str(number), room_type='SINGLE', capacity=1, price_per_night=50,
+            )
+            for number in range(2)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def test_rollups_follow_writes(self):
+        booking = Booking.objects.create(
+            user=self.manager, room=self.rooms[0], check_in_date=date(2024, 1, 1),
+            check_out_date=date(2024, 1, 4), status='CONFIRMED', total_price=100,
+        )
+        cancelled = Booking.objects.create(
+            user=self.manager, room=self.rooms[1], check_in_date=date(2024, 1, 2),
+            check_out_date=date(2024, 1, 3), status='CONFIRMED', total_price=50,
+        )
+        cancelled = Booking.objects.only('id').get(pk=cancelled.pk)
+        cancelled.status = 'CANCELLED'
+        cancelled.save()
+        review = Review.objects.create(user=self.manager, hostel=self.hostel, rating=2, comment='Noisy')
+        review.rating = 4
+        review.save()
+        self.assertEqual(rollups.find_rollup_mismatches(), [])
+
+        today = review.created_at.date().isoformat()
+        response = self.client.get('/api/managers/me/stats/', {'from': '2024-01-01', 'to': '2024-01-02'})
+        totals = response.data['totals']
+        self.assertEqual(
+            (totals['nights_booked'], totals['occupancy_rate'], totals['revenue'], totals['cancellations']),
+            (2, 0.5, '66.67', 1),
+        )
+        self.assertEqual(response.data['hostels'][0]['rooms'][0]['revenue'], '66.67')
+        self.assertEqual([day['revenue'] for day in response.data['daily']], ['33.34', '33.33'])
+        response = self.client.get('/api/managers/me/stats/', {'from': today, 'to': today})
+        self.assertEqual(response.data['totals']['new_reviews'], {'1': 0, '2': 0, '3': 0, '4': 1, '5': 0})
+
+        booking.delete()
+        self.assertEqual(rollups.find_rollup_mismatches(), [])
+        self.assertEqual(
+            self.client.get('/api/managers/me/stats/', {'from': '2024-01-02', 'to': '2024-01-01'}).status_code, 400,
+        )
+        guest = APIClient()
+        guest.force_authenticate(User.objects.create_user('guest'))
+        self.assertEqual(guest.get('/api/managers/me/stats/').status_code, 403)
+
+    def test_cascade_deletes_leave_no_rollups_behind(self):
+        guest = User.objects.create_user('guest')
+        other = create_hostel(User.objects.create_user('other'), rooms=1)
+        for room in self.rooms + [other.rooms.get()]:
+            Booking.objects.create(
+                user=guest, room=room, check_in_date=date(2024, 1, 1), check_out_date=date(2024, 1, 3),
+                status='CONFIRMED', total_price=100,
+            )
+        for hostel in (self.hostel, other):
+            Review.objects.create(user=guest, hostel=hostel, rating=5, comment='Great')
+
+        self.rooms[0].delete()
+        connection.check_constraints()
+        self.assertEqual(rollups.find_rollup_mismatches(), [])
+        self.hostel.delete()
+        connection.check_constraints()
+        other.manager.delete()
+        connection.check_constraints()
+        self.assertFalse(RoomDailyStats.objects.exists())
+        self.assertFalse(HostelDailyStats.objects.exists())
@@ -0,0 +1,91 @@
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+THROTTLE_PREFIX = 'api-throttle'
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# Makes each check-and-update atomic within a process. Across processes
+# sharing a cache, racing requests may each take the last token, so a
+# bucket can briefly exceed its burst by the number of workers.
+_lock = threading.Lock()
+
+
+def parse_rate(rate):
+    """``'30/min'`` -> seconds between tokens."""
+    count, period = rate.split('/')
+    return PERIODS[period[0]] / int(count)
+
+
+def throttle_scope(scope):
+    """Give a function view the route bucket ``scope``; put it below ``@api_view``."""
+    def decorator(func):
+        func.throttle_scope = scope
+        return func
+    return decorator
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token-bucket rate limits from ``THROTTLE_BUCKETS``.
+
+    Every request draws from the ``user`` bucket of its user, or the
+    ``anon`` bucket of its IP address when anonymous. Views with a
+    ``throttle_scope`` also draw from that bucket, kept per user or IP. A
+    request is let through only if every bucket has a token.
+
+    Each bucket is stored in the cache as the time at which it will be
+    full again (GCRA), so a check costs one read and one write however
+    many buckets apply.
+    """
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def client(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{self.get_ident(request)}'
+
+    def get_buckets(self, request, view):
+        """Return ``{cache key: (seconds per token, burst)}`` for the buckets that apply."""
+        configured = getattr(settings, 'THROTTLE_BUCKETS', {})
+        client = self.client(request)
+        scopes = ['user' if client.startswith('user:') else 'anon']
+        if getattr(view, 'throttle_scope', None):
+            scopes.append(view.throttle_scope)
+        return {
+            f'{THROTTLE_PREFIX}:{scope}:{client}': (
+                parse_rate(configured[scope]['rate']), configured[scope]['burst'],
+            )
+            for scope in scopes if scope in configured
+        }
+
+    def allow_request(self, request, view):
+        buckets = self.get_buckets(request, view)
+        if not buckets:
+            return True
+        with _lock:
+            now = time.time()
+            stored = cache.get_many(list(buckets))
+            full_at, wait = {}, 0
+            for key, (interval, burst) in buckets.items():
+                # Taking a token pushes the time the bucket is full again
+                # back by one interval; it may lie at most `burst` intervals
+                # ahead.
+                after = max(stored.get(key, now), now) + interval
+                wait = max(wait, after - now - burst * interval)
+                full_at[key] = after
+            if wait > 0:
+                self.wait_seconds = wait
+                return False
+            timeout = math.ceil(max(full_at.values()) - now)
+            cache.set_many(full_at, timeout)
+        return True
+
+    def wait(self):
+        return self.wait_seconds
@@ -0,0 +1,165 @@
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+
+from .models import RefreshToken
+
+ACCESS_SALT = 'api.tokens.access'
+REFRESH_SALT = 'api.tokens.refresh'
+USER_PREFIX = 'api-user'
+CUTOFF_PREFIX = 'api-token-cutoff'
+
+
+def _lifetime(name, default):
+    return getattr(settings, name, default)
+
+
+def _user_key(user_id):
+    return f'{USER_PREFIX}:{user_id}'
+
+
+def _cutoff_key(user_id):
+    return f'{CUTOFF_PREFIX}:{user_id}'
+
+
+def _auth_hash(user):
+    # Changes with the password, so a new password ends every token.
+    return user.get_session_auth_hash()[:16]
+
+
+def _sign(salt, payload):
+    return signing.Signer(salt=salt).sign_object(payload)
+
+
+def _unsign(salt, token):
+    try:
+        payload = signing.Signer(salt=salt).unsign_object(token)
+    except signing.BadSignature:
+        raise exceptions.AuthenticationFailed('Invalid token.')
+    if payload['exp'] <= time.time():
+        raise exceptions.AuthenticationFailed('Token has expired.')
+    return payload
+
+
+def _valid_user(user, payload):
+    return user is not None and user.is_active and constant_time_compare(_auth_hash(user), payload['h'])
+
+
+def forget_user(user_id):
+    """Drop a user from the lookup cache; ``api.signals`` calls it on every save."""
+    cache.delete(_user_key(user_id))
+
+
+def get_cached_user(user_id):
+    """
+    Return ``(user, cutoff)`` with one cache round trip when the user is
+    cached. ``cutoff`` is the time before which the user's access tokens
+    were revoked, or ``None``.
+    """
+    found = cache.get_many([_user_key(user_id), _cutoff_key(user_id)])
+    user = found.get(_user_key(user_id))
+    if user is None:
+        user = User.objects.filter(pk=user_id).first()
+        if user is not None:
+            cache.set(_user_key(user_id), user, _lifetime('USER_CACHE_TIMEOUT', 300))
+    return user, found.get(_cutoff_key(user_id))
+
+
+def issue_tokens(user, family=None):
+    """
+    Return a new access and refresh token for ``user``. ``family`` continues
+    the login a refresh token was rotated from.
+    """
+    now = time.time()
+    access_lifetime = _lifetime('ACCESS_TOKEN_LIFETIME', 300)
+    refresh_lifetime = _lifetime('REFRESH_TOKEN_LIFETIME', 14 * 24 * 3600)
+    refresh = RefreshToken.objects.create(
+        user=user, family=family or uuid.uuid4(),
+        expires_at=timezone.now() + timedelta(seconds=refresh_lifetime),
+    )
+    auth_hash = _auth_hash(user)
+    return {
+        'access': _sign(ACCESS_SALT, {'u': user.pk, 'h': auth_hash, 'iat': now, 'exp': now + access_lifetime}),
+        'refresh': _sign(REFRESH_SALT, {'t': str(refresh.pk), 'h': auth_hash, 'exp': now + refresh_lifetime}),
+        'token_type': 'Bearer',
+        'expires_in': access_lifetime,
+    }
+
+
+def _refresh_token(token):
+    payload = _unsign(REFRESH_SALT, token)
+    refresh = RefreshToken.objects.select_related('user').filter(pk=payload['t']).first()
+    if refresh is None or not _valid_user(refresh.user, payload):
+        raise exceptions.AuthenticationFailed('Invalid token.')
+    return refresh
+
+
+def rotate_tokens(token):
+    """
+    Exchange a refresh token for new tokens. Each refresh token works once;
+    presenting a used one again revokes its whole login, since either the
+    client or an attacker holds a copy.
+    """
+    refresh = _refresh_token(token)
+    now = timezone.now()
+    with transaction.atomic():
+        rotated = RefreshToken.objects.filter(pk=refresh.pk, revoked_at__isnull=True).update(revoked_at=now)
+        if rotated:
+            return issue_tokens(refresh.user, refresh.family)
+    RefreshToken.objects.filter(family=refresh.family, revoked_at__isnull=True).update(revoked_at=now)
+    raise exceptions.AuthenticationFailed('Token has been revoked.')
+
+
+def revoke_tokens(token, everywhere=False):
+    """
+    End the login of a refresh token, or with ``everywhere`` every login of
+    its user, including access tokens already issued.
+    """
+    refresh = _refresh_token(token)
+    now = timezone.now()
+    if not everywhere:
+        RefreshToken.objects.filter(family=refresh.family, revoked_at__isnull=True).update(revoked_at=now)
+        return
+    RefreshToken.objects.filter(user=refresh.user, revoked_at__isnull=True).update(revoked_at=now)
+    # Outstanding access tokens expire within their lifetime; until then the
+    # cutoff rejects them.
+    cache.set(_cutoff_key(refresh.user_id), time.time(), _lifetime('ACCESS_TOKEN_LIFETIME', 300))
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """
+    ``Authorization: Bearer <access token>``. Access tokens are signed, so
+    checking one needs no password hash and, while the user is cached, no
+    query.
+    """
+
+    keyword = b'bearer'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword:
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        try:
+            token = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        payload = _unsign(ACCESS_SALT, token)
+        user, cutoff = get_cached_user(payload['u'])
+        if not _valid_user(user, payload) or (cutoff is not None and payload['iat'] <= cutoff):
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        return user, token
+
+    def authenticate_header(self, request):
+        return 'Bearer realm="api"'
@@ -10,12 +10,27 @@ router.register(r'bookings', views.BookingViewSet, basename='booking')
 router.register(r'reviews', views.ReviewViewSet, basename='review')
 router.register(r'favorites', views.FavoriteViewSet, basename='favorite')
 router.register(r'messages', views.MessageViewSet, basename='message')
+router.register(r'conversations', views.ConversationViewSet, basename='conversation')
 router.register(r'maintenance-requests', views.MaintenanceRequestViewSet, basename='maintenance-request')
 router.register(r'forum-topics', views.ForumTopicViewSet, basename='forum-topic')
 router.register(r'forum-posts', views.ForumPostViewSet, basename='forum-post')
+router.register(r'universities', views.UniversityViewSet, basename='university')
+router.register(r'community-categories', views.CommunityCategoryViewSet, basename='community-category')
+router.register(r'community-posts', views.CommunityPostViewSet, basename='community-post')
+router.register(r'community-comments', views.CommunityCommentViewSet, basename='community-comment')
+router.register(r'images', views.ImageAssetViewSet, basename='image')
+router.register(r'image-uploads', views.ImageUploadViewSet, basename='image-upload')
 
 urlpatterns = [
+    path('messages/stream/', views.message_stream, name='message-stream'),
     path('', include(router.urls)),
     path('register/', views.register_user, name='register'),
+    path('login/', views.login, name='login'),
+    path('token/refresh/', views.refresh_token, name='token-refresh'),
+    path('token/revoke/', views.revoke_token, name='token-revoke'),
     path('search/', views.search, name='search'),
+    path('reference/', views.reference_data, name='reference'),
+    path('_metrics', views.metrics_view, name='metrics'),
+    path('exports/<slug:dataset>.<slug:fmt>', views.export, name='export'),
+    path('managers/me/stats/', views.manager_stats, name='manager-stats'),
 ] 
\ No newline at end of file
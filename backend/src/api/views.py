@@ -1,29 +1,67 @@
+import asyncio
+import json
+import re
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.auth.signals import user_logged_in
+from django.core.handlers.wsgi import WSGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
-from rest_framework.decorators import api_view, permission_classes, action
+from rest_framework.decorators import api_view, authentication_classes, permission_classes, action
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
+from rest_framework.exceptions import APIException, AuthenticationFailed, ValidationError
+from rest_framework.parsers import FormParser, MultiPartParser
+from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework import status
 from .models import Profile
 from .serializers import ProfileSerializer, UserSerializer
 from django.contrib.auth.models import User
-from rest_framework import viewsets, permissions
+from rest_framework import mixins, viewsets, permissions
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
+from django.db.models import Q, Sum
 from .models import (
-    Hostel, Room, Booking, Review, Favorite, Message, MaintenanceRequest,
-    ForumTopic, ForumPost, University,
+    Hostel, Room, Booking, Review, Favorite, Message, ConversationParticipant, MaintenanceRequest,
+    ForumTopic, ForumPost, University, ImageAsset, ImageUpload,
     CommunityCategory, CommunityPost, CommunityComment
 )
+from . import geo, images, metrics, rollups, search as search_index
+from .availability import available_rooms
+from .bulk import BulkWriteMixin
+from .cache import CachedResponseMixin, cached_response
+from .conversations import mark_read
+from .exports import EXPORTS, FORMATS
+from .filters import CommunityPostFilterSet, ForumTopicFilterSet, HostelFilterSet, RoomFilterSet
+from .pagination import RankedPagination
+from .pricing import quote_many
+from .realtime import get_channel_layer, user_channel
+from .reference import REFERENCE_SETS, ReferenceDataMixin, reference_cache, reference_response
+from .throttling import throttle_scope
+from .tokens import SignedTokenAuthentication, issue_tokens, revoke_tokens, rotate_tokens
+from .prefetch import PrefetchPlanMixin, apply_prefetch_plan
+from .projection import ValuesListMixin
 from .serializers import (
     HostelSerializer, RoomSerializer, BookingSerializer, ReviewSerializer,
     FavoriteSerializer, MessageSerializer, MaintenanceRequestSerializer,
     ForumTopicSerializer, ForumPostSerializer,
     UniversitySerializer, CommunityCategorySerializer, CommunityPostSerializer,
-    CommunityCommentSerializer
+    CommunityCommentSerializer, HostelSummarySerializer, FavoriteSummarySerializer,
+    MaintenanceRequestSummarySerializer, ForumTopicSummarySerializer,
+    CommunityPostSummarySerializer, AvailabilityQuerySerializer, QuoteRequestSerializer,
+    QuoteSerializer, ExportQuerySerializer, ConversationSerializer, ImageAssetSerializer,
+    ImageUploadSerializer, NearbyHostelSerializer, NearbyQuerySerializer, LoginSerializer,
+    RefreshTokenSerializer, StatsQuerySerializer
 )
 
 # Create your views here.
 
+STREAM_HEARTBEAT_SECONDS = 15
+STREAM_REPLAY_LIMIT = 500
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def test_view(request):
@@ -54,6 +92,7 @@ def create_profile(request):
 # Authentication Views
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_scope('auth')
 def register_user(request):
     serializer = UserSerializer(data=request.data)
     if serializer.is_valid():
@@ -62,10 +101,46 @@ def register_user(request):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['POST'])
+@authentication_classes([SignedTokenAuthentication])
+@permission_classes([AllowAny])
+@throttle_scope('auth')
+def login(request):
+    """Exchange a username and password for an access and a refresh token."""
+    serializer = LoginSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    user = authenticate(request, **serializer.validated_data)
+    if user is None:
+        raise AuthenticationFailed('Invalid username or password.')
+    user_logged_in.send(sender=type(user), request=request, user=user)
+    return Response(issue_tokens(user))
+
+@api_view(['POST'])
+@authentication_classes([SignedTokenAuthentication])
+@permission_classes([AllowAny])
+@throttle_scope('auth')
+def refresh_token(request):
+    """Exchange a refresh token for new tokens; the old refresh token stops working."""
+    serializer = RefreshTokenSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    return Response(rotate_tokens(serializer.validated_data['refresh']))
+
+@api_view(['POST'])
+@authentication_classes([SignedTokenAuthentication])
+@permission_classes([AllowAny])
+@throttle_scope('auth')
+def revoke_token(request):
+    """Log out the refresh token's login, or every login of its user with ``everywhere``."""
+    serializer = RefreshTokenSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    revoke_tokens(serializer.validated_data['refresh'], serializer.validated_data['everywhere'])
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
 # Profile Views
-class ProfileViewSet(viewsets.ModelViewSet):
+class ProfileViewSet(PrefetchPlanMixin, viewsets.ModelViewSet):
     serializer_class = ProfileSerializer
     permission_classes = [IsAuthenticated]
+    cursor_ordering = ('id',)
 
     def get_queryset(self):
         return Profile.objects.filter(user=self.request.user)
@@ -74,18 +149,65 @@ class ProfileViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user)
 
 # Hostel Views
-class HostelViewSet(viewsets.ModelViewSet):
+class HostelViewSet(CachedResponseMixin, ValuesListMixin, PrefetchPlanMixin, viewsets.ModelViewSet):
     queryset = Hostel.objects.all()
     serializer_class = HostelSerializer
     permission_classes = [IsAuthenticated]
+    cached_actions = ('retrieve',)
+
+    def get_cache_tags(self):
+        return [f'hostel:{self.kwargs["pk"]}']
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return HostelSummarySerializer
+        if self.action == 'nearby':
+            return NearbyHostelSerializer
+        return HostelSerializer
+
+    def get_filterset(self):
+        if not hasattr(self, '_filterset'):
+            self._filterset = HostelFilterSet(self.request.query_params)
+        return self._filterset
+
+    @property
+    def cursor_ordering(self):
+        return self.get_filterset().ordering
 
     def get_queryset(self):
         queryset = Hostel.objects.all()
-        city = self.request.query_params.get('city', None)
-        if city:
-            queryset = queryset.filter(city__icontains=city)
+        user = self.request.user
+        if self.action in ('list', 'facets') and not user.is_staff:
+            # Managers still see their own inactive hostels.
+            queryset = queryset.filter(Q(is_active=True) | Q(manager=user))
+        if self.action == 'list':
+            queryset = self.get_filterset().filter(queryset)
         return queryset
 
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """Counts per city, price band, rating band and amenity for the current filters."""
+        return Response(self.get_filterset().facets(self.get_queryset()))
+
+    @action(detail=False, methods=['get'])
+    def nearby(self, request):
+        """Active hostels within ``radius_km`` of a university, nearest first."""
+        params = NearbyQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        university = params.validated_data['university']
+        hostels = geo.nearby(
+            Hostel.objects.filter(is_active=True),
+            university.latitude, university.longitude, params.validated_data['radius_km'],
+        )
+        if 'price_max' in params.validated_data:
+            hostels = hostels.filter(price_per_night__lte=params.validated_data['price_max'])
+        hostels = apply_prefetch_plan(hostels.order_by('distance_km', 'id'), NearbyHostelSerializer)
+        paginator = RankedPagination()
+        page = paginator.paginate_ranked(
+            lambda offset, limit: list(hostels[offset:offset + limit]), request
+        )
+        return paginator.get_paginated_response(self.get_serializer(page, many=True).data)
+
     @action(detail=True, methods=['post'])
     def add_review(self, request, pk=None):
         hostel = self.get_object()
@@ -96,19 +218,47 @@ class HostelViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 # Room Views
-class RoomViewSet(viewsets.ModelViewSet):
+class RoomViewSet(BulkWriteMixin, ValuesListMixin, PrefetchPlanMixin, viewsets.ModelViewSet):
     queryset = Room.objects.all()
     serializer_class = RoomSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_filterset(self):
+        if not hasattr(self, '_filterset'):
+            self._filterset = RoomFilterSet(self.request.query_params)
+        return self._filterset
+
+    @property
+    def cursor_ordering(self):
+        if self.action == 'list':
+            return self.get_filterset().ordering
+        return ('id',)
+
     def get_queryset(self):
-        hostel_id = self.request.query_params.get('hostel_id', None)
-        if hostel_id:
-            return Room.objects.filter(hostel_id=hostel_id)
+        if self.action == 'list':
+            return self.get_filterset().filter(Room.objects.all())
         return Room.objects.all()
 
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """Counts per room type, capacity band, price band and amenity for the current filters."""
+        return Response(self.get_filterset().facets(Room.objects.all()))
+
+    @action(detail=False, methods=['get'])
+    def available(self, request):
+        params = AvailabilityQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        rooms = available_rooms(
+            params.validated_data['check_in'],
+            params.validated_data['check_out'],
+            params.validated_data.get('hostel_id'),
+        )
+        page = self.paginate_queryset(rooms)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
 # Booking Views
-class BookingViewSet(viewsets.ModelViewSet):
+class BookingViewSet(BulkWriteMixin, ValuesListMixin, PrefetchPlanMixin, viewsets.ModelViewSet):
     serializer_class = BookingSerializer
     permission_classes = [IsAuthenticated]
 
@@ -118,10 +268,26 @@ class BookingViewSet(viewsets.ModelViewSet):
         return Booking.objects.filter(user=self.request.user)
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        # The user defaults to the requester; staff may book for someone else.
+        serializer.save()
+
+    @action(detail=False, methods=['post'])
+    def quote(self, request):
+        serializer = QuoteRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data['items']
+        quotes = quote_many([
+            (item['room_id'], item['check_in'], item['check_out']) for item in items
+        ])
+        results = [
+            QuoteSerializer(priced).data if priced is not None
+            else {'room_id': item['room_id'], 'error': 'Room not found'}
+            for item, priced in zip(items, quotes)
+        ]
+        return Response({'quotes': results})
 
 # Review Views
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(ValuesListMixin, PrefetchPlanMixin, viewsets.ModelViewSet):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
     permission_classes = [IsAuthenticated]
@@ -133,10 +299,15 @@ class ReviewViewSet(viewsets.ModelViewSet):
         return Review.objects.all()
 
 # Favorite Views
-class FavoriteViewSet(viewsets.ModelViewSet):
+class FavoriteViewSet(ValuesListMixin, PrefetchPlanMixin, viewsets.ModelViewSet):
     serializer_class = FavoriteSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return FavoriteSummarySerializer
+        return FavoriteSerializer
+
     def get_queryset(self):
         return Favorite.objects.filter(user=self.request.user)
 
@@ -144,11 +315,23 @@ class FavoriteViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user)
 
 # Message Views
-class MessageViewSet(viewsets.ModelViewSet):
+class MessageViewSet(BulkWriteMixin, ValuesListMixin, PrefetchPlanMixin, viewsets.ModelViewSet):
     serializer_class = MessageSerializer
     permission_classes = [IsAuthenticated]
 
+    @property
+    def cursor_ordering(self):
+        # ?since=<id> reads forward from the last message a client has seen.
+        if self.action == 'list' and 'since' in self.request.query_params:
+            return ('id',)
+        return ('-created_at', '-id')
+
     def get_queryset(self):
+        since = self.request.query_params.get('since', None)
+        if self.action == 'list' and since is not None:
+            if not since.isdigit():
+                raise ValidationError({'since': ['Expected a message id.']})
+            return messages_since(self.request.user, int(since))
         return Message.objects.filter(
             Q(sender=self.request.user) | Q(receiver=self.request.user)
         ).order_by('-created_at')
@@ -156,11 +339,134 @@ class MessageViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(sender=self.request.user)
 
+    def get_bulk_save_kwargs(self):
+        return {'sender': self.request.user}
+
+def messages_since(user, since):
+    return Message.objects.filter(
+        Q(sender=user) | Q(receiver=user), pk__gt=since
+    ).order_by('pk')
+
+def _stream_user(request):
+    authenticators = [auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    try:
+        return Request(request, authenticators=authenticators).user
+    except APIException:
+        return AnonymousUser()
+
+def _message_backlog(user, since):
+    messages = apply_prefetch_plan(messages_since(user, since), MessageSerializer)
+    return [
+        json.loads(json.dumps(data, cls=JSONEncoder))
+        for data in MessageSerializer(messages[:STREAM_REPLAY_LIMIT + 1], many=True).data
+    ]
+
+def _sse(event, data, event_id=None):
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines += [f'event: {event}', f'data: {json.dumps(data)}']
+    return '\n'.join(lines) + '\n\n'
+
+async def _message_events(user, since):
+    async with get_channel_layer().subscribe(user_channel(user.pk)) as subscription:
+        last_id = since
+        if since is not None:
+            backlog = await sync_to_async(_message_backlog)(user, since)
+            for data in backlog[:STREAM_REPLAY_LIMIT]:
+                last_id = data['id']
+                yield _sse('message', data, last_id)
+            if len(backlog) > STREAM_REPLAY_LIMIT:
+                # Too far behind to replay; page /api/messages/?since= instead.
+                yield _sse('resync', {'since': last_id})
+        while True:
+            try:
+                data = await asyncio.wait_for(subscription.get(), STREAM_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if last_id is not None and data['id'] <= last_id:
+                continue
+            last_id = data['id']
+            yield _sse('message', data, last_id)
+
+async def message_stream(request):
+    """
+    Server-sent events with the user's new messages. Reconnecting clients
+    send ``Last-Event-ID`` (or ``?since=``) to replay what they missed.
+    Requires the ASGI application.
+    """
+    if isinstance(request, WSGIRequest):
+        # WSGI buffers the whole stream before sending it, and this one never ends.
+        return JsonResponse(
+            {'detail': 'Message streaming needs the ASGI server; poll /api/messages/?since= instead.'},
+            status=501,
+        )
+    if request.method != 'GET':
+        return JsonResponse({'detail': 'Method not allowed.'}, status=405)
+    user = await sync_to_async(_stream_user)(request)
+    if not user.is_authenticated:
+        return JsonResponse(
+            {'detail': 'Authentication credentials were not provided.'}, status=401
+        )
+    since = request.headers.get('Last-Event-ID') or request.GET.get('since')
+    if since is not None and not since.isdigit():
+        return JsonResponse({'since': ['Expected a message id.']}, status=400)
+    response = StreamingHttpResponse(
+        _message_events(user, int(since) if since is not None else None),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+# Conversation Views
+class ConversationViewSet(PrefetchPlanMixin, viewsets.ReadOnlyModelViewSet):
+    serializer_class = ConversationSerializer
+    permission_classes = [IsAuthenticated]
+    lookup_field = 'conversation_id'
+    lookup_url_kwarg = 'pk'
+
+    @property
+    def cursor_ordering(self):
+        if self.action == 'messages':
+            return ('-created_at', '-id')
+        return ('-last_message_at', '-id')
+
+    def get_queryset(self):
+        return ConversationParticipant.objects.filter(
+            user=self.request.user
+        ).select_related('conversation__last_message')
+
+    @action(detail=False, methods=['get'])
+    def unread(self, request):
+        total = self.get_queryset().aggregate(total=Sum('unread_count'))['total']
+        return Response({'unread_count': total or 0})
+
+    @action(detail=True, methods=['get'])
+    def messages(self, request, pk=None):
+        participant = self.get_object()
+        messages = apply_prefetch_plan(
+            Message.objects.filter(conversation_id=participant.conversation_id),
+            MessageSerializer,
+        )
+        page = self.paginate_queryset(messages)
+        serializer = MessageSerializer(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['post'])
+    def read(self, request, pk=None):
+        participant = self.get_object()
+        return Response({'marked_read': mark_read(participant)})
+
 # Maintenance Request Views
-class MaintenanceRequestViewSet(viewsets.ModelViewSet):
+class MaintenanceRequestViewSet(ValuesListMixin, PrefetchPlanMixin, viewsets.ModelViewSet):
     serializer_class = MaintenanceRequestSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return MaintenanceRequestSummarySerializer
+        return MaintenanceRequestSerializer
+
     def get_queryset(self):
         if self.request.user.is_staff:
             return MaintenanceRequest.objects.all()
@@ -169,16 +475,89 @@ class MaintenanceRequestViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+# Export Views
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export(request, dataset, fmt):
+    """
+    Stream a dataset as CSV or NDJSON. Staff export every row; managers
+    export rows for the hostels they manage.
+    """
+    if dataset not in EXPORTS or fmt not in FORMATS:
+        return Response({'error': 'Unknown export'}, status=status.HTTP_404_NOT_FOUND)
+    user = request.user
+    if not user.is_staff and not Profile.objects.filter(user=user, is_manager=True).exists():
+        return Response(
+            {'error': 'Exports are available to managers and staff only'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    params = ExportQuerySerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+    spec = EXPORTS[dataset]
+    content_type, stream = FORMATS[fmt]
+    rows = spec.queryset(user, **params.validated_data)
+    response = StreamingHttpResponse(stream(spec.headers, rows), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{dataset}.{fmt}"'
+    return response
+
+# Manager Views
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def manager_stats(request):
+    """
+    Daily booking, revenue and review figures for the hostels the requester
+    manages (every hostel for staff), served from the precomputed rollups.
+    """
+    user = request.user
+    if not user.is_staff and not Profile.objects.filter(user=user, is_manager=True).exists():
+        return Response(
+            {'error': 'Stats are available to managers and staff only'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    params = StatsQuerySerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+    hostels = Hostel.objects.all() if user.is_staff else Hostel.objects.filter(manager=user)
+    if 'hostel_id' in params.validated_data:
+        hostels = hostels.filter(pk=params.validated_data['hostel_id'])
+    return Response(rollups.dashboard(
+        hostels, params.validated_data['from'], params.validated_data['to']
+    ))
+
+# Metrics Views
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metrics_view(request):
+    """Request metrics of this process in the Prometheus text format."""
+    return HttpResponse(
+        metrics.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
 # Forum Views
-class ForumTopicViewSet(viewsets.ModelViewSet):
+class ForumTopicViewSet(ValuesListMixin, PrefetchPlanMixin, viewsets.ModelViewSet):
     queryset = ForumTopic.objects.all()
     serializer_class = ForumTopicSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_filterset(self):
+        if not hasattr(self, '_filterset'):
+            self._filterset = ForumTopicFilterSet(self.request.query_params)
+        return self._filterset
+
+    @property
+    def cursor_ordering(self):
+        if self.action == 'list':
+            return self.get_filterset().ordering
+        return ('-created_at', '-id')
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return ForumTopicSummarySerializer
+        return ForumTopicSerializer
+
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
-class ForumPostViewSet(viewsets.ModelViewSet):
+class ForumPostViewSet(ValuesListMixin, PrefetchPlanMixin, viewsets.ModelViewSet):
     queryset = ForumPost.objects.all()
     serializer_class = ForumPostSerializer
     permission_classes = [IsAuthenticated]
@@ -192,57 +571,195 @@ class ForumPostViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+# Image Views
+class ImageAssetViewSet(PrefetchPlanMixin, mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+                        mixins.ListModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    serializer_class = ImageAssetSerializer
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def get_queryset(self):
+        if self.request.user.is_staff:
+            return ImageAsset.objects.all()
+        return ImageAsset.objects.filter(owner=self.request.user)
+
+    def perform_create(self, serializer):
+        asset = serializer.save(owner=self.request.user)
+        images.schedule_processing([asset.pk])
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        # Renditions are written in the background; poll the asset for status.
+        response.status_code = status.HTTP_202_ACCEPTED
+        return response
+
+class ImageUploadViewSet(PrefetchPlanMixin, mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+                         mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    Resumable uploads: POST ``{filename, size}``, then PUT raw chunks with a
+    ``Content-Range: bytes start-end/size`` header. GET reports how many
+    bytes arrived, so an interrupted client resumes from there.
+    """
+    serializer_class = ImageUploadSerializer
+    permission_classes = [IsAuthenticated]
+    content_range = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+    def get_queryset(self):
+        return ImageUpload.objects.filter(owner=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(owner=self.request.user)
+
+    def perform_destroy(self, instance):
+        images.discard_upload(instance)
+        instance.delete()
+
+    def retrieve(self, request, *args, **kwargs):
+        upload = self.get_object()
+        if upload.asset_id is None:
+            upload.received = images.uploaded_bytes(upload)
+        return Response(self.get_serializer(upload).data)
+
+    def update(self, request, *args, **kwargs):
+        upload = self.get_object()
+        if upload.asset_id is not None:
+            return Response({'error': 'Upload already complete'}, status=status.HTTP_409_CONFLICT)
+        match = self.content_range.match(request.headers.get('Content-Range', ''))
+        if match is None:
+            return Response(
+                {'error': 'Expected a Content-Range: bytes start-end/size header'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        start, end, total = (int(value) for value in match.groups())
+        offset = images.uploaded_bytes(upload)
+        if total != upload.size or end < start or end >= total:
+            return Response({'error': 'Invalid Content-Range'}, status=status.HTTP_400_BAD_REQUEST)
+        if start != offset:
+            upload.received = offset
+            return Response(self.get_serializer(upload).data, status=status.HTTP_409_CONFLICT)
+        upload.received = images.append_chunk(upload, request.stream, start, end - start + 1)
+        upload.save(update_fields=['received', 'updated_at'])
+        if upload.received < upload.size:
+            return Response(self.get_serializer(upload).data)
+        try:
+            images.finish_upload(upload)
+        except images.InvalidImage as exc:
+            # The whole file is bad, so there is nothing to resume.
+            images.discard_upload(upload)
+            upload.delete()
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(upload).data, status=status.HTTP_201_CREATED)
+
 # Search View
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@throttle_scope('search')
 def search(request):
+    if request.query_params.get('type') == search_index.UNIVERSITY:
+        tags = ['universities']
+    else:
+        tags = _hostel_search_tags
+    return cached_response(request, lambda: _search(request), tags, timeout=60)
+
+def _hostel_search_tags(data):
+    return ['search'] + [f'hostel:{hostel["id"]}' for hostel in data['results']]
+
+def _search(request):
     query = request.query_params.get('q', '')
-    hostels = Hostel.objects.filter(
-        Q(name__icontains=query) |
-        Q(city__icontains=query) |
-        Q(description__icontains=query)
+    doc_type = request.query_params.get('type', search_index.HOSTEL)
+    if doc_type == search_index.UNIVERSITY:
+        model, serializer_class = University, UniversitySerializer
+    elif doc_type == search_index.HOSTEL:
+        model, serializer_class = Hostel, HostelSummarySerializer
+    else:
+        return Response({'error': 'Unknown search type'}, status=status.HTTP_400_BAD_REQUEST)
+
+    paginator = RankedPagination()
+    ranked = paginator.paginate_ranked(
+        lambda offset, limit: search_index.search(doc_type, query, offset, limit), request
+    )
+    ids = [object_id for object_id, _ in ranked]
+    objects = apply_prefetch_plan(model.objects.all(), serializer_class).in_bulk(ids)
+    results = [objects[object_id] for object_id in ids if object_id in objects]
+    serializer = serializer_class(results, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+# Reference Data Views
+@api_view(['GET'])
+@permission_classes([AllowAny])
+@throttle_scope('reference')
+def reference_data(request):
+    """
+    Several reference sets in one response, all of them by default;
+    ``?sets=universities,community_categories`` picks some.
+    """
+    names = [name.strip() for name in request.query_params.get('sets', '').split(',') if name.strip()]
+    names = names or list(REFERENCE_SETS)
+    unknown = sorted(set(names) - set(REFERENCE_SETS))
+    if unknown:
+        raise ValidationError({'sets': [f'Unknown set(s): {", ".join(unknown)}.']})
+    rendered = reference_cache.get(names, request)
+    return reference_response(
+        request, {name: rendered[name].rows for name in names}, [rendered[name].key for name in names],
     )
-    serializer = HostelSerializer(hostels, many=True)
-    return Response(serializer.data)
 
 # University Views
-class UniversityViewSet(viewsets.ModelViewSet):
+class UniversityViewSet(ReferenceDataMixin, PrefetchPlanMixin, viewsets.ModelViewSet):
     queryset = University.objects.all()
     serializer_class = UniversitySerializer
     permission_classes = [AllowAny]
+    reference_set = 'universities'
+    throttle_scope = 'reference'
 
-    def get_queryset(self):
-        queryset = University.objects.all()
-        location = self.request.query_params.get('location', None)
+    def filter_rows(self, rows):
+        location = self.request.query_params.get('location', '').casefold()
         if location:
-            queryset = queryset.filter(location__icontains=location)
-        return queryset
+            return [row for row in rows if location in (row['location'] or '').casefold()]
+        return rows
 
 # Community Views
-class CommunityCategoryViewSet(viewsets.ModelViewSet):
+class CommunityCategoryViewSet(ReferenceDataMixin, PrefetchPlanMixin, viewsets.ModelViewSet):
     queryset = CommunityCategory.objects.all()
     serializer_class = CommunityCategorySerializer
     permission_classes = [AllowAny]
+    reference_set = 'community_categories'
+    throttle_scope = 'reference'
 
-class CommunityPostViewSet(viewsets.ModelViewSet):
+class CommunityPostViewSet(ValuesListMixin, PrefetchPlanMixin, viewsets.ModelViewSet):
     queryset = CommunityPost.objects.all()
     serializer_class = CommunityPostSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_filterset(self):
+        if not hasattr(self, '_filterset'):
+            self._filterset = CommunityPostFilterSet(self.request.query_params)
+        return self._filterset
+
+    @property
+    def cursor_ordering(self):
+        if self.action == 'list':
+            return self.get_filterset().ordering
+        return ('-is_pinned', '-created_at', '-id')
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return CommunityPostSummarySerializer
+        return CommunityPostSerializer
+
     def get_queryset(self):
-        queryset = CommunityPost.objects.all()
-        category_id = self.request.query_params.get('category_id', None)
-        if category_id:
-            queryset = queryset.filter(category_id=category_id)
-        return queryset.order_by('-is_pinned', '-created_at')
+        if self.action == 'list':
+            # Every sort is served by one of the communitypost_* indexes.
+            return self.get_filterset().filter(CommunityPost.objects.all())
+        return CommunityPost.objects.all()
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
-class CommunityCommentViewSet(viewsets.ModelViewSet):
+class CommunityCommentViewSet(ValuesListMixin, PrefetchPlanMixin, viewsets.ModelViewSet):
     queryset = CommunityComment.objects.all()
     serializer_class = CommunityCommentSerializer
     permission_classes = [IsAuthenticated]
+    cursor_ordering = ('created_at', 'id')
 
     def get_queryset(self):
         post_id = self.request.query_params.get('post_id', None)
@@ -0,0 +1,18 @@
+"""
+ASGI config for unistay project.
+
+Serve with any ASGI server, e.g. ``uvicorn unistay.asgi:application``.
+Long-lived endpoints such as ``/api/messages/stream/`` need it.
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'unistay.settings')
+
+application = get_asgi_application()
+
+from api.reference import reference_cache  # noqa: E402
+
+reference_cache.preload()
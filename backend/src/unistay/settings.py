@@ -1,4 +1,5 @@
 from pathlib import Path
+from urllib.parse import parse_qsl, unquote, urlsplit
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -26,6 +27,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -34,6 +36,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.replicas.ReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'unistay.urls'
@@ -55,14 +58,109 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'unistay.wsgi.application'
+ASGI_APPLICATION = 'unistay.asgi.application'
 
-# Database
-DATABASES = {
+# Database: SQLite in WAL mode by default, PostgreSQL when DATABASE_URL is set
+# (the variable prisma/schema.prisma reads too). Connections are kept open for
+# DB_CONN_MAX_AGE seconds and checked before reuse.
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+
+
+# Query parameters Prisma reads from DATABASE_URL that libpq would reject
+PRISMA_URL_PARAMS = {
+    'schema', 'connection_limit', 'pool_timeout', 'socket_timeout', 'pgbouncer',
+    'statement_cache_size', 'sslaccept', 'sslidentity',
+}
+
+
+def postgres_database(url):
+    parts = urlsplit(url)
+    options = dict(parse_qsl(parts.query))
+    schema = options.get('schema')
+    options = {key: value for key, value in options.items() if key not in PRISMA_URL_PARAMS}
+    if schema and 'options' not in options:
+        # Use the schema Prisma uses.
+        options['options'] = f'-c search_path={schema}'
+    database = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': unquote(parts.path.lstrip('/')),
+        'USER': unquote(parts.username or ''),
+        'PASSWORD': unquote(parts.password or ''),
+        'HOST': parts.hostname or '',
+        'PORT': str(parts.port or ''),
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': options,
+    }
+    if os.environ.get('DB_POOL_MAX_SIZE'):
+        # psycopg's pool replaces persistent connections (needs psycopg[pool]).
+        options['pool'] = {'min_size': 1, 'max_size': int(os.environ['DB_POOL_MAX_SIZE'])}
+        database['CONN_MAX_AGE'] = 0
+    return database
+
+
+if os.environ.get('DATABASE_URL'):
+    DATABASES = {'default': postgres_database(os.environ['DATABASE_URL'])}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            # In-memory test databases ignore the busy timeout, so concurrent
+            # tests would fail on the write lock instead of waiting for it.
+            'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+            'OPTIONS': {
+                # Take the write lock when a transaction starts, so row locks taken with
+                # select_for_update (a no-op on SQLite) still serialize booking writes.
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+                # WAL lets readers run alongside the single writer.
+                'init_command': (
+                    f"PRAGMA journal_mode={os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')};"
+                    'PRAGMA synchronous=NORMAL;'
+                ),
+            },
+        }
+    }
+
+# Read replicas, used by api.replicas for GET/HEAD/OPTIONS requests
+for index, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(','))):
+    DATABASES[f'replica_{index}'] = {
+        **postgres_database(url.strip()),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
+
+# Cache: in-process by default, any Redis-compatible server when REDIS_URL is set
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'unistay',
     }
 }
+if os.environ.get('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
+
+# Seconds a cached API response may be served before it is recomputed
+API_RESPONSE_CACHE_TIMEOUT = 300
+# Seconds a worker keeps universities and community categories in memory
+REFERENCE_CACHE_TIMEOUT = int(os.environ.get('REFERENCE_CACHE_TIMEOUT', 300))
+
+# Realtime push: in-process by default, Redis pub/sub across workers when REDIS_URL is set
+REALTIME_CHANNEL_LAYER = {'class': 'api.realtime.InMemoryChannelLayer'}
+if os.environ.get('REDIS_URL'):
+    REALTIME_CHANNEL_LAYER = {
+        'class': 'api.realtime.RedisChannelLayer',
+        'url': os.environ['REDIS_URL'],
+    }
+
+# Request metrics (/api/_metrics). Requests slower than this many seconds are
+# logged with their SQL; None turns the log off.
+METRICS_SLOW_REQUEST_SECONDS = 1.0
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -94,6 +192,28 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = 'media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Image pipeline: renditions (name -> longest side in pixels), written as WebP
+# by the background task worker
+IMAGE_RENDITIONS = {'thumb': 160, 'card': 480, 'full': 1600}
+IMAGE_WEBP_QUALITY = 80
+IMAGE_UPLOAD_MAX_BYTES = 50 * 1024 * 1024
+IMAGE_UPLOAD_TEMP_DIR = os.path.join(MEDIA_ROOT, 'uploads')
+
+# Background tasks (python manage.py run_worker). Periodic tasks run daily
+# at the given local time.
+TASK_SCHEDULE = {
+    'complete-past-bookings': {'task': 'api.jobs.complete_past_bookings', 'hour': 2, 'minute': 0},
+    'delete-expired-refresh-tokens': {'task': 'api.jobs.delete_expired_refresh_tokens', 'hour': 3, 'minute': 0},
+    'delete-finished-tasks': {'task': 'api.jobs.delete_finished_tasks', 'hour': 3, 'minute': 30},
+}
+# Done and failed tasks are kept this long. Keep it above a day: a deleted
+# task frees its idempotency key, including today's periodic runs.
+TASK_RETENTION_DAYS = int(os.environ.get('TASK_RETENTION_DAYS', 7))
+
+# Email, sent by background tasks
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'UniStay <noreply@unistay.local>')
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -108,6 +228,47 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
+        'api.tokens.SignedTokenAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ],
-} 
\ No newline at end of file
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': ['api.throttling.TokenBucketThrottle'],
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPagination',
+    'PAGE_SIZE': 20,
+    # Invalid items of list payloads (bulk writes, quotes) are reported as {index: errors}.
+    'LIST_SERIALIZER_ERRORS_AS_DICT': True,
+    # Proxies in front of the app. With 0, clients are identified by the
+    # socket address and X-Forwarded-For is ignored.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+}
+
+# Signed token authentication (api.tokens), in seconds
+ACCESS_TOKEN_LIFETIME = int(os.environ.get('ACCESS_TOKEN_LIFETIME', 5 * 60))
+REFRESH_TOKEN_LIFETIME = int(os.environ.get('REFRESH_TOKEN_LIFETIME', 14 * 24 * 3600))
+# How long token-authenticated requests may use a cached copy of their user
+USER_CACHE_TIMEOUT = 300
+
+# Token-bucket rate limits (api.throttling), stored in the cache. Each bucket
+# holds `burst` requests and refills at `rate`. 'anon' (per IP) and 'user'
+# apply to every request; the others to views with that throttle_scope, per
+# user or IP. IPs are the socket address; behind proxies, set NUM_PROXIES
+# to their number so IPs are read from X-Forwarded-For, skipping the ones
+# they appended.
+THROTTLE_BUCKETS = {
+    'anon': {'rate': '120/min', 'burst': 60},
+    'user': {'rate': '600/min', 'burst': 120},
+    'search': {'rate': '30/min', 'burst': 15},
+    'reference': {'rate': '60/min', 'burst': 30},
+    'auth': {'rate': '10/min', 'burst': 10},
+}
+
+# Booking pricing rules, applied in order to each night's rate. Entries are a
+# dotted path or a dict with 'class' plus keyword arguments, e.g.
+# {'class': 'api.pricing.SeasonalRateRule', 'seasons': [('12-15', '01-10', 1.25)]}
+PRICING_RULES = []
+
+# Longest stay that can be booked or quoted; prices are computed per night.
+MAX_STAY_NIGHTS = 365
@@ -0,0 +1,17 @@
+"""
+WSGI config for unistay project.
+
+It exposes the WSGI callable as a module-level variable named ``application``.
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'unistay.settings')
+
+application = get_wsgi_application()
+
+from api.reference import reference_cache  # noqa: E402
+
+reference_cache.preload()